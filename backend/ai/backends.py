@@ -0,0 +1,217 @@
+# backend/ai/backends.py
+from __future__ import annotations
+
+import os
+import json
+import mmap
+import struct
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch  # type: ignore
+import torch.nn as nn  # type: ignore
+from transformers import AutoConfig, AutoModelForSequenceClassification  # type: ignore
+
+try:
+    from .multitask_model import PhoBertMultiTask  # type: ignore
+except ImportError:
+    from multitask_model import PhoBertMultiTask  # type: ignore
+
+# ================== CẤU HÌNH ==================
+# AI_BACKEND:
+#   - torch: PyTorch eager fp32 (mặc định, như trước)
+#   - int8 : PyTorch dynamic quantization INT8 cho các lớp Linear (CPU)
+#   - onnx : model đã export sang ONNX, chạy bằng onnxruntime (CPU)
+BACKENDS   = ("torch", "int8", "onnx")
+AI_BACKEND = os.environ.get("AI_BACKEND", "torch").strip().lower()
+if AI_BACKEND not in BACKENDS:
+    AI_BACKEND = "torch"
+
+# onnx: dùng bản đã lượng tử hoá INT8 (model.int8.onnx) nếu có
+ONNX_USE_INT8 = os.environ.get("AI_ONNX_INT8", "1") in ("1", "true", "True")
+
+# torch fp32: trọng số trỏ thẳng vào model.safetensors đã mmap thay vì copy vào RAM riêng
+# => mọi worker (kể cả không fork từ cùng master) dùng chung trang trong page cache
+MMAP_WEIGHTS = os.environ.get("AI_MMAP_WEIGHTS", "0") in ("1", "true", "True")
+
+# Tên file artifact (nằm ở thư mục anh em: phobert_kssv_onnx/, phobert_kssv_int8/ ...)
+SAFETENSORS_FILE = "model.safetensors"
+ONNX_FILE      = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+INT8_FILE      = "model_int8.pt"
+
+HEADS_SINGLE    = ("logits",)
+HEADS_MULTITASK = ("logits", "prio_logits")
+
+
+def artifact_dir(model_dir: str, kind: str) -> str:
+    """models/phobert_kssv + 'onnx' -> models/phobert_kssv_onnx"""
+    return f"{os.path.normpath(model_dir)}_{kind}"
+
+def heads_for(multitask: bool) -> Tuple[str, ...]:
+    return HEADS_MULTITASK if multitask else HEADS_SINGLE
+
+
+# ================== PYTORCH (FP32 / INT8) ==================
+def load_fp32(model_dir: str, multitask: bool = False) -> nn.Module:
+    if MMAP_WEIGHTS:
+        mdl = load_fp32_mmap(model_dir, multitask)
+        if mdl is not None:
+            return mdl
+    if multitask:
+        return PhoBertMultiTask.from_pretrained(model_dir).eval()
+    return AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+
+def _skeleton(model_dir: str, multitask: bool) -> nn.Module:
+    """Model đúng kiến trúc nhưng chưa nạp trọng số."""
+    if multitask:
+        return PhoBertMultiTask.from_config(model_dir).eval()
+    return AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(model_dir)).eval()
+
+# ---- safetensors mmap (zero-copy) ----
+_ST_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Đọc file safetensors (8 byte độ dài header + header JSON + dữ liệu thô) thành các tensor
+    trỏ vào vùng mmap MAP_PRIVATE của file: không copy, trang chỉ bị chép riêng khi có ghi
+    (suy luận không ghi trọng số).
+    """
+    with open(path, "rb") as f:
+        n = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(n))
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    base = 8 + n
+    out: Dict[str, torch.Tensor] = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _ST_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if end == start:
+            out[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        t = torch.frombuffer(buf, dtype=dtype, count=(end - start) // dtype.itemsize, offset=base + start)
+        out[name] = t.reshape(info["shape"])
+    return out
+
+def _materialize_buffers(model: nn.Module, multitask: bool) -> None:
+    """
+    Buffer không nằm trong checkpoint (position_ids, token_type_ids của embeddings) vẫn ở meta sau khi nạp:
+    cấp lại trên CPU rồi điền giá trị bằng _init_weights của transformers cho đúng module chứa nó.
+    """
+    init = (model.encoder if multitask else model)._init_weights
+    for mod in model.modules():
+        names = [n for n, b in mod.named_buffers(recurse=False) if b.is_meta]
+        if not names:
+            continue
+        for n in names:
+            mod._buffers[n] = torch.empty_like(mod._buffers[n], device="cpu")
+        init(mod)
+
+def load_fp32_mmap(model_dir: str, multitask: bool = False) -> Optional[nn.Module]:
+    """Khung model trên device meta + load_state_dict(assign=True) từ mmap_safetensors. None nếu không dùng được."""
+    path = os.path.join(model_dir, SAFETENSORS_FILE)
+    if not os.path.isfile(path):
+        return None
+    # torch.device là TorchFunctionMode theo từng thread: không ảnh hưởng module thread khác dựng cùng lúc
+    # (warm-up, predictor nạp lại theo fingerprint); tham số meta không cấp phát / khởi tạo ngẫu nhiên
+    with torch.device("meta"):
+        model = _skeleton(model_dir, multitask)
+    target = model.encoder if multitask else model   # đa nhiệm: safetensors chỉ chứa encoder
+    target.load_state_dict(mmap_safetensors(path), strict=False, assign=True)
+    if multitask:
+        model.load_heads(model_dir, assign=True)   # head cũng dựng trên meta: copy vào meta không có tác dụng
+    if any(p.is_meta for p in model.parameters()):
+        return None   # tên khoá không khớp (checkpoint kiểu khác) -> nạp from_pretrained như thường
+    _materialize_buffers(model, multitask)
+    if any(b.is_meta for b in model.buffers()):
+        return None
+    return model.eval()
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    from torch.ao.quantization import quantize_dynamic  # type: ignore
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def load_int8(model_dir: str, multitask: bool = False) -> nn.Module:
+    """
+    Ưu tiên state_dict INT8 đã lưu bởi export_models (khỏi nạp fp32),
+    nếu chưa có thì nạp fp32 rồi lượng tử hoá ngay khi khởi động.
+    """
+    path = os.path.join(artifact_dir(model_dir, "int8"), INT8_FILE)
+    if os.path.isfile(path):
+        mdl = quantize_int8(_skeleton(model_dir, multitask))
+        mdl.load_state_dict(torch.load(path, map_location="cpu", weights_only=False))
+        return mdl.eval()
+    return quantize_int8(load_fp32(model_dir, multitask)).eval()
+
+
+# ================== ONNX RUNTIME ==================
+def onnx_path(model_dir: str, use_int8: bool = ONNX_USE_INT8) -> Optional[str]:
+    d = artifact_dir(model_dir, "onnx")
+    candidates = [ONNX_INT8_FILE, ONNX_FILE] if use_int8 else [ONNX_FILE]
+    for name in candidates:
+        p = os.path.join(d, name)
+        if os.path.isfile(p):
+            return p
+    return None
+
+class OnnxModel:
+    """
+    Bọc onnxruntime.InferenceSession cho giống model PyTorch:
+      mdl(input_ids=..., attention_mask=...) -> obj có .logits (và .prio_logits)
+    để predictor dùng chung đường suy luận theo lô.
+    """
+
+    def __init__(self, path: str, config: Any = None):
+        import onnxruntime as ort  # type: ignore
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.output_names: List[str] = [o.name for o in self.session.get_outputs()]
+        self.config = config
+        self.path = path
+
+    def __call__(self, input_ids=None, attention_mask=None, **kwargs):
+        feeds = {
+            "input_ids": input_ids.detach().cpu().numpy().astype("int64"),
+            "attention_mask": attention_mask.detach().cpu().numpy().astype("int64"),
+        }
+        feeds = {k: v for k, v in feeds.items() if k in self.input_names}
+        outs = self.session.run(self.output_names, feeds)
+        return SimpleNamespace(**{n: torch.from_numpy(o) for n, o in zip(self.output_names, outs)})
+
+    # tương thích với chuỗi .to(device).eval() của PyTorch
+    def to(self, *args, **kwargs) -> "OnnxModel":
+        return self
+
+    def eval(self) -> "OnnxModel":
+        return self
+
+def load_onnx(model_dir: str) -> OnnxModel:
+    path = onnx_path(model_dir)
+    if not path:
+        raise FileNotFoundError(
+            f"Không tìm thấy ONNX cho {model_dir}. Hãy chạy: python -m ai.export_models --format onnx"
+        )
+    return OnnxModel(path, config=AutoConfig.from_pretrained(model_dir))
+
+
+# ================== ĐIỂM VÀO CHUNG ==================
+def backend_device(device: torch.device, backend: str = AI_BACKEND) -> torch.device:
+    """INT8 dynamic & onnxruntime chỉ chạy CPU."""
+    return device if backend == "torch" else torch.device("cpu")
+
+def load_model(model_dir: str, multitask: bool = False, backend: str = AI_BACKEND,
+               device: Optional[torch.device] = None):
+    if backend == "onnx":
+        return load_onnx(model_dir)
+    if backend == "int8":
+        return load_int8(model_dir, multitask)
+    mdl = load_fp32(model_dir, multitask)
+    return mdl.to(device) if device is not None else mdl
@@ -0,0 +1,208 @@
+# backend/ai/batching.py
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ---------------------------------------------------------
+# Import tương thích (giống predictor):
+# - Gọi qua FastAPI: from .xxx import ...
+# - Chạy tay:        python -m ai.batching
+# ---------------------------------------------------------
+try:
+    from .predictor import classify_many_full, classify_one_full  # type: ignore
+except ImportError:
+    from predictor import classify_many_full, classify_one_full  # type: ignore
+
+# ================== CẤU HÌNH ==================
+# Gom các yêu cầu đồng thời trong tối đa AI_BATCH_MAX_WAIT_MS rồi chạy 1 lô
+# (tối đa AI_BATCH_MAX_SIZE câu). Tắt bằng AI_MICROBATCH=0.
+MICROBATCH_ENABLED = os.environ.get("AI_MICROBATCH", "1") in ("1", "true", "True")
+MAX_WAIT_MS        = float(os.environ.get("AI_BATCH_MAX_WAIT_MS", "5"))
+MAX_BATCH_SIZE     = int(os.environ.get("AI_BATCH_MAX_SIZE", "16"))
+
+# Mốc histogram: kích thước lô và thời gian chờ (ms)
+_SIZE_BUCKETS    = (1, 2, 4, 8, 16, 32, 64)
+_WAIT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+def _bucket(value: float, bounds: Tuple[float, ...]) -> str:
+    for b in bounds:
+        if value <= b:
+            return f"<={b:g}"
+    return f">{bounds[-1]:g}"
+
+
+def _empty_hist(bounds: Tuple[float, ...]) -> Dict[str, int]:
+    hist = {f"<={b:g}": 0 for b in bounds}
+    hist[f">{bounds[-1]:g}"] = 0
+    return hist
+
+
+class MicroBatcher:
+    """
+    Worker nền gom các lời gọi classify đồng thời thành 1 lô có padding:
+      - submit(text) trả Future, worker đặt kết quả khi lô chạy xong
+      - lô được chạy khi đủ max_batch hoặc hết max_wait_ms kể từ yêu cầu đầu tiên
+      - stats() trả độ sâu hàng đợi, histogram kích thước lô & thời gian chờ
+    """
+
+    def __init__(
+        self,
+        runner: Callable[..., List[Dict[str, Any]]] = classify_many_full,
+        max_wait_ms: float = MAX_WAIT_MS,
+        max_batch: int = MAX_BATCH_SIZE,
+    ):
+        self._runner = runner
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+
+        self._q: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # số liệu để tinh chỉnh
+        self._stats_lock = threading.Lock()
+        self._n_requests = 0
+        self._n_batches = 0
+        self._n_errors = 0
+        self._size_hist: Dict[str, int] = _empty_hist(_SIZE_BUCKETS)
+        self._wait_hist: Dict[str, int] = _empty_hist(_WAIT_BUCKETS_MS)
+        self._wait_sum_ms = 0.0
+        self._wait_max_ms = 0.0
+        self._run_sum_ms = 0.0
+
+    # ----- API -----
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        fut: Future = Future()
+        self._q.put((text, time.perf_counter(), fut))
+        return fut
+
+    def classify(self, text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            n_req = self._n_requests
+            n_bat = self._n_batches
+            return {
+                "enabled": True,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_batch": self.max_batch,
+                "queue_depth": self._q.qsize(),
+                "requests": n_req,
+                "batches": n_bat,
+                "errors": self._n_errors,
+                "avg_batch_size": round(n_req / n_bat, 3) if n_bat else 0.0,
+                "batch_size_hist": dict(self._size_hist),
+                "wait_ms": {
+                    "avg": round(self._wait_sum_ms / n_req, 3) if n_req else 0.0,
+                    "max": round(self._wait_max_ms, 3),
+                    "hist": dict(self._wait_hist),
+                },
+                "avg_batch_run_ms": round(self._run_sum_ms / n_bat, 3) if n_bat else 0.0,
+            }
+
+    # ----- worker -----
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="ai-microbatch", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._q.get()
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch: List[Tuple[str, float, Future]]) -> None:
+        started = time.perf_counter()
+        waits_ms = [(started - enq) * 1000.0 for _, enq, _ in batch]
+        texts = [t for t, _, _ in batch]
+        try:
+            results = self._runner(texts, batch_size=len(texts))
+        except Exception as e:
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            ok = False
+        else:
+            for (_, _, fut), res in zip(batch, results):
+                fut.set_result(res)
+            ok = True
+        run_ms = (time.perf_counter() - started) * 1000.0
+
+        with self._stats_lock:
+            self._n_batches += 1
+            self._n_requests += len(batch)
+            if not ok:
+                self._n_errors += 1
+            self._run_sum_ms += run_ms
+            sb = _bucket(len(batch), _SIZE_BUCKETS)
+            self._size_hist[sb] += 1
+            for w in waits_ms:
+                wb = _bucket(w, _WAIT_BUCKETS_MS)
+                self._wait_hist[wb] += 1
+                self._wait_sum_ms += w
+                if w > self._wait_max_ms:
+                    self._wait_max_ms = w
+
+
+# ================== SINGLETON ==================
+_BATCHER: Optional[MicroBatcher] = None
+_BATCHER_LOCK = threading.Lock()
+
+def get_batcher() -> MicroBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        with _BATCHER_LOCK:
+            if _BATCHER is None:
+                _BATCHER = MicroBatcher()
+    return _BATCHER
+
+def classify_one_coalesced(text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Thay thế classify_one_full cho các lời gọi đồng thời (tạo report, /ai/predict):
+    đi qua micro-batcher nếu bật, ngược lại gọi thẳng predictor.
+    """
+    if not MICROBATCH_ENABLED:
+        return classify_one_full(text)
+    return get_batcher().classify(text, timeout=timeout)
+
+def batcher_stats() -> Dict[str, Any]:
+    if not MICROBATCH_ENABLED:
+        return {"enabled": False}
+    return get_batcher().stats()
+
+
+# ================== TEST NHANH ==================
+if __name__ == "__main__":
+    # ví dụ: python -m ai.batching
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+
+    samples = [
+        "phòng 302 mất điện từ tối qua",
+        "wifi tầng 5 rất yếu",
+        "vòi nước phòng B3-402 bị rò rỉ",
+        "nhà vệ sinh tầng 2 bị tắc",
+    ] * 8
+    with ThreadPoolExecutor(max_workers=len(samples)) as ex:
+        outs = list(ex.map(classify_one_coalesced, samples))
+    print(json.dumps(outs[0], ensure_ascii=False, indent=2))
+    print(json.dumps(batcher_stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,196 @@
+# backend/ai/export_models.py
+"""
+Xuất model phục vụ suy luận CPU:
+  - onnx : models/<tên>_onnx/model.onnx (+ model.int8.onnx đã lượng tử hoá bằng onnxruntime)
+  - int8 : models/<tên>_int8/model_int8.pt (PyTorch dynamic quantization các lớp Linear)
+và kiểm tra độ khớp (parity) so với fp32 trên tập test giữ lại của script train.
+
+Ví dụ:
+  python -m ai.export_models --format all
+  python -m ai.export_models --format onnx --models kssv,priority --check
+  python -m ai.export_models --check-only --backend int8
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Tuple
+
+import torch  # type: ignore
+import torch.nn as nn  # type: ignore
+from transformers import AutoTokenizer  # type: ignore
+
+try:
+    from . import backends  # type: ignore
+    from .predictor import (  # type: ignore
+        LABEL_MODEL_DIR, PRIO_MODEL_DIR, MULTITASK_MODEL_DIR, _forward_probs,
+    )
+    from .text_preprocess_kssv import normalize_many  # type: ignore
+except ImportError:
+    import backends  # type: ignore
+    from predictor import LABEL_MODEL_DIR, PRIO_MODEL_DIR, MULTITASK_MODEL_DIR, _forward_probs  # type: ignore
+    from text_preprocess_kssv import normalize_many  # type: ignore
+
+# tên ngắn -> (thư mục model, có phải model đa nhiệm, module train chứa load_dataset)
+MODELS: Dict[str, Tuple[str, bool, str]] = {
+    "kssv":      (LABEL_MODEL_DIR,     False, "train_phobert"),
+    "priority":  (PRIO_MODEL_DIR,      False, "train_priority"),
+    "multitask": (MULTITASK_MODEL_DIR, True,  "train_multitask"),
+}
+
+OPSET = 17
+
+
+class _OnnxWrapper(nn.Module):
+    """ONNX cần output dạng tuple tensor, không nhận ModelOutput."""
+
+    def __init__(self, model: nn.Module, heads: Tuple[str, ...]):
+        super().__init__()
+        self.model = model
+        self.heads = heads
+
+    def forward(self, input_ids, attention_mask):
+        out = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return tuple(getattr(out, h) for h in self.heads)
+
+
+# ================== EXPORT ==================
+def export_onnx(model_dir: str, multitask: bool, quantize: bool = True) -> List[str]:
+    out_dir = backends.artifact_dir(model_dir, "onnx")
+    os.makedirs(out_dir, exist_ok=True)
+    heads = backends.heads_for(multitask)
+
+    model = backends.load_fp32(model_dir, multitask)
+    tok = AutoTokenizer.from_pretrained(model_dir, use_fast=False)
+    sample = tok(["phòng 302 mất điện", "wi-fi tầng 5 yếu từ tối qua"], padding=True,
+                 return_tensors="pt", return_token_type_ids=False)
+
+    path = os.path.join(out_dir, backends.ONNX_FILE)
+    axes = {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}}
+    axes.update({h: {0: "batch"} for h in heads})
+    with torch.inference_mode():
+        torch.onnx.export(
+            _OnnxWrapper(model, heads).eval(),
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=list(heads),
+            dynamic_axes=axes,
+            opset_version=OPSET,
+            dynamo=False,
+        )
+    written = [path]
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType  # type: ignore
+        q_path = os.path.join(out_dir, backends.ONNX_INT8_FILE)
+        quantize_dynamic(path, q_path, weight_type=QuantType.QInt8)
+        written.append(q_path)
+    return written
+
+def export_int8(model_dir: str, multitask: bool) -> List[str]:
+    out_dir = backends.artifact_dir(model_dir, "int8")
+    os.makedirs(out_dir, exist_ok=True)
+    qmodel = backends.quantize_int8(backends.load_fp32(model_dir, multitask))
+    path = os.path.join(out_dir, backends.INT8_FILE)
+    torch.save(qmodel.state_dict(), path)
+    return [path]
+
+
+# ================== PARITY CHECK ==================
+def _heldout_test(train_module: str, data_path: str | None) -> Tuple[List[str], Dict[str, List[int]]]:
+    """Dựng lại đúng tập test (cùng SEED / cách chia) như script train tương ứng."""
+    import importlib
+    pkg = __package__ or ""
+    mod = importlib.import_module(f"{pkg}.{train_module}" if pkg else train_module)
+    out = mod.load_dataset(data_path or mod.DATA_PATH)
+    dsdict = out[0] if isinstance(out, tuple) else out
+    test = dsdict["test"]
+    gold = {c: list(test[c]) for c in ("labels", "prio_labels") if c in test.column_names}
+    return list(test["text"]), gold
+
+def parity_check(name: str, backend: str, data_path: str | None = None,
+                 batch_size: int = 32) -> Dict[str, Any]:
+    model_dir, multitask, train_module = MODELS[name]
+    heads = backends.heads_for(multitask)
+    texts, gold = _heldout_test(train_module, data_path)
+    texts_norm = normalize_many(texts)
+
+    tok = AutoTokenizer.from_pretrained(model_dir, use_fast=False)
+    with torch.inference_mode():
+        ref = _forward_probs(tok, backends.load_fp32(model_dir, multitask), texts_norm, batch_size, heads)
+        got = _forward_probs(tok, backends.load_model(model_dir, multitask, backend=backend), texts_norm, batch_size, heads)
+
+    report: Dict[str, Any] = {"model": name, "backend": backend, "n": len(texts)}
+    gold_cols = {"logits": "labels", "prio_logits": "prio_labels" if multitask else "labels"}
+    for h, ref_rows, got_rows in zip(heads, ref, got):
+        ref_ids = [max(range(len(r)), key=r.__getitem__) for r in ref_rows]
+        got_ids = [max(range(len(r)), key=r.__getitem__) for r in got_rows]
+        diffs = [abs(a - b) for ra, rb in zip(ref_rows, got_rows) for a, b in zip(ra, rb)]
+        refs = gold.get(gold_cols[h]) or []
+        n = max(1, len(ref_ids))
+        report[h] = {
+            "argmax_agreement": round(sum(a == b for a, b in zip(ref_ids, got_ids)) / n, 4),
+            "max_abs_prob_diff": round(max(diffs) if diffs else 0.0, 6),
+            "mean_abs_prob_diff": round(sum(diffs) / len(diffs) if diffs else 0.0, 6),
+            "accuracy_fp32": round(sum(a == g for a, g in zip(ref_ids, refs)) / n, 4) if refs else None,
+            "accuracy_backend": round(sum(a == g for a, g in zip(got_ids, refs)) / n, 4) if refs else None,
+        }
+    return report
+
+
+# ================== CLI ==================
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export ONNX / INT8 cho predictor + kiểm tra parity với fp32")
+    parser.add_argument("--format", choices=["onnx", "int8", "all"], default="all")
+    parser.add_argument("--models", default="kssv,priority,multitask",
+                        help="Danh sách model: kssv,priority,multitask (bỏ qua model chưa train)")
+    parser.add_argument("--no-onnx-int8", action="store_true", help="Không tạo model.int8.onnx")
+    parser.add_argument("--check", action="store_true", help="Chạy parity check sau khi export")
+    parser.add_argument("--check-only", action="store_true", help="Chỉ chạy parity check, không export")
+    parser.add_argument("--backend", choices=["int8", "onnx"], default=None,
+                        help="Backend cần kiểm tra (mặc định: theo --format)")
+    parser.add_argument("--data", default=None, help="CSV dữ liệu (mặc định: DATA_PATH của script train)")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Ngưỡng khớp argmax tối thiểu, thấp hơn => exit code 1")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.models.split(",") if n.strip()]
+    unknown = [n for n in names if n not in MODELS]
+    if unknown:
+        parser.error(f"Model không hợp lệ: {unknown}")
+    names = [n for n in names if os.path.isdir(MODELS[n][0])]
+    if not names:
+        print("❌ Không có model nào đã train trong ai/models/.")
+        return 1
+
+    formats = ["onnx", "int8"] if args.format == "all" else [args.format]
+
+    if not args.check_only:
+        for name in names:
+            model_dir, multitask, _ = MODELS[name]
+            for fmt in formats:
+                print(f"🔹 Export {name} -> {fmt}")
+                if fmt == "onnx":
+                    paths = export_onnx(model_dir, multitask, quantize=not args.no_onnx_int8)
+                else:
+                    paths = export_int8(model_dir, multitask)
+                for p in paths:
+                    print(f"   ✅ {p} ({os.path.getsize(p) / 1e6:.1f} MB)")
+
+    ok = True
+    if args.check or args.check_only:
+        for name in names:
+            for backend in ([args.backend] if args.backend else formats):
+                rep = parity_check(name, backend, args.data)
+                print(json.dumps(rep, ensure_ascii=False, indent=2))
+                for h in backends.heads_for(MODELS[name][1]):
+                    if rep[h]["argmax_agreement"] < args.min_agreement:
+                        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
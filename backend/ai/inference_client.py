@@ -0,0 +1,167 @@
+# backend/ai/inference_client.py
+"""
+Client cho ai/inference_server.py — chỉ dùng thư viện chuẩn (tiến trình web không phải import torch).
+
+  client = InferenceClient("unix:///tmp/kssv-ai.sock")       # hoặc "http://127.0.0.1:8765"
+  client.classify_one(text)  /  client.classify_many(texts)   # cùng dạng kết quả với ai.predictor
+
+  - pool tối đa pool_size kết nối keep-alive; hết kết nối rảnh sau `timeout` giây => InferenceBusy
+  - server trả 503 (quá tải) hoặc đọc quá `timeout` giây => InferenceBusy: caller dùng heuristic
+  - không kết nối được => InferenceUnavailable và không thử lại trong retry_s giây (khỏi chờ timeout mỗi lần)
+"""
+from __future__ import annotations
+
+import json
+import queue
+import socket
+import threading
+import time
+import http.client
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+class InferenceUnavailable(RuntimeError):
+    """Không gọi được inference server (không chạy, lỗi kết nối, HTTP lỗi)."""
+
+
+class InferenceBusy(InferenceUnavailable):
+    """Inference server đang quá tải (503 / timeout / hết kết nối trong pool)."""
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.unix_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class InferenceClient:
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 10.0, retry_s: float = 5.0):
+        self.url = url
+        self.timeout = float(timeout)
+        self.retry_s = float(retry_s)
+        parts = urlsplit(url)
+        if parts.scheme == "unix":
+            self._unix: Optional[str] = parts.path
+            self._host, self._port = "", 0
+        elif parts.scheme == "http":
+            self._unix = None
+            self._host, self._port = parts.hostname or "127.0.0.1", parts.port or 80
+        else:
+            raise ValueError(f"AI_SERVER_URL phải là unix:///đường/dẫn.sock hoặc http://host:port, nhận {url!r}")
+
+        self.pool_size = max(1, int(pool_size))
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._down_until = 0.0
+
+        self._stats_lock = threading.Lock()
+        self._counters = {"requests": 0, "ok": 0, "busy": 0, "unavailable": 0, "reconnects": 0}
+
+    # ----- kết nối -----
+    def _new_conn(self) -> http.client.HTTPConnection:
+        if self._unix:
+            return _UnixHTTPConnection(self._unix, self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._counters[key] += 1
+
+    def _roundtrip(self, conn: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes]):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None) -> Dict[str, Any]:
+        self._count("requests")
+        if time.monotonic() < self._down_until:
+            self._count("unavailable")
+            raise InferenceUnavailable(f"inference server {self.url} không phản hồi (đang chờ thử lại)")
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count("busy")
+            raise InferenceBusy("hết kết nối rảnh tới inference server")
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        try:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._new_conn(), False
+            while True:
+                try:
+                    status, data = self._roundtrip(conn, method, path, body)
+                    break
+                except TimeoutError as e:
+                    conn.close()
+                    self._count("busy")
+                    raise InferenceBusy(f"inference server quá {self.timeout:g}s") from e
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    if reused:
+                        # kết nối keep-alive cũ đã bị server đóng => thử lại 1 lần bằng kết nối mới
+                        self._count("reconnects")
+                        conn, reused = self._new_conn(), False
+                        continue
+                    self._down_until = time.monotonic() + self.retry_s
+                    self._count("unavailable")
+                    raise InferenceUnavailable(f"inference server {self.url}: {e}") from e
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+        if status == 503:
+            self._count("busy")
+            raise InferenceBusy("inference server quá tải")
+        try:
+            out = json.loads(data)
+        except ValueError:
+            out = {"detail": data[:200].decode("utf-8", "replace")}
+        if status != 200:
+            self._count("unavailable")
+            raise InferenceUnavailable(f"inference server HTTP {status}: {out.get('detail')}")
+        self._count("ok")
+        return out
+
+    # ----- API (cùng dạng với ai.predictor) -----
+    def classify_many(self, texts: List[str], batch_size: int = 16) -> List[Dict[str, Any]]:
+        if not texts:
+            return []
+        return self._request("POST", "/classify", {"texts": list(texts), "batch_size": batch_size})["results"]
+
+    def classify_one(self, text: str) -> Dict[str, Any]:
+        return self.classify_many([text])[0]
+
+    def server_stats(self) -> Dict[str, Any]:
+        return self._request("GET", "/stats")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out = dict(self._counters)
+        out.update(
+            url=self.url,
+            pool_size=self.pool_size,
+            idle_connections=self._idle.qsize(),
+            down_for_s=round(max(0.0, self._down_until - time.monotonic()), 1),
+        )
+        return out
+
+
+# ================== TEST NHANH ==================
+if __name__ == "__main__":
+    # ví dụ: python -m ai.inference_client unix:///tmp/kssv-ai.sock "phòng 203 mất điện"
+    import sys
+    client = InferenceClient(sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8765")
+    text = sys.argv[2] if len(sys.argv) > 2 else "phòng 302 bóng đèn nhấp nháy 2 ngày"
+    print(json.dumps(client.classify_one(text), ensure_ascii=False, indent=2))
+    print(json.dumps(client.stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,231 @@
+# backend/ai/inference_server.py
+"""
+Inference server chạy tách khỏi tiến trình web (FastAPI): web gửi câu qua Unix socket / HTTP localhost,
+server gọi ai.predictor => phân loại không còn tranh GIL / core với đăng nhập, danh sách, upload
+và có thể tăng / giảm số tiến trình web và AI độc lập trên cùng máy.
+
+  cd backend && python -m ai.inference_server --unix /tmp/kssv-ai.sock
+  cd backend && python -m ai.inference_server --port 8765                 # chỉ nghe 127.0.0.1
+  # phía web: AI_SERVER_URL=unix:///tmp/kssv-ai.sock  (hoặc http://127.0.0.1:8765)
+
+Giao thức: HTTP/1.1 keep-alive, JSON (client: ai/inference_client.py)
+  POST /classify {"texts": [...], "batch_size": 16} -> {"results": [classify_one_full(...), ...]}
+       1 câu => qua micro-batcher (gom các request đồng thời), nhiều câu => classify_many_full
+  GET  /healthz, /readyz (200 sau khi warm-up xong), /stats
+Quá AI_SERVER_MAX_INFLIGHT request đang chạy => 503 ngay (client dùng heuristic thay vì xếp hàng chờ).
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from . import predictor  # type: ignore
+    from .batching import classify_one_coalesced, batcher_stats  # type: ignore
+    from .logging_utils import log_stats  # type: ignore
+except ImportError:
+    import predictor  # type: ignore
+    from batching import classify_one_coalesced, batcher_stats  # type: ignore
+    from logging_utils import log_stats  # type: ignore
+
+logger = logging.getLogger("ai.inference_server")
+
+# ================== CẤU HÌNH ==================
+MAX_INFLIGHT  = int(os.environ.get("AI_SERVER_MAX_INFLIGHT", "32"))
+MAX_TEXTS     = int(os.environ.get("AI_SERVER_MAX_TEXTS", "512"))
+IDLE_TIMEOUT  = float(os.environ.get("AI_SERVER_IDLE_S", "60"))    # đóng kết nối keep-alive im lặng quá lâu
+MAX_BODY      = 4 * 1024 * 1024
+
+
+class _State:
+    def __init__(self, max_inflight: int):
+        self.slots = threading.BoundedSemaphore(max(1, max_inflight))
+        self.max_inflight = max(1, max_inflight)
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.requests = 0
+        self.texts = 0
+        self.busy = 0
+        self.errors = 0
+        self.run_sum_ms = 0.0
+        self.ready = False
+        self.warmup: Optional[Dict[str, Any]] = None
+        self.started_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            done = self.requests - self.errors
+            return {
+                "ready": self.ready,
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "requests": self.requests,
+                "texts": self.texts,
+                "rejected_busy": self.busy,
+                "errors": self.errors,
+                "avg_run_ms": round(self.run_sum_ms / done, 3) if done > 0 else 0.0,
+                "warmup": self.warmup,
+            }
+
+
+STATE = _State(MAX_INFLIGHT)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: client giữ pool kết nối
+    timeout = IDLE_TIMEOUT
+    server_version = "kssv-ai/1"
+
+    # ----- tiện ích -----
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def log_message(self, fmt: str, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        n = int(self.headers.get("Content-Length") or 0)
+        if n <= 0 or n > MAX_BODY:
+            return None, "Content-Length không hợp lệ"
+        try:
+            return json.loads(self.rfile.read(n)), None
+        except ValueError:
+            return None, "JSON không hợp lệ"
+
+    # ----- route -----
+    def do_GET(self) -> None:
+        if self.path == "/healthz":
+            self._send(200, {"ok": True})
+        elif self.path == "/readyz":
+            self._send(200 if STATE.ready else 503, {"ready": STATE.ready, "warmup": STATE.warmup})
+        elif self.path == "/stats":
+            self._send(200, {"server": STATE.stats(), "batcher": batcher_stats(),
+                             "cache": predictor.cache_stats(), "infer": predictor.infer_stats(),
+                             "predlog": log_stats()})
+        else:
+            self._send(404, {"detail": "Not Found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/classify":
+            self._send(404, {"detail": "Not Found"})
+            return
+        payload, err = self._read_json()
+        if err is None:
+            texts = payload.get("texts") if isinstance(payload, dict) else None
+            if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+                err = "texts phải là danh sách chuỗi khác rỗng"
+            elif len(texts) > MAX_TEXTS:
+                err = f"tối đa {MAX_TEXTS} câu / request"
+        if err is not None:
+            self._send(400, {"detail": err})
+            return
+
+        if not STATE.slots.acquire(blocking=False):
+            with STATE.lock:
+                STATE.busy += 1
+            self._send(503, {"detail": "busy"}, {"Retry-After": "1"})
+            return
+        with STATE.lock:
+            STATE.inflight += 1
+        started = time.perf_counter()
+        ok = False
+        try:
+            if len(texts) == 1:
+                results = [classify_one_coalesced(texts[0])]
+            else:
+                bs = max(1, min(64, int(payload.get("batch_size") or predictor.DEFAULT_BATCH_SIZE)))
+                results = predictor.classify_many_full(texts, batch_size=bs)
+            ok = True
+        except Exception as e:
+            logger.exception("[inference] classify lỗi")
+            results, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            STATE.slots.release()
+            with STATE.lock:
+                STATE.inflight -= 1
+                STATE.requests += 1
+                STATE.texts += len(texts)
+                if ok:
+                    STATE.run_sum_ms += (time.perf_counter() - started) * 1000.0
+                else:
+                    STATE.errors += 1
+        if ok:
+            self._send(200, {"results": results})
+        else:
+            self._send(500, {"detail": error})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(unix: Optional[str] = None, host: str = "127.0.0.1", port: int = 8765):
+    if unix:
+        if os.path.exists(unix):
+            os.remove(unix)   # socket cũ của lần chạy trước
+        srv = UnixHTTPServer(unix, Handler)
+        os.chmod(unix, 0o660)   # chỉ user / group chạy web kết nối được
+        return srv
+    srv = ThreadingHTTPServer((host, port), Handler)
+    srv.daemon_threads = True
+    return srv
+
+
+def _warmup() -> None:
+    try:
+        STATE.warmup = predictor.warmup()
+        STATE.ready = True
+        logger.info(f"[inference] sẵn sàng, warm-up {STATE.warmup['total_ms']:.0f} ms")
+    except Exception as e:
+        STATE.warmup = {"error": f"{type(e).__name__}: {e}"}
+        logger.exception("[inference] warm-up lỗi")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inference server cho ai.predictor (Unix socket / HTTP localhost)")
+    parser.add_argument("--unix", default=os.environ.get("AI_SERVER_SOCKET"), help="Đường dẫn Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AI_SERVER_PORT", "8765")))
+    parser.add_argument("--no-warmup", action="store_true", help="Không nạp model trước (nạp ở request đầu)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.no_warmup:
+        STATE.ready = True
+    else:
+        _warmup()   # nạp xong rồi mới nhận kết nối: client gặp lỗi kết nối => fallback, không phải chờ
+    srv = make_server(args.unix, args.host, args.port)
+    where = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    logger.info(f"[inference] nghe {where}, tối đa {MAX_INFLIGHT} request đồng thời")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,455 @@
 # backend/ai/logging_utils.py
+"""
+Log dự đoán KHÔNG chặn suy luận.
+
+  - log_prediction(...) chỉ chụp lại các trường cần ghi rồi đưa vào hàng đợi giới hạn
+    PRED_LOG_QUEUE_SIZE (đầy => bỏ bản ghi, tăng bộ đếm dropped) — không mở file trên luồng gọi
+  - thread nền "ai-predlog" gom lô, ghi khi đủ PRED_LOG_BATCH bản ghi hoặc sau PRED_LOG_FLUSH_S giây
+  - sink (PRED_LOG_FORMAT, có thể ghép nhiều: "csv,ndjson"):
+      csv     : prediction_logs-YYYYMMDD-HHMMSS-<pid>.csv, cột như prediction_logs.csv cũ
+                (timestamp, text, label, confidence, phong, tang, thoigian)
+      ndjson  : logs/predictions-YYYYMMDD-HHMMSS-<pid>.ndjson.gz — đủ kết quả (probs nhãn / priority,
+                meta, model_version, backend, latency_ms, cached); mỗi lần ghi thêm 1 gzip member
+      parquet : logs/predictions-YYYYMMDD-HHMMSS-<pid>.parquet (cần pyarrow, thiếu => ndjson)
+    (kèm pid: nhiều worker không ghi chung / không cùng xoay 1 file)
+  - xoay file khi vượt PRED_LOG_MAX_MB hoặc sang ngày mới; giữ PRED_LOG_BACKUPS file cũ / sink
+  - PRED_LOG=0 tắt hẳn; stop() / atexit ghi nốt phần còn trong hàng đợi
+
+Đọc lại log: pandas.read_json("...ndjson.gz", lines=True) / pandas.read_parquet(thư mục logs).
+"""
+from __future__ import annotations
+
 import os
 import csv
+import glob
+import gzip
+import json
+import queue
+import atexit
+import logging
+import threading
+import time
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ================== CẤU HÌNH ==================
+_THIS_DIR = os.path.dirname(__file__)
+CSV_DIR   = _THIS_DIR
+LOG_DIR   = os.environ.get("PRED_LOG_DIR", os.path.join(_THIS_DIR, "logs"))
+
+PRED_LOG_ENABLED = os.environ.get("PRED_LOG", "1") in ("1", "true", "True")
+PRED_LOG_FORMATS = tuple(
+    f.strip().lower() for f in os.environ.get("PRED_LOG_FORMAT", "csv").split(",") if f.strip()
+)
+QUEUE_SIZE = int(os.environ.get("PRED_LOG_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.environ.get("PRED_LOG_BATCH", "256"))
+FLUSH_S    = float(os.environ.get("PRED_LOG_FLUSH_S", "2"))
+MAX_BYTES  = int(float(os.environ.get("PRED_LOG_MAX_MB", "50")) * 1024 * 1024)
+BACKUPS    = int(os.environ.get("PRED_LOG_BACKUPS", "10"))
+
+CSV_HEADER = ["timestamp", "text", "label", "confidence", "phong", "tang", "thoigian"]
+
+
+# ================== SINK ==================
+def _prune(pattern: str, keep: int) -> None:
+    """
+    Giữ file hiện tại + `keep` file mới nhất khớp pattern (tên có ngày giờ => sắp theo tên).
+    File vừa được ghi trong 24h không xoá: có thể là file đang mở của worker khác.
+    """
+    files = sorted(glob.glob(pattern))
+    cutoff = time.time() - 86400
+    for old in files[: max(0, len(files) - keep - 1)]:
+        try:
+            if os.path.getmtime(old) < cutoff:
+                os.remove(old)
+        except OSError:
+            pass
+
+
+def _new_path(log_dir: str, prefix: str, suffix: str) -> str:
+    return os.path.join(log_dir, f"{prefix}{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}{suffix}")
+
+
+class _CsvSink:
+    """
+    prediction_logs-YYYYMMDD-HHMMSS-<pid>.csv cạnh module (cột như prediction_logs.csv cũ), mỗi file có header.
+    Kèm pid như ndjson / parquet: nhiều worker gunicorn không chen dòng vào cùng 1 file, không cùng xoay 1 file.
+    """
 
-LOG_PATH = os.path.join(os.path.dirname(__file__), "prediction_logs.csv")
-
-def log_prediction(text: str, label: str, confidence: float, info: dict):
-    """
-    Ghi lại log dự đoán vào file CSV.
-    Mỗi dòng gồm: thời gian, phản ánh, nhãn dự đoán, độ tin cậy, thông tin trích xuất.
-    (Đã bỏ cột 'khu' theo yêu cầu)
-    """
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    file_exists = os.path.exists(LOG_PATH)
-
-    with open(LOG_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        # Nếu file mới → ghi header
-        if not file_exists:
-            writer.writerow(["timestamp", "text", "label", "confidence", "phong", "tang", "thoigian"])
-        writer.writerow([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            text,
-            label,
-            f"{confidence:.4f}",
-            info.get("phong", ""),
-            info.get("tang", ""),
-            info.get("thoigian", "")
+    name = "csv"
+    prefix = "prediction_logs-"
+    suffix = ".csv"
+
+    def __init__(self, log_dir: str = CSV_DIR):
+        self.log_dir = log_dir
+        self.path: Optional[str] = None
+        self.day = ""
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        day = datetime.now().strftime("%Y%m%d")
+        new_file = self.path is None or day != self.day or os.path.getsize(self.path) >= MAX_BYTES
+        if new_file:
+            self.day = day
+            self.path = _new_path(self.log_dir, self.prefix, self.suffix)
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(CSV_HEADER)
+            for r in records:
+                meta = r.get("meta") or {}
+                conf = r.get("label_confidence")
+                writer.writerow([
+                    r["ts"][:19].replace("T", " "),
+                    r.get("text", ""),
+                    r.get("label") or "",
+                    f"{conf:.4f}" if conf is not None else "",
+                    meta.get("phong") or "",
+                    meta.get("tang") or "",
+                    meta.get("thoigian") or "",
+                ])
+        if new_file:
+            _prune(os.path.join(self.log_dir, f"{self.prefix}*{self.suffix}"), BACKUPS)
+
+    def close(self) -> None:
+        pass
+
+
+class _NdjsonSink:
+    """logs/predictions-YYYYMMDD-HHMMSS-<pid>.ndjson.gz, 1 dòng JSON / dự đoán."""
+
+    name = "ndjson"
+    prefix = "predictions-"
+    suffix = ".ndjson.gz"
+
+    def __init__(self, log_dir: str = LOG_DIR):
+        self.log_dir = log_dir
+        self.path: Optional[str] = None
+        self.day = ""
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        day = datetime.now().strftime("%Y%m%d")
+        if self.path is None or day != self.day or os.path.getsize(self.path) >= MAX_BYTES:
+            self.day = day
+            self.path = _new_path(self.log_dir, self.prefix, self.suffix)
+            open(self.path, "ab").close()
+            _prune(os.path.join(self.log_dir, f"{self.prefix}*{self.suffix}"), BACKUPS)
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        with gzip.open(self.path, "ab", compresslevel=6) as f:
+            f.write(data.encode("utf-8"))
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetSink:
+    """
+    logs/predictions-YYYYMMDD-HHMMSS-<pid>.parquet; giữ 1 ParquetWriter mở, mỗi lần ghi = 1 row group.
+    Sang ngày mới / vượt MAX_BYTES / stop() => đóng file (footer được ghi lúc đóng) rồi mở file mới.
+    """
+
+    name = "parquet"
+    prefix = "predictions-"
+    suffix = ".parquet"
+
+    def __init__(self, log_dir: str = LOG_DIR):
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+        self.pa, self.pq = pa, pq
+        self.log_dir = log_dir
+        self.writer = None
+        self.path: Optional[str] = None
+        self.day = ""
+        probs = pa.map_(pa.string(), pa.float64())
+        self.schema = pa.schema([
+            ("ts", pa.string()),
+            ("text", pa.string()),
+            ("normalized", pa.string()),
+            ("label", pa.string()),
+            ("label_confidence", pa.float64()),
+            ("priority", pa.string()),
+            ("priority_confidence", pa.float64()),
+            ("probs_label", probs),
+            ("probs_priority", probs),
+            ("meta", pa.map_(pa.string(), pa.string())),
+            ("model_version", pa.string()),
+            ("backend", pa.string()),
+            ("latency_ms", pa.float64()),
+            ("cached", pa.bool_()),
+            ("batch", pa.int32()),
         ])
+
+    def _open(self) -> None:
+        self.day = datetime.now().strftime("%Y%m%d")
+        self.path = _new_path(self.log_dir, self.prefix, self.suffix)
+        self.writer = self.pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        _prune(os.path.join(self.log_dir, f"{self.prefix}*{self.suffix}"), BACKUPS)
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        if self.writer is not None and (
+            datetime.now().strftime("%Y%m%d") != self.day or os.path.getsize(self.path) >= MAX_BYTES
+        ):
+            self.close()
+        if self.writer is None:
+            self._open()
+        cols: Dict[str, list] = {name: [] for name in self.schema.names}
+        for r in records:
+            for name in self.schema.names:
+                v = r.get(name)
+                if isinstance(v, dict):   # map<string, ...>: pyarrow nhận list (key, value)
+                    v = [(str(k), val) for k, val in v.items()]
+                cols[name].append(v)
+        self.writer.write_table(self.pa.Table.from_pydict(cols, schema=self.schema))
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _make_sinks(formats) -> List[Any]:
+    sinks: List[Any] = []
+    for fmt in formats:
+        if fmt == "csv":
+            sinks.append(_CsvSink())
+        elif fmt == "parquet":
+            try:
+                sinks.append(_ParquetSink())
+            except ImportError:
+                logger.warning("[predlog] thiếu pyarrow -> ghi ndjson.gz thay cho parquet")
+                sinks.append(_NdjsonSink())
+        elif fmt in ("ndjson", "jsonl", "json"):
+            sinks.append(_NdjsonSink())
+        else:
+            logger.warning(f"[predlog] PRED_LOG_FORMAT không hỗ trợ: {fmt!r}")
+    return sinks
+
+
+# ================== WRITER NỀN ==================
+class PredictionLogWriter:
+    """
+    Hàng đợi giới hạn + 1 thread gom lô ghi ra các sink:
+      - put(record) không bao giờ chặn (đầy => False, đếm dropped)
+      - ghi khi đủ batch_size bản ghi hoặc bản ghi cũ nhất đã chờ flush_s giây
+      - lỗi ghi của 1 sink chỉ bị log lại, không ảnh hưởng sink khác / luồng suy luận
+    """
+
+    def __init__(
+        self,
+        sinks: List[Any],
+        queue_size: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_s: float = FLUSH_S,
+    ):
+        self.sinks = sinks
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(0.05, float(flush_s))
+        self._q: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._n_queued = 0
+        self._n_written = 0
+        self._n_dropped = 0
+        self._n_errors = 0
+        self._n_flushes = 0
+        self._flush_sum_ms = 0.0
+
+    # ----- API -----
+    def put(self, record: Dict[str, Any]) -> bool:
+        if self._stopped.is_set():
+            return False
+        self._ensure_started()
+        try:
+            self._q.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self._n_dropped += 1
+            return False
+        with self._stats_lock:
+            self._n_queued += 1
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ghi nốt phần còn trong hàng đợi rồi đóng sink (đợi tối đa timeout giây)."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        t = self._thread
+        if t is not None and t.is_alive():
+            self._q.put(None)
+            t.join(timeout)
+        else:
+            self._close_sinks()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "enabled": True,
+                "formats": [s.name for s in self.sinks],
+                "queue_depth": self._q.qsize(),
+                "queue_size": self._q.maxsize,
+                "queued": self._n_queued,
+                "written": self._n_written,
+                "dropped": self._n_dropped,
+                "errors": self._n_errors,
+                "flushes": self._n_flushes,
+                "avg_flush_ms": round(self._flush_sum_ms / self._n_flushes, 3) if self._n_flushes else 0.0,
+            }
+
+    # ----- worker -----
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="ai-predlog", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = False   # hết thời gian chờ => ghi lô đang có
+            if item is None:   # stop()
+                self._flush(batch)
+                self._close_sinks()
+                return
+            if item is not False:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_s
+                batch.append(item)
+            if batch and (item is False or len(batch) >= self.batch_size):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        errors = 0
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                errors += 1
+                logger.warning(f"[predlog] ghi {type(sink).__name__} lỗi: {e}")
+        with self._stats_lock:
+            self._n_written += len(batch)
+            self._n_errors += errors
+            self._n_flushes += 1
+            self._flush_sum_ms += (time.perf_counter() - started) * 1000.0
+
+    def _close_sinks(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.warning(f"[predlog] đóng {type(sink).__name__} lỗi: {e}")
+
+
+# ================== SINGLETON ==================
+_WRITER: Optional[PredictionLogWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+def get_writer() -> PredictionLogWriter:
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = PredictionLogWriter(_make_sinks(PRED_LOG_FORMATS))
+                atexit.register(_WRITER.stop)
+    return _WRITER
+
+
+def _probs(d: Any) -> Optional[Dict[str, float]]:
+    return {str(k): float(v) for k, v in d.items()} if isinstance(d, dict) else None
+
+
+def log_prediction(
+    text: str,
+    label: Optional[str] = None,
+    confidence: Optional[float] = None,
+    info: Optional[dict] = None,
+    *,
+    normalized: Optional[str] = None,
+    result: Optional[Dict[str, Any]] = None,
+    model_version: Optional[str] = None,
+    backend: Optional[str] = None,
+    latency_ms: Optional[float] = None,
+    cached: Optional[bool] = None,
+    batch: Optional[int] = None,
+) -> bool:
+    """
+    Đưa 1 dự đoán vào hàng đợi log (không chặn). Trả về False nếu log tắt / hàng đợi đầy.
+      - predictor: log_prediction(text, normalized=..., result=..., model_version=..., latency_ms=...)
+      - kiểu cũ (classifier.py --log): log_prediction(text, label, confidence, info)
+    Bản ghi được chụp lại ngay (result trong cache có thể bị sửa sau đó).
+    """
+    if not PRED_LOG_ENABLED:
+        return False
+    res = result or {}
+    info = info or {}
+    if result is not None:
+        label, confidence, meta = res.get("label"), res.get("label_confidence"), res.get("meta")
+    else:
+        meta = info.get("meta", info)
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "text": text,
+        "normalized": normalized,
+        "label": label,
+        "label_confidence": float(confidence) if confidence is not None else None,
+        "priority": res.get("priority"),
+        "priority_confidence": res.get("priority_confidence"),
+        "probs_label": _probs(res.get("probs_label")),
+        "probs_priority": _probs(res.get("probs_priority")),
+        "meta": {k: str(v) for k, v in (meta or {}).items() if v is not None and not isinstance(v, (dict, list))},
+        "model_version": model_version,
+        "backend": backend,
+        "latency_ms": round(float(latency_ms), 3) if latency_ms is not None else None,
+        "cached": cached,
+        "batch": batch,
+    }
+    return get_writer().put(record)
+
+
+def stop() -> None:
+    if _WRITER is not None:
+        _WRITER.stop()
+
+
+def log_stats() -> Dict[str, Any]:
+    if not PRED_LOG_ENABLED:
+        return {"enabled": False}
+    return get_writer().stats()
+
+
+# ================== TEST NHANH ==================
+if __name__ == "__main__":
+    # ví dụ: PRED_LOG_FORMAT=csv,ndjson,parquet python -m ai.logging_utils
+    n = 5_000
+    fake = {
+        "label": "điện", "label_confidence": 0.93, "priority": "high", "priority_confidence": 0.81,
+        "probs_label": {"điện": 0.93, "nước": 0.04, "khác": 0.03},
+        "probs_priority": {"low": 0.05, "medium": 0.14, "high": 0.81},
+        "meta": {"toanha": None, "phong": "203", "tang": "2", "thoigian": "tối qua"},
+    }
+    t0 = time.perf_counter()
+    for i in range(n):
+        log_prediction(f"phòng 203 mất điện #{i}", normalized="phòng 203 mất điện", result=fake,
+                       model_version="test", backend="torch", latency_ms=12.5, cached=False, batch=1)
+    enq_us = (time.perf_counter() - t0) / n * 1e6
+    stop()
+    print(f"enqueue: {enq_us:.2f} µs/bản ghi")
+    print(json.dumps(log_stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,133 @@
+# backend/ai/multitask_model.py
+from __future__ import annotations
+
+import os
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import torch  # type: ignore
+import torch.nn as nn  # type: ignore
+from transformers import AutoConfig, AutoModel  # type: ignore
+from transformers.utils import ModelOutput  # type: ignore
+
+# Tem nhận dạng trong task_type.json (predictor dựa vào đây để nạp đúng model)
+TASK_TYPE_MULTITASK = "multitask_label_priority"
+
+HEADS_FILE  = "heads.pt"
+CONFIG_FILE = "multitask_config.json"
+
+
+@dataclass
+class MultiTaskOutput(ModelOutput):
+    loss: Optional[torch.Tensor] = None
+    logits: Optional[torch.Tensor] = None        # 6 nhãn sự cố
+    prio_logits: Optional[torch.Tensor] = None   # 3 mức ưu tiên
+
+
+class _ClassificationHead(nn.Module):
+    """Giống RobertaClassificationHead: lấy token <s>, dense + tanh + dropout + out_proj."""
+
+    def __init__(self, hidden_size: int, num_labels: int, dropout: float):
+        super().__init__()
+        self.dense = nn.Linear(hidden_size, hidden_size)
+        self.dropout = nn.Dropout(dropout)
+        self.out_proj = nn.Linear(hidden_size, num_labels)
+
+    def forward(self, hidden: torch.Tensor) -> torch.Tensor:
+        x = hidden[:, 0, :]
+        x = self.dropout(x)
+        x = torch.tanh(self.dense(x))
+        x = self.dropout(x)
+        return self.out_proj(x)
+
+
+class PhoBertMultiTask(nn.Module):
+    """
+    1 encoder PhoBERT dùng chung + 2 head:
+      - label_head: 6 nhãn sự cố
+      - prio_head : 3 mức ưu tiên
+    => 1 lần forward cho ra cả nhãn lẫn priority.
+    """
+
+    def __init__(self, encoder, num_labels: int, num_priorities: int,
+                 dropout: float = 0.1, prio_loss_weight: float = 1.0,
+                 prio_class_weights: Optional[torch.Tensor] = None):
+        super().__init__()
+        self.encoder = encoder
+        self.config = encoder.config
+        hidden = encoder.config.hidden_size
+        self.num_labels = num_labels
+        self.num_priorities = num_priorities
+        self.dropout = dropout
+        self.prio_loss_weight = prio_loss_weight
+        self.label_head = _ClassificationHead(hidden, num_labels, dropout)
+        self.prio_head = _ClassificationHead(hidden, num_priorities, dropout)
+        if prio_class_weights is not None:
+            self.register_buffer("prio_class_weights", prio_class_weights.float(), persistent=False)
+        else:
+            self.prio_class_weights = None
+
+    def forward(self, input_ids=None, attention_mask=None, labels=None, prio_labels=None, **kwargs):
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        logits = self.label_head(hidden)
+        prio_logits = self.prio_head(hidden)
+
+        loss = None
+        if labels is not None and prio_labels is not None:
+            ce = nn.CrossEntropyLoss()
+            ce_prio = nn.CrossEntropyLoss(weight=self.prio_class_weights)
+            loss = ce(logits.view(-1, self.num_labels), labels.view(-1)) \
+                + self.prio_loss_weight * ce_prio(prio_logits.view(-1, self.num_priorities), prio_labels.view(-1))
+
+        return MultiTaskOutput(loss=loss, logits=logits, prio_logits=prio_logits)
+
+    # ----- lưu / nạp -----
+    def save_pretrained(self, out_dir: str) -> None:
+        os.makedirs(out_dir, exist_ok=True)
+        self.encoder.save_pretrained(out_dir)
+        heads = {f"label_head.{k}": v for k, v in self.label_head.state_dict().items()}
+        heads.update({f"prio_head.{k}": v for k, v in self.prio_head.state_dict().items()})
+        torch.save(heads, os.path.join(out_dir, HEADS_FILE))
+        with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"num_labels": self.num_labels, "num_priorities": self.num_priorities, "dropout": self.dropout},
+                f, ensure_ascii=False, indent=2,
+            )
+
+    @classmethod
+    def from_pretrained(cls, model_dir: str) -> "PhoBertMultiTask":
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        encoder = AutoModel.from_pretrained(model_dir, add_pooling_layer=False)
+        model = cls(encoder, int(cfg["num_labels"]), int(cfg["num_priorities"]), float(cfg.get("dropout", 0.1)))
+        model.load_heads(model_dir)
+        return model
+
+    def load_heads(self, model_dir: str, assign: bool = False) -> None:
+        """
+        Nạp trọng số 2 head từ heads.pt (encoder nạp riêng).
+        assign=True: thay hẳn tham số bằng tensor đã nạp (khung dựng trên device meta, xem backends.load_fp32_mmap).
+        """
+        heads = torch.load(os.path.join(model_dir, HEADS_FILE), map_location="cpu", weights_only=True)
+        self.label_head.load_state_dict(
+            {k[len("label_head."):]: v for k, v in heads.items() if k.startswith("label_head.")}, assign=assign
+        )
+        self.prio_head.load_state_dict(
+            {k[len("prio_head."):]: v for k, v in heads.items() if k.startswith("prio_head.")}, assign=assign
+        )
+
+    @classmethod
+    def from_config(cls, model_dir: str) -> "PhoBertMultiTask":
+        """Khung model đúng kiến trúc nhưng CHƯA nạp trọng số (dùng khi nạp bản INT8 đã lưu)."""
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        encoder = AutoModel.from_config(AutoConfig.from_pretrained(model_dir), add_pooling_layer=False)
+        return cls(encoder, int(cfg["num_labels"]), int(cfg["num_priorities"]), float(cfg.get("dropout", 0.1)))
+
+    @classmethod
+    def from_base(cls, model_name: str, num_labels: int, num_priorities: int, **kwargs) -> "PhoBertMultiTask":
+        """Khởi tạo từ encoder gốc (vd vinai/phobert-base) để huấn luyện."""
+        config = AutoConfig.from_pretrained(model_name)
+        encoder = AutoModel.from_pretrained(model_name, config=config, add_pooling_layer=False)
+        return cls(encoder, num_labels, num_priorities, **kwargs)
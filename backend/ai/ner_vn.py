@@ -1,8 +1,22 @@
 # backend/ai/ner_vn.py
+"""
+Trích xuất toà / phòng / tầng / thời gian từ câu phản ánh (chạy cho mọi câu được phân loại).
+
+extract_info dùng các pattern biên dịch sẵn lúc import:
+  - 4 pattern phòng (toà+phòng rồi 3 biến thể) và 20 pattern thời gian được gộp thành
+    1 regex alternation / nhóm; _FirstOf giữ đúng thứ tự ưu tiên của vòng `for p in patterns`
+    cũ (pattern đứng trước thắng dù khớp ở vị trí sau trong câu)
+  - câu không chứa từ khoá thời gian nào (qua/nay/kia/sáng/ngày/hôm) bỏ qua hẳn nhóm thời gian
+  - extract_many: nhiều câu một lượt, câu trùng chỉ trích 1 lần
+
+Khớp với bản gốc (lần lượt re.search từng pattern): backend/tests/test_ner.py
+(mẫu cố định + Datakssv.csv thô / đã chuẩn hoá + câu ngẫu nhiên).
+"""
 from __future__ import annotations
 
 import re
-from typing import Dict, Optional
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 # ======= Số đếm tiếng Việt cơ bản -> số =======
 VI_NUM = {
@@ -15,6 +29,8 @@ def _word_to_num(w: str) -> Optional[int]:
     return VI_NUM.get(w)
 
 # ======= Helpers =======
+_RE_ROOM_TAIL = re.compile(r'(\d{3,4})$')
+
 def _clean_room_token(s: str) -> str:
     """Loại bỏ khoảng trắng / '-' trong chuỗi phòng, chuẩn hoá chữ hoa."""
     return s.replace(" ", "").replace("-", "").upper()
@@ -54,7 +70,7 @@ def _infer_floor_from_room(room: str) -> Optional[str]:
         digits = "".join(ch for ch in tail if ch.isdigit())
     else:
         # Lấy 3–4 chữ số cuối nếu có
-        m = re.search(r'(\d{3,4})$', s)
+        m = _RE_ROOM_TAIL.search(s)
         if m:
             digits = m.group(1)
         else:
@@ -62,6 +78,119 @@ def _infer_floor_from_room(room: str) -> Optional[str]:
             digits = "".join(ch for ch in s if ch.isdigit())
     return _floor_from_digits(digits)
 
+# ======= Pattern (biên dịch 1 lần) =======
+_I = re.IGNORECASE
+_NUM_WORDS = "một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười"
+
+
+class _FirstOf:
+    """
+    Thay cho:  for i, p in enumerate(patterns): m = re.search(p, txt, flags); if m: ...
+    => trả về (i, groups của pattern i) với i NHỎ NHẤT có khớp ở bất kỳ đâu trong câu.
+
+    Mỗi pattern được bọc 1 group ngoài rồi ghép alternation: _fused[k] = patterns[:k+1].
+    Tìm match trái nhất của cả nhóm (alt i tại vị trí p); pattern ưu tiên hơn (< i) không khớp
+    trước p, nên chỉ cần tìm tiếp _fused[i-1] từ p+1 — thường 0-1 lần tìm thêm.
+    """
+
+    def __init__(self, patterns: Sequence[str], flags: int = 0):
+        self.patterns = [re.compile(p, flags) for p in patterns]
+        self._alt_of: Dict[int, int] = {}          # số thứ tự group bọc ngoài -> chỉ số pattern
+        self._span: List[Tuple[int, int]] = []     # pattern i -> lát cắt groups() của riêng nó
+        self._fused: List[re.Pattern] = []
+        parts, g = [], 1
+        for i, c in enumerate(self.patterns):
+            self._alt_of[g] = i
+            self._span.append((g, g + c.groups))
+            parts.append(f"({c.pattern})")
+            g += 1 + c.groups
+            self._fused.append(re.compile("|".join(parts), flags))
+
+    def search(self, txt: str) -> Optional[Tuple[int, Tuple[Optional[str], ...]]]:
+        m = self._fused[-1].search(txt)
+        if m is None:
+            return None
+        i = self._alt_of[m.lastindex]
+        while i:
+            m2 = self._fused[i - 1].search(txt, m.start() + 1)
+            if m2 is None:
+                break
+            m, i = m2, self._alt_of[m2.lastindex]
+        a, b = self._span[i]
+        return i, m.groups()[a:b]
+
+
+# ---- Phòng: toà + phòng (B3-402 / b3 402 / B3.402) trước, rồi các biến thể thường gặp ----
+_ROOM = _FirstOf([
+    r'\b([A-Za-z]\d)[\-\s\.]?(\d{3,4})\b',
+    r"(?:phòng|phong|p\.?)\s*(?:khách\s*sạn\s*sinh\s*viên|kssv)?\s*[-:\s]?([A-Za-z]?\d{2,4}[A-Za-z]?)",
+    r"\bKSSV\s*[-:\s]?(\d{2,4})\b",
+    r"\bP\s*\.?\s*([A-Za-z]?\d{2,4}[A-Za-z]?)\b",
+], _I)
+
+_RE_TANG = re.compile(r"tầng\s*(\d{1,2})\b", _I)
+
+# ---- Thời gian: (pattern, hàm groups -> chuỗi | None), đúng thứ tự ưu tiên cũ ----
+def _lit(g):
+    return g[0].lower().strip()
+
+def _days_ago(g):
+    return f"{int(g[0])} ngày trước"
+
+def _days_recent(g):
+    return f"{int(g[0])} ngày gần đây"
+
+def _word_ago(g):
+    num = _word_to_num(g[0])
+    return f"{num} ngày trước" if num else None
+
+def _word_recent(g):
+    num = _word_to_num(g[0])
+    return f"{num} ngày gần đây" if num else None
+
+_TIME_RULES: List[Tuple[str, Callable[[tuple], Optional[str]]]] = [
+    *((p, _lit) for p in (
+        r"(từ\s*tối\s*qua)", r"(tối\s*qua)", r"(đêm\s*qua)", r"(chiều\s*hôm\s*qua)", r"(hôm\s*qua)",
+        r"(hôm\s*kia)", r"(sáng\s*nay)", r"(trưa\s*nay)", r"(chiều\s*nay)", r"(tối\s*nay)", r"(hôm\s*nay)",
+        r"(từ\s*sáng)",
+    )),
+    (r"(ngày\s*\d{1,2}/\d{1,2}(?:/\d{2,4})?)", _lit),
+    (r"cách\s*đây\s*(\d{1,2})\s*(ngày|hôm)\b", _days_ago),
+    (r"\b(\d{1,2})\s*(ngày|hôm)\s*trước\b", _days_ago),
+    (r"\b(\d{1,2})\s*(ngày|hôm)\s*nay\b", _days_recent),
+    (r"\b(\d{1,2})\s*(ngày|hôm)\b", _days_recent),
+    (rf"\b({_NUM_WORDS})\s*(ngày|hôm)\s*trước\b", _word_ago),
+    (rf"\b({_NUM_WORDS})\s*(ngày|hôm)\s*nay\b", _word_recent),
+    (rf"\b({_NUM_WORDS})\s*(ngày|hôm)\b", _word_recent),
+    (r"\b(mấy|vài)\s*hôm\s*nay\b", lambda g: "gần đây"),
+]
+_TIME = _FirstOf([p for p, _ in _TIME_RULES], _I)
+_TIME_FNS = [fn for _, fn in _TIME_RULES]
+# Mọi pattern thời gian đều chứa 1 trong các từ này (so khớp IGNORECASE giống pattern, không dùng .lower())
+_TIME_HINT = re.compile(r"qua|nay|kia|sáng|ngày|hôm", _I)
+
+
+def _extract_time(txt: str) -> Optional[str]:
+    if not _TIME_HINT.search(txt):
+        return None
+    hit = _TIME.search(txt)
+    if hit is None:
+        return None
+    i, groups = hit
+    val = _TIME_FNS[i](groups)
+    if val is not None:
+        return val
+    # Hiếm: số bằng chữ khớp regex nhưng không tra được VI_NUM (vd chữ hoa Unicode lạ)
+    # -> xét tiếp lần lượt các pattern sau như bản gốc
+    for j in range(i + 1, len(_TIME_RULES)):
+        m = _TIME.patterns[j].search(txt)
+        if m:
+            val = _TIME_FNS[j](m.groups())
+            if val is not None:
+                return val
+    return None
+
+
 # ======= Main extractor =======
 def extract_info(text: str) -> Dict[str, Optional[str]]:
     """
@@ -74,104 +203,46 @@ def extract_info(text: str) -> Dict[str, Optional[str]]:
     info: Dict[str, Optional[str]] = {"toanha": None, "phong": None, "tang": None, "thoigian": None}
     txt = text.strip()
 
-    # --------- PHÒNG (ưu tiên toà + phòng: B3-402 / b3 402 / B3.402) ----------
-    m_build = re.search(r'\b([A-Za-z]\d)[\-\s\.]?(\d{3,4})\b', txt, flags=re.IGNORECASE)
-    if m_build:
-        info["toanha"] = m_build.group(1).upper()      # B3
-        room_digits = m_build.group(2)                  # 402 / 1001
-        info["phong"] = room_digits
-    else:
-        # Các biến thể thường gặp
-        room_patterns = [
-            r"(?:phòng|phong|p\.?)\s*(?:khách\s*sạn\s*sinh\s*viên|kssv)?\s*[-:\s]?([A-Za-z]?\d{2,4}[A-Za-z]?)",
-            r"\bKSSV\s*[-:\s]?(\d{2,4})\b",
-            r"\bP\s*\.?\s*([A-Za-z]?\d{2,4}[A-Za-z]?)\b",
-        ]
-        for pat in room_patterns:
-            m = re.search(pat, txt, flags=re.IGNORECASE)
-            if m:
-                info["phong"] = _clean_room_token(m.group(1))
-                break
+    # --------- PHÒNG ----------
+    hit = _ROOM.search(txt)
+    if hit is not None:
+        i, groups = hit
+        if i == 0:
+            info["toanha"] = groups[0].upper()      # B3
+            info["phong"] = groups[1]               # 402 / 1001
+        else:
+            info["phong"] = _clean_room_token(groups[0])
 
     # --------- TẦNG ----------
     # Ưu tiên 'tầng X', nếu không thì suy từ 'phong'
-    m_tang = re.search(r"tầng\s*(\d{1,2})\b", txt, flags=re.IGNORECASE)
+    m_tang = _RE_TANG.search(txt)
     if m_tang:
         info["tang"] = m_tang.group(1)
     elif info["phong"]:
         info["tang"] = _infer_floor_from_room(info["phong"])
 
     # --------- THỜI GIAN ----------
-    fixed_time_patterns = [
-        r"(từ\s*tối\s*qua)", r"(tối\s*qua)", r"(đêm\s*qua)", r"(chiều\s*hôm\s*qua)", r"(hôm\s*qua)",
-        r"(hôm\s*kia)", r"(sáng\s*nay)", r"(trưa\s*nay)", r"(chiều\s*nay)", r"(tối\s*nay)", r"(hôm\s*nay)",
-        r"(từ\s*sáng)",  # thêm 'từ sáng'
-    ]
-    for ptn in fixed_time_patterns:
-        m = re.search(ptn, txt, flags=re.IGNORECASE)
-        if m:
-            info["thoigian"] = m.group(1).lower().strip()
-            return info
-
-    m_date = re.search(r"(ngày\s*\d{1,2}/\d{1,2}(?:/\d{2,4})?)", txt, flags=re.IGNORECASE)
-    if m_date:
-        info["thoigian"] = m_date.group(1).lower().strip()
-        return info
-
-    m_cachd = re.search(r"cách\s*đây\s*(\d{1,2})\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
-    if m_cachd:
-        num = int(m_cachd.group(1))
-        info["thoigian"] = f"{num} ngày trước"
-        return info
-
-    m_num_truoc = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\s*trước\b", txt, flags=re.IGNORECASE)
-    if m_num_truoc:
-        num = int(m_num_truoc.group(1))
-        info["thoigian"] = f"{num} ngày trước"
-        return info
-
-    m_num_nay = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\s*nay\b", txt, flags=re.IGNORECASE)
-    if m_num_nay:
-        num = int(m_num_nay.group(1))
-        info["thoigian"] = f"{num} ngày gần đây"
-        return info
-
-    m_num_plain = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
-    if m_num_plain:
-        num = int(m_num_plain.group(1))
-        info["thoigian"] = f"{num} ngày gần đây"
-        return info
-
-    m_word_truoc = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\s*trước\b", txt, flags=re.IGNORECASE)
-    if m_word_truoc:
-        num = _word_to_num(m_word_truoc.group(1))
-        if num:
-            info["thoigian"] = f"{num} ngày trước"
-            return info
-
-    m_word_nay = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\s*nay\b", txt, flags=re.IGNORECASE)
-    if m_word_nay:
-        num = _word_to_num(m_word_nay.group(1))
-        if num:
-            info["thoigian"] = f"{num} ngày gần đây"
-            return info
-
-    m_word_plain = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
-    if m_word_plain:
-        num = _word_to_num(m_word_plain.group(1))
-        if num:
-            info["thoigian"] = f"{num} ngày gần đây"
-            return info
-
-    if re.search(r"\b(mấy|vài)\s*hôm\s*nay\b", txt, flags=re.IGNORECASE):
-        info["thoigian"] = "gần đây"
-        return info
-
+    info["thoigian"] = _extract_time(txt)
     return info
 
+
+def extract_many(texts: Iterable[str]) -> List[Dict[str, Optional[str]]]:
+    """extract_info cho nhiều câu; câu trùng chỉ trích 1 lần (mỗi phần tử là 1 dict riêng)."""
+    seen: Dict[str, Dict[str, Optional[str]]] = {}
+    out = []
+    for t in texts:
+        r = seen.get(t)
+        if r is None:
+            r = seen[t] = extract_info(t)
+            out.append(r)
+        else:
+            out.append(dict(r))
+    return out
+
+
 # ============ Test nhanh ============
 if __name__ == "__main__":
-    tests = [
+    tests = sys.argv[1:] or [
         "phòng 203 đèn bị hỏng từ hôm qua",
         "phong B203 mất điện 2 ngày rồi",
         "phòng KSSV-214 tối không sáng",
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 import os
+import copy
 import json
+import time
+import threading
 from typing import Dict, Any, Tuple, Optional, List
 
 import torch  # type: ignore
 import torch.nn.functional as F  # type: ignore
-from transformers import AutoTokenizer, AutoModelForSequenceClassification  # type: ignore
+from transformers import AutoTokenizer  # type: ignore
 
 # ---------------------------------------------------------
 # Import tương thích:
@@ -15,12 +18,20 @@ from transformers import AutoTokenizer, AutoModelForSequenceClassification  # ty
 # - Chạy tay:        python -m ai.predictor "..."
 # ---------------------------------------------------------
 try:
-    from .text_preprocess_kssv import normalize_text  # type: ignore
-    from .ner_vn import extract_info  # type: ignore
+    from .text_preprocess_kssv import normalize_many  # type: ignore
+    from .ner_vn import extract_info, extract_many  # type: ignore
     from .logging_utils import log_prediction  # type: ignore
+    from .multitask_model import TASK_TYPE_MULTITASK  # type: ignore
+    from .backends import AI_BACKEND, load_model, backend_device, artifact_dir  # type: ignore
+    from .result_cache import ResultCache, dir_fingerprint  # type: ignore
+    from .torch_threads import GATE, INTRA_OP_THREADS, INTER_OP_THREADS, configure_threads  # type: ignore
 except ImportError:
-    from text_preprocess_kssv import normalize_text  # type: ignore
-    from ner_vn import extract_info  # type: ignore
+    from text_preprocess_kssv import normalize_many  # type: ignore
+    from ner_vn import extract_info, extract_many  # type: ignore
+    from multitask_model import TASK_TYPE_MULTITASK  # type: ignore
+    from backends import AI_BACKEND, load_model, backend_device, artifact_dir  # type: ignore
+    from result_cache import ResultCache, dir_fingerprint  # type: ignore
+    from torch_threads import GATE, INTRA_OP_THREADS, INTER_OP_THREADS, configure_threads  # type: ignore
 
     try:
         from logging_utils import log_prediction  # type: ignore
@@ -44,9 +55,32 @@ TASK_TYPE_PATH        = os.path.join(LABEL_MODEL_DIR, "task_type.json")        #
 MULTITASK_MAPS_PATH   = os.path.join(LABEL_MODEL_DIR, "multitask_maps.json")   # {"id2comb": {...}, ...}
 COMBINED_MAP_OLD_PATH = os.path.join(LABEL_MODEL_DIR, "combined_map.json")     # fallback cũ
 
+# Mô hình đa nhiệm: 1 encoder + head 6 nhãn + head 3 priority (train_multitask.py)
+# Có thì dùng (1 lần forward), không có thì quay về 2 model riêng ở trên.
+MULTITASK_MODEL_DIR      = os.path.join(_THIS_DIR, "models", "phobert_multitask")
+MULTITASK_TASK_TYPE_PATH = os.path.join(MULTITASK_MODEL_DIR, "task_type.json")    # {"type": "multitask_label_priority"}
+MULTITASK_LABEL_MAP_PATH = os.path.join(MULTITASK_MODEL_DIR, "label_map.json")
+_USE_MULTITASK = os.environ.get("AI_USE_MULTITASK", "1") in ("1", "true", "True")
+
 # Dùng CPU mặc định. Bật CUDA qua USE_CUDA=1 nếu có.
+# Backend suy luận chọn qua AI_BACKEND=torch|int8|onnx (xem backends.py); int8/onnx luôn chạy CPU.
 _USE_CUDA = (os.environ.get("USE_CUDA", "0") in ("1", "true", "True")) and torch.cuda.is_available()
-_DEVICE   = torch.device("cuda" if _USE_CUDA else "cpu")
+_DEVICE   = backend_device(torch.device("cuda" if _USE_CUDA else "cpu"), AI_BACKEND)
+
+# Số luồng torch (AI_TORCH_THREADS / AI_TORCH_INTEROP_THREADS) đặt ngay khi import, trước lượt forward đầu;
+# AI_INFER_CONCURRENCY / AI_INFER_POOL giới hạn số lượt forward chạy cùng lúc (xem torch_threads.py)
+configure_threads(INTRA_OP_THREADS, INTER_OP_THREADS)
+
+# Độ dài tối đa khi tokenize & kích thước lô mặc định cho classify_many_full
+MAX_LEN            = 256
+DEFAULT_BATCH_SIZE = int(os.environ.get("AI_BATCH_SIZE", "16"))
+
+# Cache kết quả theo (text đã chuẩn hoá, fingerprint model). AI_CACHE_SIZE=0 để tắt.
+# Fingerprint thư mục model được kiểm tra lại tối đa mỗi AI_CACHE_CHECK_S giây;
+# đổi => xoá cache + nạp lại model.
+CACHE_SIZE    = int(os.environ.get("AI_CACHE_SIZE", "2048"))
+CACHE_TTL_S   = float(os.environ.get("AI_CACHE_TTL_S", "3600"))
+CACHE_CHECK_S = float(os.environ.get("AI_CACHE_CHECK_S", "10"))
 
 # ================== BỘ NHỚ CACHE ==================
 _PIPE: Dict[str, Any] = {
@@ -68,14 +102,19 @@ _PIPE: Dict[str, Any] = {
     "comb2id": None,        # {"điện|normal": 0, ...}
     "LABELS": None,         # ["điện", ...]
     "PRIORITIES": None,     # ["normal","high","urgent"]
+
+    # model đa nhiệm (phobert_multitask): None = chưa kiểm tra, False = không có
+    "mt_tokenizer": None,
+    "mt_model": None,
+    "is_multitask": None,
 }
+_PIPE_INITIAL = dict(_PIPE)
+_LOAD_LOCK = threading.RLock()
 
-# ================== HELPERS ==================
-def _softmax_np(logits: torch.Tensor) -> Tuple[int, float, List[float]]:
-    probs = F.softmax(logits, dim=-1).detach().cpu().numpy()[0]
-    pred_id = int(probs.argmax())
-    return pred_id, float(probs[pred_id]), list(map(float, probs))
+_CACHE = ResultCache(max_size=CACHE_SIZE, ttl_s=CACHE_TTL_S)
+_FINGERPRINT: Dict[str, Any] = {"value": None, "checked_at": 0.0}
 
+# ================== HELPERS ==================
 def _read_json(path: str) -> Optional[dict]:
     if not os.path.exists(path):
         return None
@@ -191,7 +230,7 @@ def _lazy_load_label_model():
         raise FileNotFoundError(f"Không tìm thấy thư mục model nhãn: {LABEL_MODEL_DIR}. Hãy train lại.")
 
     tok = AutoTokenizer.from_pretrained(LABEL_MODEL_DIR, use_fast=False)
-    mdl = AutoModelForSequenceClassification.from_pretrained(LABEL_MODEL_DIR).to(_DEVICE).eval()
+    mdl = load_model(LABEL_MODEL_DIR, device=_DEVICE)
 
     # model 6 nhãn hay model gộp?
     id2label, label2id = _load_label_maps()
@@ -218,7 +257,7 @@ def _lazy_load_priority_model():
         # không có model ưu tiên => để None, predictor vẫn hoạt động cho phần nhãn
         return
     tok = AutoTokenizer.from_pretrained(PRIO_MODEL_DIR, use_fast=False)
-    mdl = AutoModelForSequenceClassification.from_pretrained(PRIO_MODEL_DIR).to(_DEVICE).eval()
+    mdl = load_model(PRIO_MODEL_DIR, device=_DEVICE)
 
     id2prio, prio2id = _load_prio_maps()
     if not id2prio or not prio2id:
@@ -233,36 +272,179 @@ def _lazy_load_priority_model():
     _PIPE["id2prio_3"]      = id2prio
     _PIPE["prio2id_3"]      = prio2id
 
-# ================== SUY LUẬN ==================
+def _lazy_load_multitask_model() -> bool:
+    """Nạp model đa nhiệm nếu thư mục có task_type 'multitask_label_priority'. Trả True nếu dùng được."""
+    if _PIPE["is_multitask"] is not None:
+        return bool(_PIPE["is_multitask"])
+    _PIPE["is_multitask"] = False
+    if not _USE_MULTITASK or not os.path.isdir(MULTITASK_MODEL_DIR):
+        return False
+    tt = _read_json(MULTITASK_TASK_TYPE_PATH)
+    mp = _read_json(MULTITASK_LABEL_MAP_PATH)
+    if not tt or tt.get("type") != TASK_TYPE_MULTITASK or not mp:
+        return False
+
+    id2label = mp.get("id2label")
+    id2prio = mp.get("id2prio")
+    if not isinstance(id2label, dict) or not isinstance(id2prio, dict):
+        return False
+
+    tok = AutoTokenizer.from_pretrained(MULTITASK_MODEL_DIR, use_fast=False)
+    mdl = load_model(MULTITASK_MODEL_DIR, multitask=True, device=_DEVICE)
+
+    _PIPE["mt_tokenizer"] = tok
+    _PIPE["mt_model"]     = mdl
+    _PIPE["id2label_6"]   = {int(k): v for k, v in id2label.items()}
+    _PIPE["label2id_6"]   = {str(v): int(k) for k, v in id2label.items()}
+    _PIPE["id2prio_3"]    = {int(k): v for k, v in id2prio.items()}
+    _PIPE["prio2id_3"]    = {str(v): int(k) for k, v in id2prio.items()}
+    _PIPE["is_combined"]  = False
+    _PIPE["is_multitask"] = True
+    return True
+
+def _reset_pipe() -> None:
+    _PIPE.clear()
+    _PIPE.update(_PIPE_INITIAL)
+
+def _model_dirs() -> List[str]:
+    dirs = [LABEL_MODEL_DIR, PRIO_MODEL_DIR, MULTITASK_MODEL_DIR]
+    if AI_BACKEND != "torch":
+        kind = "onnx" if AI_BACKEND == "onnx" else "int8"
+        dirs += [artifact_dir(d, kind) for d in list(dirs)]
+    return dirs
+
+def model_version() -> str:
+    """
+    Fingerprint các thư mục model đang dùng (+ backend). Khi file model trên đĩa thay đổi
+    (train lại, export lại, copy bản mới) -> xoá cache kết quả và nạp lại model ở lần gọi sau.
+    """
+    now = time.monotonic()
+    with _LOAD_LOCK:
+        if _FINGERPRINT["value"] is None or now - _FINGERPRINT["checked_at"] >= CACHE_CHECK_S:
+            fp = dir_fingerprint(_model_dirs(), extra=AI_BACKEND)
+            if _FINGERPRINT["value"] is not None and fp != _FINGERPRINT["value"]:
+                _reset_pipe()
+                _CACHE.clear()
+            _FINGERPRINT["value"] = fp
+            _FINGERPRINT["checked_at"] = now
+        return _FINGERPRINT["value"]
+
+def cache_stats() -> Dict[str, Any]:
+    return {**_CACHE.stats(), "model_version": _FINGERPRINT["value"]}
+
+def infer_stats() -> Dict[str, Any]:
+    """Số luồng torch + hàng đợi / thời gian chờ của cổng forward (AI_INFER_CONCURRENCY)."""
+    return GATE.stats()
+
+def _ensure_models_loaded() -> Dict[str, Any]:
+    """Nạp model (1 lần, thread-safe) rồi trả bản chụp _PIPE để dùng suốt lượt suy luận."""
+    with _LOAD_LOCK:
+        if not _lazy_load_multitask_model():
+            _lazy_load_label_model()
+            _lazy_load_priority_model()
+        return dict(_PIPE)
+
 @torch.inference_mode()
-def classify_one_full(text: str) -> Dict[str, Any]:
+def warmup(seq_lens: Tuple[int, ...] = (16, 64, 256), batch_size: int = 8) -> Dict[str, Any]:
     """
-    Trả về:
-      - Nếu model nhãn là 6 lớp: label + probs_label (và meta)
-      - Nếu model nhãn là gộp 18 lớp: label/priority suy thẳng từ phobert_kssv
-      - Nếu có model priority riêng: suy thêm priority + probs_priority và GHÉP vào kết quả
+    Nạp model + chạy vài lô giả ở nhiều độ dài câu (lô 1 câu và lô batch_size câu) để lần gọi
+    thật đầu tiên không phải chờ from_pretrained / khởi tạo kernel & bộ nhớ lần đầu.
+    Không đi qua cache / log. Trả về thời gian từng bước (ms).
+    """
+    t0 = time.perf_counter()
+    version = model_version()
+    pipe = _ensure_models_loaded()
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    runs = []
+    for n in seq_lens:
+        text = " ".join(["phòng"] * max(1, int(n) - 2))   # ~n token kể cả <s> </s>, cắt ở MAX_LEN
+        for bs in sorted({1, max(1, int(batch_size))}):
+            t = time.perf_counter()
+            GATE.run(_infer_probs, pipe, [text] * bs, bs)
+            runs.append({"seq_len": min(int(n), MAX_LEN), "batch": bs, "ms": round((time.perf_counter() - t) * 1000.0, 1)})
+
+    return {
+        "model_version": version,
+        "backend": AI_BACKEND,
+        "device": str(_DEVICE),
+        "multitask": bool(pipe["is_multitask"]),
+        "priority_model": bool(pipe["is_multitask"] or pipe["prio_model"] is not None),
+        "threads": torch.get_num_threads(),
+        "load_ms": round(load_ms, 1),
+        "warmup": runs,
+        "total_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+
+# ================== SUY LUẬN THEO LÔ ==================
+def _softmax_rows(logits: torch.Tensor) -> List[List[float]]:
+    probs = F.softmax(logits, dim=-1).detach().cpu().numpy()
+    return [list(map(float, row)) for row in probs]
+
+def _forward_probs(
+    tok, mdl, texts_norm: List[str], batch_size: int, heads: Tuple[str, ...] = ("logits",)
+) -> List[List[List[float]]]:
     """
-    # nạp models
-    _lazy_load_label_model()
-    _lazy_load_priority_model()
-
-    label_tok = _PIPE["label_tokenizer"]
-    label_mdl = _PIPE["label_model"]
-    id2label6 = _PIPE["id2label_6"]
-    is_comb   = _PIPE["is_combined"]
-    id2comb   = _PIPE["id2comb"]
-
-    # chuẩn hoá text + meta
-    text_norm = normalize_text(text)
-    meta = extract_info(text_norm)
-
-    # ===== 1) Dự đoán NHÃN
-    inputs_label = label_tok(
-        text_norm, truncation=True, max_length=256,
-        return_tensors="pt", return_token_type_ids=False
-    ).to(_DEVICE)
-    logits_label = label_mdl(**inputs_label).logits
-    pred_label_id, pred_label_conf, label_probs = _softmax_np(logits_label)
+    Chạy model trên nhiều câu theo lô:
+      - tokenize từng câu (không padding) để biết độ dài
+      - sắp theo độ dài rồi cắt lô -> padding động, ít token thừa nhất
+      - trả xác suất đúng THỨ TỰ đầu vào, mỗi phần tử của `heads` 1 danh sách
+        (model đa nhiệm: heads=("logits", "prio_logits"))
+    """
+    encs = [
+        tok(t, truncation=True, max_length=MAX_LEN, return_token_type_ids=False)
+        for t in texts_norm
+    ]
+    order = sorted(range(len(encs)), key=lambda i: len(encs[i]["input_ids"]))
+    out: List[List[List[float]]] = [[[] for _ in encs] for _ in heads]
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        batch = tok.pad([encs[i] for i in idx], padding=True, return_tensors="pt").to(_DEVICE)
+        outputs = mdl(**batch)
+        for h, head in enumerate(heads):
+            rows = _softmax_rows(getattr(outputs, head))
+            for i, row in zip(idx, rows):
+                out[h][i] = row
+    return out
+
+def _infer_probs(
+    pipe: Dict[str, Any], texts_norm: List[str], batch_size: int
+) -> Tuple[List[List[float]], List[Optional[List[float]]]]:
+    """Xác suất nhãn & priority cho từng câu (model đa nhiệm: 1 lần forward; ngược lại 2 model)."""
+    if pipe["is_multitask"]:
+        # 1 encoder dùng chung: 1 lần forward ra cả nhãn lẫn priority
+        label_probs, mt_prio = _forward_probs(
+            pipe["mt_tokenizer"], pipe["mt_model"], texts_norm, batch_size,
+            heads=("logits", "prio_logits"),
+        )
+        return label_probs, list(mt_prio)
+
+    label_probs = _forward_probs(pipe["label_tokenizer"], pipe["label_model"], texts_norm, batch_size)[0]
+
+    prio_tok = pipe["prio_tokenizer"]
+    prio_mdl = pipe["prio_model"]
+    if prio_tok is not None and prio_mdl is not None and pipe["id2prio_3"]:
+        return label_probs, list(_forward_probs(prio_tok, prio_mdl, texts_norm, batch_size)[0])
+    return label_probs, [None] * len(texts_norm)
+
+def _build_result(
+    text_norm: str,
+    label_probs: List[float],
+    prio_probs: Optional[List[float]],
+    pipe: Dict[str, Any],
+    meta: Optional[Dict[str, Optional[str]]] = None,
+) -> Dict[str, Any]:
+    """Từ xác suất thô của 1 câu -> dict kết quả (nhãn, priority, heuristics, meta)."""
+    id2label6 = pipe["id2label_6"]
+    is_comb   = pipe["is_combined"]
+    id2comb   = pipe["id2comb"]
+
+    if meta is None:
+        meta = extract_info(text_norm)
+
+    # ===== 1) NHÃN
+    pred_label_id = max(range(len(label_probs)), key=label_probs.__getitem__)
+    pred_label_conf = float(label_probs[pred_label_id])
 
     result: Dict[str, Any] = {"meta": meta}
 
@@ -293,19 +475,9 @@ def classify_one_full(text: str) -> Dict[str, Any]:
         result["label_confidence"] = round(pred_label_conf, 4)
         result["probs_label"] = {id2label6[i]: float(p) for i, p in enumerate(label_probs)}
 
-    # ===== 2) Dự đoán PRIORITY bằng model riêng (nếu có)
-    prio_tok = _PIPE["prio_tokenizer"]
-    prio_mdl = _PIPE["prio_model"]
-    id2prio3 = _PIPE["id2prio_3"]
-
-    if prio_tok is not None and prio_mdl is not None and id2prio3:
-        inputs_prio = prio_tok(
-            text_norm, truncation=True, max_length=256,
-            return_tensors="pt", return_token_type_ids=False
-        ).to(_DEVICE)
-        logits_prio = prio_mdl(**inputs_prio).logits
-        pred_prio_id, pred_prio_conf, prio_probs = _softmax_np(logits_prio)
-
+    # ===== 2) PRIORITY từ model riêng (nếu có)
+    id2prio3 = pipe["id2prio_3"]
+    if prio_probs is not None and id2prio3:
         probs_dict = {id2prio3[i]: float(p) for i, p in enumerate(prio_probs)}
 
         # Chọn theo NGƯỠNG thay vì argmax
@@ -363,14 +535,70 @@ def classify_one_full(text: str) -> Dict[str, Any]:
                     for k in list(pp.keys()):
                         pp[k] = float(pp[k] / s)
 
-    # 4) Log nhẹ
-    try:
-        log_prediction(text=text, normalized=text_norm, result=result)
-    except Exception:
-        pass
-
     return result
 
+@torch.inference_mode()
+def classify_many_full(texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Phân loại nhiều câu một lượt (re-score backlog, import phản ánh cả kỳ):
+      - chuẩn hoá từng câu, câu đã có trong cache (cùng phiên bản model) trả ngay
+      - chạy model nhãn rồi model priority theo lô có padding động cho phần còn lại
+      - mỗi phần tử kết quả giống hệt classify_one_full(texts[i])
+    """
+    if not texts:
+        return []
+    batch_size = max(1, int(batch_size))
+    started = time.perf_counter()
+
+    texts_norm = normalize_many(texts)
+    version = model_version()
+
+    # 1) tra cache; câu trùng nhau trong cùng lô chỉ suy luận 1 lần
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    todo: Dict[str, List[int]] = {}
+    for i, tn in enumerate(texts_norm):
+        cached = _CACHE.get((tn, version))
+        if cached is not None:
+            results[i] = cached
+        else:
+            todo.setdefault(tn, []).append(i)
+
+    # 2) suy luận phần còn thiếu
+    if todo:
+        uniq = list(todo)
+        pipe = _ensure_models_loaded()
+        label_probs, prio_probs = GATE.run(_infer_probs, pipe, uniq, batch_size)
+        for tn, lp, pp, meta in zip(uniq, label_probs, prio_probs, extract_many(uniq)):
+            res = _build_result(tn, lp, pp, pipe, meta)
+            _CACHE.put((tn, version), res)
+            idxs = todo[tn]
+            results[idxs[0]] = res
+            for j in idxs[1:]:
+                results[j] = copy.deepcopy(res)
+
+    # 3) Log (chỉ đưa vào hàng đợi, thread nền của logging_utils ghi file)
+    latency_ms = (time.perf_counter() - started) * 1000.0
+    for t, tn, res in zip(texts, texts_norm, results):
+        try:
+            log_prediction(
+                t, normalized=tn, result=res, model_version=version, backend=AI_BACKEND,
+                latency_ms=latency_ms, cached=tn not in todo, batch=len(texts),
+            )
+        except Exception:
+            pass
+
+    return results  # type: ignore[return-value]
+
+def classify_one_full(text: str) -> Dict[str, Any]:
+    """
+    Trả về:
+      - Nếu model nhãn là 6 lớp: label + probs_label (và meta)
+      - Nếu model nhãn là gộp 18 lớp: label/priority suy thẳng từ phobert_kssv
+      - Nếu có model đa nhiệm (phobert_multitask): label + priority từ 1 lần forward
+      - Nếu có model priority riêng: suy thêm priority + probs_priority và GHÉP vào kết quả
+    """
+    return classify_many_full([text], batch_size=1)[0]
+
 
 def classify_one(text: str) -> Tuple[Optional[str], float, Dict[str, Any]]:
     """
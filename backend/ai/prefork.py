@@ -0,0 +1,170 @@
+# backend/ai/prefork.py
+"""
+Chạy nhiều worker mà không nạp model riêng cho từng worker (gunicorn.conf.py gọi các hàm dưới):
+
+  - preload_in_master(): tiến trình master nạp model + 1 lượt forward rồi gc.freeze() TRƯỚC khi fork
+    => worker kế thừa trọng số copy-on-write (suy luận chỉ đọc trọng số nên không trang nào bị chép)
+  - configure_worker(n): sau fork, mỗi worker đặt số luồng torch = số core // n (AI_TORCH_THREADS để ép)
+    để n worker x m luồng không tranh nhau core
+  - AI_MMAP_WEIGHTS=1 (backends.py): trọng số trỏ thẳng vào model.safetensors đã mmap — dùng chung
+    qua page cache kể cả khi worker không fork từ cùng master (uvicorn --workers, restart lẻ từng worker)
+
+Backend onnx không nạp trước ở master: session onnxruntime (thread pool riêng) không an toàn khi fork.
+
+Đo bộ nhớ từng worker (RSS / PSS / USS từ /proc/<pid>/smaps_rollup, Linux):
+  python -m ai.prefork --measure --workers 3
+"""
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import torch  # type: ignore
+
+try:
+    from . import predictor  # type: ignore
+    from .backends import AI_BACKEND  # type: ignore
+    from .torch_threads import INTRA_OP_THREADS, INTER_OP_THREADS, configure_threads  # type: ignore
+except ImportError:
+    import predictor  # type: ignore
+    from backends import AI_BACKEND  # type: ignore
+    from torch_threads import INTRA_OP_THREADS, INTER_OP_THREADS, configure_threads  # type: ignore
+
+
+def torch_threads_per_worker(workers: int) -> Optional[int]:
+    """AI_TORCH_THREADS nếu đặt; nhiều worker => chia đều số core; 1 worker => None (giữ mặc định torch)."""
+    if INTRA_OP_THREADS:
+        return max(1, INTRA_OP_THREADS)
+    if workers <= 1:
+        return None
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def preload_in_master() -> Dict[str, Any]:
+    """Gọi ở master trước khi fork (gunicorn preload_app + when_ready)."""
+    if AI_BACKEND == "onnx":
+        return {"skipped": "onnx"}
+    # 1 luồng ở master: chưa dựng pool OpenMP nhiều luồng trước khi fork (worker tự đặt lại)
+    torch.set_num_threads(1)
+    info = predictor.warmup(seq_lens=(16,), batch_size=1)
+    # đối tượng đã nạp không bị GC quét lại ở worker => không chạm (chép) trang của chúng
+    gc.collect()
+    gc.freeze()
+    return info
+
+
+def configure_worker(workers: int) -> Optional[int]:
+    """Gọi ngay sau fork (gunicorn post_fork). Trả về số luồng intra-op đã đặt (None = giữ mặc định)."""
+    n = torch_threads_per_worker(workers)
+    configure_threads(n, INTER_OP_THREADS or 1)
+    return n
+
+
+def mem_usage(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    MB theo /proc/<pid>/smaps_rollup:
+      rss = mọi trang đang ở RAM, pss = rss chia đều trang dùng chung, uss = trang riêng của tiến trình.
+    """
+    out = {"rss": 0.0, "pss": 0.0, "uss": 0.0}
+    keys = {"Rss": "rss", "Pss": "pss", "Private_Clean": "uss", "Private_Dirty": "uss"}
+    with open(f"/proc/{pid or os.getpid()}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            k, _, rest = line.partition(":")
+            if k in keys:
+                out[keys[k]] += int(rest.split()[0]) / 1024.0
+    return {k: round(v, 1) for k, v in out.items()}
+
+
+# ================== ĐO RSS / WORKER ==================
+_SAMPLES = ["phòng 302 mất điện từ tối qua", "wifi tầng 5 rất yếu", "vòi nước nhà vệ sinh bị rò rỉ"]
+
+
+def _run_scenario(preload: bool, workers: int) -> Dict[str, Any]:
+    """1 kịch bản trong tiến trình riêng: (nạp trước ở master?) -> fork n worker -> đo khi tất cả đang sống."""
+    if preload:
+        preload_in_master()
+
+    pids: List[int] = []
+    ready_r, ready_w = os.pipe()
+    go_r, go_w = os.pipe()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:  # worker
+            os.close(ready_r)
+            os.close(go_w)
+            configure_worker(workers)
+            predictor.warmup(seq_lens=(16, 64), batch_size=4)
+            predictor.classify_many_full(_SAMPLES)
+            os.write(ready_w, b"1")
+            os.read(go_r, 1)   # giữ tiến trình sống tới khi master đo xong
+            os._exit(0)
+        pids.append(pid)
+    os.close(ready_w)
+    os.close(go_r)
+    got = 0
+    while got < workers:
+        got += len(os.read(ready_r, workers))
+    per_worker = [mem_usage(p) for p in pids]
+    master = mem_usage()
+    os.close(go_w)
+    for p in pids:
+        os.waitpid(p, 0)
+
+    avg = {k: round(sum(m[k] for m in per_worker) / workers, 1) for k in ("rss", "pss", "uss")}
+    return {
+        "preload": preload,
+        "mmap": os.environ.get("AI_MMAP_WEIGHTS", "0") in ("1", "true", "True"),
+        "workers": workers,
+        "master": master,
+        "worker_avg": avg,
+        "total_pss": round(master["pss"] + sum(m["pss"] for m in per_worker), 1),
+    }
+
+
+def measure(workers: int, scenarios: List[str]) -> List[Dict[str, Any]]:
+    """Mỗi kịch bản chạy trong 1 tiến trình python mới (trạng thái sạch, biến môi trường riêng)."""
+    results = []
+    for sc in scenarios:
+        env = dict(os.environ, AI_MMAP_WEIGHTS="1" if "mmap" in sc else "0", PRED_LOG="0")
+        cmd = [sys.executable, "-m", "ai.prefork", "--_scenario", sc, "--workers", str(workers)]
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.run(cmd, env=env, cwd=cwd, capture_output=True, text=True, check=True).stdout
+        results.append({"scenario": sc, **json.loads(out.strip().splitlines()[-1])})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Nạp model trước khi fork + đo bộ nhớ / worker")
+    parser.add_argument("--measure", action="store_true", help="Đo RSS / PSS / USS từng worker cho các kịch bản")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--scenarios", default="lazy,preload,lazy+mmap,preload+mmap")
+    parser.add_argument("--_scenario", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._scenario:
+        print(json.dumps(_run_scenario("preload" in args._scenario, args.workers)))
+        return 0
+    if not args.measure:
+        t0 = time.perf_counter()
+        info = preload_in_master()
+        print(json.dumps({**info, "mem_mb": mem_usage(), "s": round(time.perf_counter() - t0, 2)}, indent=2))
+        return 0
+
+    res = measure(args.workers, [s.strip() for s in args.scenarios.split(",") if s.strip()])
+    print(f"🔹 {args.workers} worker, backend={AI_BACKEND}, {os.cpu_count()} core (MB)")
+    print(f"   {'kịch bản':14s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'USS/worker':>11s} {'PSS tổng':>10s}")
+    for r in res:
+        w = r["worker_avg"]
+        print(f"   {r['scenario']:14s} {w['rss']:11.0f} {w['pss']:11.0f} {w['uss']:11.0f} {r['total_pss']:10.0f}")
+    return 0
+
+
+# ================== TEST NHANH ==================
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# backend/ai/result_cache.py
+from __future__ import annotations
+
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Cache LRU + TTL cho kết quả dự đoán (thread-safe).
+      - max_size: số mục tối đa, vượt thì bỏ mục ít dùng nhất (eviction)
+      - ttl_s   : mục quá hạn coi như miss và bị xoá (expiration)
+    Giá trị được deep-copy khi put/get để người gọi sửa dict kết quả không làm hỏng cache.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl_s: float = 3600.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def dir_fingerprint(dirs: Iterable[str], extra: str = "") -> str:
+    """
+    Dấu vân tay phiên bản model: (tên, kích thước, mtime) của các file trực tiếp trong
+    từng thư mục model. Train lại / export lại / copy model mới => fingerprint đổi.
+    """
+    h = hashlib.sha1(extra.encode("utf-8"))
+    for d in dirs:
+        h.update(d.encode("utf-8"))
+        if not os.path.isdir(d):
+            h.update(b"<missing>")
+            continue
+        try:
+            with os.scandir(d) as it:
+                entries = sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+            for e in entries:
+                st = e.stat()
+                h.update(f"{e.name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+        except OSError:
+            h.update(b"<error>")
+    return h.hexdigest()[:16]
@@ -1,11 +1,146 @@
 # backend/ai/text_preprocess_kssv.py
+"""
+Tiền xử lý văn bản KSSV (chạy trước mọi lần dự đoán / mỗi lô).
+
+normalize_text dùng các pattern biên dịch sẵn lúc import:
+  - 18 cặp thay thế áp dụng trong 1 lượt quét bằng 1 regex alternation (khớp dài nhất trước);
+    các chuỗi "dây chuyền" của cách thay tuần tự cũ (vd "thiết bị đèn điện" -> "điện" -> "thiết bị",
+    "rò nước" -> "rò rỉ nước" -> "rò rỉ nước nước") được tính sẵn thành 1 atom
+  - chuỗi hiếm có thể cho kết quả khác cách thay tuần tự (2 mẫu chồng nhau) bị phát hiện
+    bằng _HAZARD_RE và xử lý lại theo đúng thứ tự cũ => kết quả luôn giống hệt bản gốc
+  - bỏ dấu câu + stopword + gộp khoảng trắng (3 lần re.sub, dựng lại regex stopword mỗi lần gọi)
+    thay bằng 1 lần tách từ \w+ rồi tra bảng stopword
+
+Khớp từng byte với bản gốc (thay thế tuần tự): backend/tests/test_normalize.py
+(mẫu cố định + Datakssv.csv + câu ngẫu nhiên).
+"""
+from __future__ import annotations
+
 import re
+import sys
 import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # ==============================
-# Tiền xử lý văn bản KSSV
+# Bảng thay thế / stopword (giữ NGUYÊN thứ tự — thứ tự quyết định kết quả)
+# ==============================
+REPLACEMENTS: Tuple[Tuple[str, str], ...] = (
+    ("ký túc", "kssv"),
+    ("ktx", "kssv"),
+    ("phòng ", "phong "),
+    ("tầng ", "tang "),
+    ("khu ", "khu "),
+    ("khu vực ", "khu "),
+    ("wifi", "wi-fi"),
+    ("mạng ", "internet "),
+    ("mất mạng", "mất internet"),
+    ("đèn điện", "điện"),
+    ("bị hỏng", "hỏng"),
+    ("rò nước", "rò rỉ nước"),
+    ("vòi bị rỉ", "rò rỉ nước"),
+    ("rò rỉ", "rò rỉ nước"),
+    ("thiết bị điện", "thiết bị"),
+    ("wc", "vệ sinh"),
+    ("toilet", "vệ sinh"),
+    ("nhà tắm", "vệ sinh"),
+)
+
+STOPWORDS: Tuple[str, ...] = (
+    "phản ánh", "báo cáo", "bị", "tình trạng", "trong", "ở", "tại",
+    "đã", "vẫn", "rất", "có", "này", "kia", "đó", "rồi", "luôn", "luôn luôn",
+    "đang", "vừa", "cũng", "chưa", "nữa",
+)
+
+# Sau B4 văn bản chỉ còn các từ \w+ cách nhau 1 dấu cách => \b(stopword)\b luôn khớp trọn từ,
+# nên B4-B6 (3 lần re.sub + strip) tương đương: tách từ bằng \w+, bỏ từ / cụm từ dừng, nối lại.
+_WORD_RE = re.compile(r"\w+")
+
+
+def _build_stopwords() -> Dict[str, List[Tuple[int, Tuple[str, ...]]]]:
+    """từ đầu -> [(thứ tự trong STOPWORDS, các từ còn lại)] — alternation cũ ưu tiên mẫu đứng trước."""
+    table: Dict[str, List[Tuple[int, Tuple[str, ...]]]] = {}
+    for prio, sw in enumerate(STOPWORDS):
+        first, *rest = sw.split(" ")
+        table.setdefault(first, []).append((prio, tuple(rest)))
+    return table
+
+
+_STOP_TABLE = _build_stopwords()
+
+
+def _replace_sequential(text: str) -> str:
+    """Thay thế tuần tự như bản gốc (dùng cho chuỗi có _HAZARD_RE và để dựng bảng atom)."""
+    for k, v in REPLACEMENTS:
+        text = text.replace(k, v)
+    return text
+
+
+# ==============================
+# Dựng bộ khớp 1 lượt (chạy 1 lần lúc import)
 # ==============================
+def _overlaps(a: str, b: str) -> List[str]:
+    """Các chuỗi a + b[n:] với hậu tố a trùng tiền tố b (0 < n < min(len))."""
+    return [a + b[n:] for n in range(1, min(len(a), len(b))) if a.endswith(b[:n])]
+
+
+def _one_pass(text: str, atom_re: "re.Pattern[str]", atom_out: Dict[str, str]) -> str:
+    return atom_re.sub(lambda m: atom_out[m.group(0)], text)
 
+
+def _build_matcher() -> Tuple["re.Pattern[str]", Dict[str, str], Optional["re.Pattern[str]"]]:
+    rules = [(k, v) for k, v in REPLACEMENTS if k != v]     # "khu " -> "khu " không đổi gì
+    keys = [k for k, _ in rules]
+
+    # 1) atom = khoá + khoá "dây chuyền": output của luật trước nằm trong khoá luật sau
+    atoms = set(keys)
+    for i, (ki, vi) in enumerate(rules):
+        for kj, _ in rules[i + 1:]:
+            if vi in kj and vi != kj:
+                atoms.add(kj.replace(vi, ki, 1))
+    atom_out = {a: _replace_sequential(a) for a in atoms}
+    atom_re = re.compile("|".join(re.escape(a) for a in sorted(atoms, key=len, reverse=True)))
+
+    # 2) hazard = 2 mẫu chồng lên nhau ở ranh giới (đầu vào hoặc output mới sinh ra với chữ bên cạnh)
+    candidates = set()
+    for a in atoms:
+        out = atom_out[a]
+        for k in keys:
+            candidates.update(_overlaps(a, k))
+            candidates.update(_overlaps(k, a))
+            for n in range(1, min(len(out), len(k))):
+                if out.endswith(k[:n]):
+                    candidates.add(a + k[n:])        # output + chữ phía sau tạo khoá mới
+                if out.startswith(k[-n:]):
+                    candidates.add(k[:-n] + a)       # chữ phía trước + output tạo khoá mới
+            if out in k and out != k:
+                candidates.add(k.replace(out, a, 1))
+
+    # Chỉ giữ chuỗi thật sự cho kết quả khác (thử thêm vài ngữ cảnh xung quanh)
+    hazards = []
+    for h in candidates:
+        for s in (h, f" {h} ", f"x{h}x", h + h):
+            if _one_pass(s, atom_re, atom_out) != _replace_sequential(s):
+                hazards.append(h)
+                break
+    hazard_re = (
+        re.compile("|".join(re.escape(h) for h in sorted(hazards, key=len, reverse=True)))
+        if hazards else None
+    )
+    return atom_re, atom_out, hazard_re
+
+
+_ATOM_RE, _ATOM_OUT, _HAZARD_RE = _build_matcher()
+
+
+def _replace_all(text: str) -> str:
+    if _HAZARD_RE is not None and _HAZARD_RE.search(text):
+        return _replace_sequential(text)
+    return _ATOM_RE.sub(lambda m: _ATOM_OUT[m.group(0)], text)
+
+
+# ==============================
+# Tiền xử lý văn bản KSSV
+# ==============================
 def normalize_text(text: str) -> str:
     """
     Chuẩn hoá văn bản phản ánh:
@@ -15,64 +150,54 @@ def normalize_text(text: str) -> str:
     - Loại bỏ từ thừa (vd: "phản ánh", "báo cáo")
     - Chuẩn hoá khoảng trắng
     """
-
     if not isinstance(text, str):
         return ""
 
-    # --- B1: chuẩn hoá unicode ---
-    text = unicodedata.normalize("NFC", text)
-
-    # --- B2: chuyển về chữ thường ---
-    text = text.lower()
-
-    # --- B3: thay thế các biến thể thường gặp ---
-    replacements = {
-        "ký túc": "kssv",
-        "ktx": "kssv",
-        "phòng ": "phong ",
-        "tầng ": "tang ",
-        "khu ": "khu ",
-        "khu vực ": "khu ",
-        "wifi": "wi-fi",
-        "mạng ": "internet ",
-        "mất mạng": "mất internet",
-        "đèn điện": "điện",
-        "bị hỏng": "hỏng",
-        "rò nước": "rò rỉ nước",
-        "vòi bị rỉ": "rò rỉ nước",
-        "rò rỉ": "rò rỉ nước",
-        "thiết bị điện": "thiết bị",
-        "wc": "vệ sinh",
-        "toilet": "vệ sinh",
-        "nhà tắm": "vệ sinh",
-    }
-    for k, v in replacements.items():
-        text = text.replace(k, v)
+    # B1-B2: unicode NFC + chữ thường
+    text = unicodedata.normalize("NFC", text).lower()
+    # B3: thay thế các biến thể thường gặp (1 lượt)
+    text = _replace_all(text)
+    # B4: chỉ giữ chữ/số (tách thành từ)
+    words = _WORD_RE.findall(text)
+    # B5-B6: bỏ các từ vô nghĩa thường gặp, nối lại bằng 1 dấu cách
+    out: List[str] = []
+    i, n = 0, len(words)
+    while i < n:
+        cands = _STOP_TABLE.get(words[i])
+        if cands:
+            skip = 0
+            for _prio, rest in cands:            # đã xếp theo thứ tự ưu tiên
+                if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    skip = 1 + len(rest)
+                    break
+            if skip:
+                i += skip
+                continue
+        out.append(words[i])
+        i += 1
+    return " ".join(out)
 
-    # --- B4: xoá ký tự không cần thiết ---
-    text = re.sub(r"[^\w\s]", " ", text)       # chỉ giữ lại chữ/số/khoảng trắng
-    text = re.sub(r"\s+", " ", text).strip()   # bỏ khoảng trắng thừa
 
-    # --- B5: bỏ các từ vô nghĩa thường gặp ---
-    stopwords = [
-        "phản ánh", "báo cáo", "bị", "tình trạng", "trong", "ở", "tại",
-        "đã", "vẫn", "rất", "có", "này", "kia", "đó", "rồi", "luôn", "luôn luôn",
-        "đang", "vừa", "cũng", "chưa", "nữa"
-    ]
-    pattern = r"\b(" + "|".join(stopwords) + r")\b"
-    text = re.sub(pattern, "", text).strip()
-
-    # --- B6: chuẩn hoá khoảng trắng lần cuối ---
-    text = re.sub(r"\s+", " ", text).strip()
-
-    return text
+def normalize_many(texts: Iterable[str]) -> List[str]:
+    """Chuẩn hoá cả lô; câu trùng nhau trong lô chỉ xử lý 1 lần."""
+    seen: Dict[str, str] = {}
+    out: List[str] = []
+    for t in texts:
+        if not isinstance(t, str):
+            out.append("")
+            continue
+        r = seen.get(t)
+        if r is None:
+            r = seen[t] = normalize_text(t)
+        out.append(r)
+    return out
 
 
 # ==============================
 # Test nhanh khi chạy độc lập
 # ==============================
 if __name__ == "__main__":
-    samples = [
+    samples = sys.argv[1:] or [
         "Phòng KSSV-214 mất điện từ tối qua tầng 2 khu B",
         "Vòi nước tầng 5 bị rò rỉ",
         "Wi-Fi tầng 3 không kết nối được",
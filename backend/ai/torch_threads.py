@@ -0,0 +1,275 @@
+# backend/ai/torch_threads.py
+"""
+Số luồng torch + giới hạn số lượt forward chạy cùng lúc cho ai.predictor.
+
+Mặc định mỗi tiến trình dùng số luồng intra-op = số core; n request đồng thời => n lượt forward
+x số core luồng OpenMP tranh nhau core, độ trễ đuôi (p99) tăng vọt. Cấu hình (env / app.config):
+  AI_TORCH_THREADS          luồng intra-op / lượt forward (mặc định torch: số core)
+  AI_TORCH_INTEROP_THREADS  luồng inter-op (chỉ đặt được trước khi torch chạy song song lần đầu)
+  AI_INFER_CONCURRENCY=N    tối đa N lượt forward chạy cùng lúc, request khác xếp hàng (0 = không giới hạn)
+  AI_INFER_POOL=1           forward chạy trên N luồng "ai-infer" riêng sống suốt tiến trình
+                            (N = AI_INFER_CONCURRENCY, mặc định 1) thay vì trên luồng của request
+
+Chọn số liệu cho máy mình (mỗi số luồng chạy trong 1 tiến trình riêng):
+  python -m ai.torch_threads --bench --threads 1,2,4 --concurrency 1,2,4,8
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import torch  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str) -> Optional[int]:
+    v = os.environ.get(name, "").strip()
+    return int(v) if v else None
+
+
+# ================== CẤU HÌNH ==================
+INTRA_OP_THREADS  = _env_int("AI_TORCH_THREADS")
+INTER_OP_THREADS  = _env_int("AI_TORCH_INTEROP_THREADS")
+INFER_CONCURRENCY = int(os.environ.get("AI_INFER_CONCURRENCY", "0"))
+INFER_POOL        = os.environ.get("AI_INFER_POOL", "0") in ("1", "true", "True")
+
+
+def thread_info() -> Dict[str, Any]:
+    return {
+        "intra_op": torch.get_num_threads(),
+        "inter_op": torch.get_num_interop_threads(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def configure_threads(intra: Optional[int] = None, interop: Optional[int] = None) -> Dict[str, Any]:
+    """Đặt số luồng intra-op / inter-op (None = giữ nguyên). Trả về số luồng đang dùng."""
+    if intra:
+        torch.set_num_threads(max(1, int(intra)))
+    if interop:
+        n = max(1, int(interop))
+        if n != torch.get_num_interop_threads():
+            try:
+                torch.set_num_interop_threads(n)
+            except RuntimeError:
+                # pool inter-op đã khởi tạo (chỉ đặt được 1 lần / tiến trình)
+                logger.warning(f"[torch] không đặt được {n} luồng inter-op, giữ {torch.get_num_interop_threads()}")
+    return thread_info()
+
+
+# ================== CỔNG FORWARD ==================
+class ForwardGate:
+    """
+    Chạy các lượt forward qua 1 cổng:
+      - limit=0            : chạy ngay trên luồng gọi (như cũ)
+      - limit=N, pool=False: tối đa N lượt cùng lúc (semaphore), lượt khác chờ trên luồng của mình
+      - pool=True          : N luồng riêng (ThreadPoolExecutor) chạy forward, luồng gọi chờ kết quả
+    Mỗi lượt chạy trong torch.inference_mode() (trạng thái này theo từng luồng).
+    """
+
+    def __init__(self, limit: int = 0, pool: bool = False):
+        self.pool = bool(pool)
+        self.limit = max(0, int(limit)) or (1 if self.pool else 0)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sem = threading.BoundedSemaphore(self.limit) if self.limit and not self.pool else None
+        self._pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._calls = 0
+        self._wait_sum_ms = 0.0
+        self._wait_max_ms = 0.0
+        self._run_sum_ms = 0.0
+
+    @property
+    def mode(self) -> str:
+        return "pool" if self.pool else ("semaphore" if self._sem else "none")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # luồng không sống sót qua fork (gunicorn preload): worker tạo pool mới
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix="ai-infer")
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _call(self, queued_at: float, fn: Callable[..., Any], args: tuple) -> Any:
+        started = time.perf_counter()
+        wait_ms = (started - queued_at) * 1000.0
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+        try:
+            with torch.inference_mode():
+                return fn(*args)
+        finally:
+            run_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._running -= 1
+                self._calls += 1
+                self._wait_sum_ms += wait_ms
+                self._wait_max_ms = max(self._wait_max_ms, wait_ms)
+                self._run_sum_ms += run_ms
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        if self.pool:
+            return self._get_executor().submit(self._call, queued_at, fn, args).result()
+        if self._sem is not None:
+            with self._sem:
+                return self._call(queued_at, fn, args)
+        return self._call(queued_at, fn, args)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self._calls
+            return {
+                "mode": self.mode,
+                "limit": self.limit,
+                "running": self._running,
+                "waiting": self._waiting,
+                "calls": n,
+                "avg_wait_ms": round(self._wait_sum_ms / n, 3) if n else 0.0,
+                "max_wait_ms": round(self._wait_max_ms, 3),
+                "avg_run_ms": round(self._run_sum_ms / n, 3) if n else 0.0,
+                **thread_info(),
+            }
+
+
+GATE = ForwardGate(INFER_CONCURRENCY, INFER_POOL)
+
+
+# ================== BENCHMARK ==================
+def _pct(sorted_ms: List[float], p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    k = min(len(sorted_ms) - 1, max(0, int(round(p / 100.0 * len(sorted_ms))) - 1))
+    return round(sorted_ms[k], 2)
+
+
+def _bench_threads(threads: int, concurrency: List[int], requests: int, batch: int,
+                   limit: int, pool: bool) -> List[Dict[str, Any]]:
+    """1 số luồng intra-op (trong tiến trình riêng), lần lượt từng mức request đồng thời."""
+    try:
+        from . import predictor  # type: ignore
+        from .ner_vn import SAMPLES  # type: ignore
+    except ImportError:
+        import predictor  # type: ignore
+        from ner_vn import SAMPLES  # type: ignore
+
+    configure_threads(threads, INTER_OP_THREADS)
+    pipe = predictor._ensure_models_loaded()
+    texts = predictor.normalize_many(SAMPLES)
+    gate = ForwardGate(limit, pool)
+    for i in range(0, len(texts), batch):   # làm nóng: mọi độ dài mẫu, cả luồng của pool
+        gate.run(predictor._infer_probs, pipe, texts[i:i + batch], batch)
+
+    out = []
+    for conc in concurrency:
+        latencies: List[float] = []
+        lock = threading.Lock()
+        next_i = [0]
+
+        def client() -> None:
+            while True:
+                with lock:
+                    i = next_i[0]
+                    next_i[0] += 1
+                if i >= requests:
+                    return
+                chunk = [texts[(i * batch + j) % len(texts)] for j in range(batch)]
+                t = time.perf_counter()
+                gate.run(predictor._infer_probs, pipe, chunk, batch)
+                ms = (time.perf_counter() - t) * 1000.0
+                with lock:
+                    latencies.append(ms)
+
+        workers = [threading.Thread(target=client) for _ in range(conc)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall = time.perf_counter() - t0
+        latencies.sort()
+        out.append({
+            "threads": torch.get_num_threads(),
+            "concurrency": conc,
+            "gate": gate.mode if gate.mode == "none" else f"{gate.mode}:{gate.limit}",
+            "req_s": round(requests / wall, 1),
+            "texts_s": round(requests * batch / wall, 1),
+            "p50_ms": _pct(latencies, 50),
+            "p95_ms": _pct(latencies, 95),
+            "p99_ms": _pct(latencies, 99),
+        })
+    return out
+
+
+def bench(threads: List[int], concurrency: List[int], requests: int = 200, batch: int = 1,
+          limit: int = 0, pool: bool = False) -> List[Dict[str, Any]]:
+    """Mỗi số luồng chạy trong 1 tiến trình python mới (torch chỉ cho đặt inter-op 1 lần / tiến trình)."""
+    results: List[Dict[str, Any]] = []
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for n in threads:
+        cmd = [sys.executable, "-m", "ai.torch_threads", "--_run", str(n),
+               "--concurrency", ",".join(map(str, concurrency)), "--requests", str(requests),
+               "--batch", str(batch), "--limit", str(limit)] + (["--pool"] if pool else [])
+        env = dict(os.environ, PRED_LOG="0")
+        out = subprocess.run(cmd, env=env, cwd=cwd, capture_output=True, text=True, check=True).stdout
+        results.extend(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def _int_list(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Số luồng torch / giới hạn forward đồng thời + benchmark")
+    parser.add_argument("--bench", action="store_true", help="Quét số luồng x số request đồng thời")
+    parser.add_argument("--threads", default=None, help="Số luồng intra-op, vd 1,2,4 (mặc định: 1 .. số core)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Số request gửi đồng thời")
+    parser.add_argument("--requests", type=int, default=200, help="Số request mỗi cấu hình")
+    parser.add_argument("--batch", type=int, default=1, help="Số câu / request")
+    parser.add_argument("--limit", type=int, default=INFER_CONCURRENCY, help="Giới hạn forward đồng thời (0 = không)")
+    parser.add_argument("--pool", action="store_true", default=INFER_POOL, help="Forward chạy trên pool luồng riêng")
+    parser.add_argument("--_run", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._run is not None:
+        res = _bench_threads(args._run, _int_list(args.concurrency), args.requests, max(1, args.batch),
+                             args.limit, args.pool)
+        print(json.dumps(res))
+        return 0
+    if not args.bench:
+        print(json.dumps({**configure_threads(INTRA_OP_THREADS, INTER_OP_THREADS), "gate": GATE.stats()}, indent=2))
+        return 0
+
+    cpus = os.cpu_count() or 1
+    threads = _int_list(args.threads) if args.threads else sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    res = bench(threads, _int_list(args.concurrency), args.requests, max(1, args.batch), args.limit, args.pool)
+    print(f"🔹 {cpus} core, {args.requests} request x {args.batch} câu / cấu hình")
+    print(f"   {'luồng':>5s} {'đồng thời':>9s} {'cổng':>12s} {'req/s':>8s} {'câu/s':>8s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for r in res:
+        print(f"   {r['threads']:5d} {r['concurrency']:9d} {r['gate']:>12s} {r['req_s']:8.1f} {r['texts_s']:8.1f} "
+              f"{r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f}")
+    return 0
+
+
+# ================== TEST NHANH ==================
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# backend/ai/train_multitask.py
+from __future__ import annotations
+
+import os
+import json
+import random
+from typing import Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from sklearn.model_selection import train_test_split  # type: ignore
+from datasets import Dataset, DatasetDict, Value  # type: ignore
+from transformers import (  # type: ignore
+    AutoTokenizer,
+    TrainingArguments,
+    Trainer,
+    DataCollatorWithPadding,
+)
+import torch  # type: ignore
+
+try:
+    from .multitask_model import PhoBertMultiTask, TASK_TYPE_MULTITASK  # type: ignore
+except ImportError:
+    from multitask_model import PhoBertMultiTask, TASK_TYPE_MULTITASK  # type: ignore
+
+
+def _acc(preds, refs):
+    preds = np.asarray(preds)
+    refs = np.asarray(refs)
+    return float((preds == refs).mean())
+
+def _f1_macro(preds, refs, num_labels: int):
+    preds = np.asarray(preds)
+    refs = np.asarray(refs)
+    f1s = []
+    for c in range(num_labels):
+        tp = np.sum((preds == c) & (refs == c))
+        fp = np.sum((preds == c) & (refs != c))
+        fn = np.sum((preds != c) & (refs == c))
+        prec = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+        rec  = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+        f1   = (2*prec*rec)/(prec+rec) if (prec+rec) > 0 else 0.0
+        f1s.append(f1)
+    return float(np.mean(f1s))
+
+
+# ================= CẤU HÌNH =================
+MODEL_NAME = "vinai/phobert-base"
+DATA_PATH  = os.path.join(os.path.dirname(__file__), "Datakssv.csv")  # cần cột: text, label, priority
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "models", "phobert_multitask")
+MAX_LEN    = 256
+SEED       = 42
+
+LABELS = ["điện", "nước", "internet", "thiết bị", "vệ sinh", "khác"]
+label2id = {lbl: i for i, lbl in enumerate(LABELS)}
+id2label = {i: lbl for i, lbl in enumerate(LABELS)}
+
+PRIORITIES = ["normal", "high", "urgent"]
+pri2id = {p: i for i, p in enumerate(PRIORITIES)}
+id2pri = {i: p for i, p in enumerate(PRIORITIES)}
+
+# Trọng số loss của head priority so với head nhãn
+PRIO_LOSS_WEIGHT = 1.0
+
+
+def _set_seed(s=SEED):
+    random.seed(s)
+    np.random.seed(s)
+    torch.manual_seed(s)
+    if torch.cuda.is_available():
+        torch.cuda.manual_seed_all(s)
+
+
+def _require_file(path: str):
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"❌ Không tìm thấy file dữ liệu: {path}")
+
+
+# ================= LOAD DATA (NHÃN + PRIORITY) =================
+def load_dataset(csv_path: str) -> Tuple[DatasetDict, np.ndarray]:
+    _require_file(csv_path)
+    df = pd.read_csv(csv_path)
+
+    need_cols = {"text", "label", "priority"}
+    if not need_cols.issubset(df.columns):
+        raise ValueError("❌ CSV phải có đủ cột: text, label, priority.")
+
+    # Chuẩn hoá
+    df["text"] = df["text"].astype(str).fillna("").str.strip()
+    df["label"] = df["label"].astype(str).fillna("").str.strip()
+    df["priority"] = df["priority"].astype(str).fillna("").str.lower().str.strip()
+
+    # Bỏ text rỗng & lọc nhãn hợp lệ ở CẢ 2 cột
+    df = df[(df["text"] != "") & (df["label"].isin(LABELS)) & (df["priority"].isin(PRIORITIES))].copy()
+    if df.empty:
+        raise ValueError("❌ Không còn dòng nào sau khi lọc label/priority hợp lệ.")
+
+    print("🔎 Label distribution (after filtering):")
+    print(df["label"].value_counts().to_string())
+    print("🔎 Priority distribution (after filtering):")
+    print(df["priority"].value_counts().to_string())
+
+    df["labels"] = df["label"].map(label2id).astype("int64")
+    df["prio_labels"] = df["priority"].map(pri2id).astype("int64")
+
+    # Class weights cho priority (ngược tần suất) như train_priority.py
+    counts = df["prio_labels"].value_counts().sort_index()
+    N = float(len(df))
+    C = float(len(PRIORITIES))
+    weights = np.array([N / (C * (counts.get(i, 1))) for i in range(len(PRIORITIES))], dtype=np.float32)
+
+    # Chia tập stratify theo nhãn sự cố (giống train_phobert.py)
+    cols = ["text", "labels", "prio_labels"]
+    train_df, test_df = train_test_split(
+        df[cols],
+        test_size=0.15,
+        random_state=SEED,
+        stratify=df["labels"],
+    )
+    val_df, test_df = train_test_split(
+        test_df,
+        test_size=0.5,
+        random_state=SEED,
+        stratify=test_df["labels"],
+    )
+
+    ds_train = Dataset.from_pandas(train_df, preserve_index=False)
+    ds_val   = Dataset.from_pandas(val_df,   preserve_index=False)
+    ds_test  = Dataset.from_pandas(test_df,  preserve_index=False)
+
+    dsdict = DatasetDict(train=ds_train, validation=ds_val, test=ds_test)
+    dsdict = dsdict.cast_column("labels", Value("int64"))
+    dsdict = dsdict.cast_column("prio_labels", Value("int64"))
+    return dsdict, weights
+
+
+# ================= TOKENIZE =================
+def tokenize_function(examples, tokenizer):
+    return tokenizer(
+        examples["text"],
+        truncation=True,
+        max_length=MAX_LEN,
+        padding=False,                 # collator sẽ padding
+        return_token_type_ids=False,   # PhoBERT/Roberta không dùng
+    )
+
+
+# ================= METRICS =================
+def compute_metrics(eval_pred):
+    (logits, prio_logits), (labels, prio_labels) = eval_pred.predictions, eval_pred.label_ids
+    preds = np.argmax(logits, axis=-1)
+    prio_preds = np.argmax(prio_logits, axis=-1)
+    label_f1 = _f1_macro(preds, labels, num_labels=len(LABELS))
+    prio_f1 = _f1_macro(prio_preds, prio_labels, num_labels=len(PRIORITIES))
+    return {
+        "label_accuracy": _acc(preds, labels),
+        "label_f1": label_f1,
+        "priority_accuracy": _acc(prio_preds, prio_labels),
+        "priority_f1": prio_f1,
+        "f1": (label_f1 + prio_f1) / 2.0,   # dùng để chọn checkpoint tốt nhất
+    }
+
+
+# ================= MAIN =================
+def main():
+    _set_seed(SEED)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    print("🔹 Loading dataset from:", DATA_PATH)
+    dsdict, prio_weights = load_dataset(DATA_PATH)
+
+    print("🔹 Loading tokenizer:", MODEL_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=False)
+
+    tokenized = dsdict.map(
+        lambda ex: tokenize_function(ex, tokenizer),
+        batched=True,
+        remove_columns=["text"],
+    )
+    collator = DataCollatorWithPadding(tokenizer=tokenizer)
+
+    for split in ["train", "validation", "test"]:
+        print(f"✅ [{split}] columns:", tokenized[split].column_names)
+
+    print("🔹 Loading encoder:", MODEL_NAME)
+    model = PhoBertMultiTask.from_base(
+        MODEL_NAME,
+        num_labels=len(LABELS),
+        num_priorities=len(PRIORITIES),
+        prio_loss_weight=PRIO_LOSS_WEIGHT,
+        prio_class_weights=torch.tensor(prio_weights, dtype=torch.float32),
+    )
+
+    args = TrainingArguments(
+        output_dir=OUTPUT_DIR,
+        learning_rate=2e-5,
+        per_device_train_batch_size=16,
+        per_device_eval_batch_size=32,
+        num_train_epochs=5,
+        weight_decay=0.01,
+        evaluation_strategy="epoch",
+        save_strategy="epoch",
+        save_total_limit=2,
+        load_best_model_at_end=True,
+        metric_for_best_model="eval_f1",
+        greater_is_better=True,
+        logging_steps=50,
+        report_to="none",
+        no_cuda=True,            # dùng CPU (tránh lỗi GPU driver)
+        fp16=False,
+        remove_unused_columns=False,
+        label_names=["labels", "prio_labels"],   # Trainer gom cả 2 nhãn khi evaluate
+        seed=SEED,
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=args,
+        train_dataset=tokenized["train"],
+        eval_dataset=tokenized["validation"],
+        tokenizer=tokenizer,
+        data_collator=collator,
+        compute_metrics=compute_metrics,
+    )
+
+    print("🔹 Start training...")
+    trainer.train()
+
+    print("🔹 Evaluate on validation:")
+    print(json.dumps(trainer.evaluate(tokenized["validation"]), indent=2, ensure_ascii=False))
+
+    print("🔹 Evaluate on test:")
+    print(json.dumps(trainer.evaluate(tokenized["test"]), indent=2, ensure_ascii=False))
+
+    print("🔹 Saving model to:", OUTPUT_DIR)
+    model.save_pretrained(OUTPUT_DIR)
+    tokenizer.save_pretrained(OUTPUT_DIR)
+
+    # Lưu label map cho cả 2 head & tem loại tác vụ (để predictor nhận diện đúng)
+    with open(os.path.join(OUTPUT_DIR, "label_map.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"label2id": label2id, "id2label": id2label, "prio2id": pri2id, "id2prio": id2pri},
+            f, ensure_ascii=False, indent=2,
+        )
+    with open(os.path.join(OUTPUT_DIR, "task_type.json"), "w", encoding="utf-8") as f:
+        json.dump({"type": TASK_TYPE_MULTITASK}, f, ensure_ascii=False, indent=2)
+
+    print("✅ Done. Model saved at:", OUTPUT_DIR)
+
+
+if __name__ == "__main__":
+    main()
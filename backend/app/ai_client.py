@@ -0,0 +1,108 @@
+# app/ai_client.py
+"""
+Điểm gọi AI phân loại duy nhất của phía web (crud/reports.py, routers/ai_router.py):
+
+  - AI_SERVER_URL rỗng (mặc định): chạy model ngay trong tiến trình như cũ
+    (1 câu qua micro-batcher ai.batching, nhiều câu qua ai.predictor.classify_many_full)
+  - AI_SERVER_URL=unix:///tmp/kssv-ai.sock | http://127.0.0.1:8765: gửi sang ai/inference_server.py,
+    tiến trình web không import torch / transformers và không giữ model trong RAM
+
+Inference server quá tải / không chạy => InferenceBusy / InferenceUnavailable: caller dùng heuristic
+(priority dự phòng) thay vì để request web chờ.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from ai.inference_client import InferenceBusy, InferenceClient, InferenceUnavailable  # type: ignore
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["InferenceBusy", "InferenceUnavailable", "is_remote", "available",
+           "classify_one", "classify_many", "stats"]
+
+_lock = threading.Lock()
+_client: Optional[InferenceClient] = None
+_local: Optional[Dict[str, Any]] = None
+
+
+def is_remote() -> bool:
+    return bool(settings.AI_SERVER_URL)
+
+
+def _remote() -> InferenceClient:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = InferenceClient(
+                    settings.AI_SERVER_URL,
+                    pool_size=settings.AI_SERVER_POOL_SIZE,
+                    timeout=settings.AI_SERVER_TIMEOUT_S,
+                    retry_s=settings.AI_SERVER_RETRY_S,
+                )
+                logger.info(f"[ai] phân loại qua inference server {settings.AI_SERVER_URL}")
+    return _client
+
+
+def _load_local() -> Dict[str, Any]:
+    """Import ai.predictor / ai.batching lần đầu cần tới ({} nếu môi trường chưa có AI)."""
+    global _local
+    if _local is None:
+        with _lock:
+            if _local is None:
+                try:
+                    from ai import predictor, batching  # type: ignore
+                    from ai.logging_utils import log_stats  # type: ignore
+                    _local = {
+                        "classify_one": batching.classify_one_coalesced,
+                        "classify_many": predictor.classify_many_full,
+                        "batcher_stats": batching.batcher_stats,
+                        "cache_stats": predictor.cache_stats,
+                        "infer_stats": predictor.infer_stats,
+                        "predlog_stats": log_stats,
+                    }
+                except Exception as e:
+                    logger.warning(f"[ai] không import được model AI: {e}")
+                    _local = {}
+    return _local
+
+
+def available() -> bool:
+    return is_remote() or bool(_load_local())
+
+
+def classify_one(text: str) -> Dict[str, Any]:
+    if is_remote():
+        return _remote().classify_one(text)
+    local = _load_local()
+    if not local:
+        raise InferenceUnavailable("môi trường chưa có AI")
+    return local["classify_one"](text)
+
+
+def classify_many(texts: List[str], batch_size: int = 16) -> List[Dict[str, Any]]:
+    if is_remote():
+        return _remote().classify_many(texts, batch_size=batch_size)
+    local = _load_local()
+    if not local:
+        raise InferenceUnavailable("môi trường chưa có AI")
+    return local["classify_many"](texts, batch_size=batch_size)
+
+
+def stats(kind: str) -> Dict[str, Any]:
+    """kind = batcher | cache | infer | predlog | client; chế độ remote lấy từ GET /stats của inference server."""
+    if is_remote():
+        client = _remote()
+        if kind == "client":
+            return client.stats()
+        return client.server_stats().get(kind) or {}
+    if kind == "client":
+        return {"mode": "in-process"}
+    local = _load_local()
+    fn = local.get(f"{kind}_stats")
+    return fn() if fn else {}
@@ -0,0 +1,86 @@
+# app/ai_warmup.py
+"""
+Nạp sẵn + làm nóng model AI lúc khởi động thay vì để report đầu tiên sau deploy / restart gánh
+2 lần from_pretrained + lượt forward đầu tiên (hay bị timeout phía client).
+
+  - AI_PRELOAD=1 (mặc định): on_startup gọi start() -> thread nền import ai.predictor,
+    nạp model rồi chạy ai.predictor.warmup() ở các độ dài AI_WARMUP_SEQ_LENS (lô 1 và AI_WARMUP_BATCH câu)
+  - server nhận request ngay; /healthz (liveness) luôn OK, GET /readyz trả 503 tới khi warm-up xong
+    (hoặc lỗi), 200 kèm thời gian import / nạp / từng lượt warm-up
+  - AI_PRELOAD=0: không nạp trước, /readyz trả 200 ngay (model nạp lười như cũ)
+  - AI_SERVER_URL đặt: model nằm ở inference server riêng (có /readyz riêng) => không nạp ở đây
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_state: Dict[str, Any] = {"status": PENDING, "error": None, "timings": None, "started_at": None, "finished_at": None}
+
+
+def _set(**kw) -> None:
+    with _lock:
+        _state.update(kw)
+
+
+def _run() -> None:
+    t0 = time.perf_counter()
+    try:
+        from ai import predictor  # type: ignore  # import torch/transformers cũng tốn vài giây
+        import_ms = (time.perf_counter() - t0) * 1000.0
+        predictor.configure_threads(settings.AI_TORCH_THREADS, settings.AI_TORCH_INTEROP_THREADS)
+        timings = predictor.warmup(tuple(settings.AI_WARMUP_SEQ_LENS), settings.AI_WARMUP_BATCH)
+    except Exception as e:
+        logger.exception("[warmup] nạp / làm nóng model AI thất bại")
+        _set(status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        return
+    timings = {"import_ms": round(import_ms, 1), **timings, "total_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+    _set(status=READY, timings=timings, finished_at=time.time())
+    logger.info(
+        f"[warmup] model sẵn sàng sau {timings['total_ms']:.0f} ms "
+        f"(import {timings['import_ms']:.0f} ms, nạp {timings['load_ms']:.0f} ms)"
+    )
+
+
+def start() -> None:
+    """Gọi từ on_startup; chạy 1 lần / tiến trình."""
+    global _thread
+    with _lock:
+        if _thread is not None or _state["status"] != PENDING:
+            return
+        if settings.AI_SERVER_URL:
+            _state.update(status=DISABLED, remote=settings.AI_SERVER_URL)
+            return
+        if not settings.AI_PRELOAD:
+            _state["status"] = DISABLED
+            return
+        _state.update(status=LOADING, started_at=time.time())
+        _thread = threading.Thread(target=_run, name="ai-warmup", daemon=True)
+    _thread.start()
+
+
+def is_ready() -> bool:
+    return _state["status"] in (READY, DISABLED)
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        st = dict(_state)
+    st["ready"] = st["status"] in (READY, DISABLED)
+    if st["status"] == LOADING and st["started_at"]:
+        st["elapsed_s"] = round(time.time() - st["started_at"], 1)
+    return st
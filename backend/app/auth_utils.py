@@ -1,6 +1,9 @@
 # app/auth_utils.py
+import time
+import threading
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 from fastapi import Depends, HTTPException, status  # type: ignore
 from fastapi.security import OAuth2PasswordBearer  # type: ignore
@@ -29,7 +32,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 def create_access_token(
     data: Dict[str, Any],
-    expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES,
+    expires_minutes: float = ACCESS_TOKEN_EXPIRE_MINUTES,
 ) -> str:
     """Ký JWT: payload nên có 'sub' (username) và 'user_id' nếu muốn."""
     to_encode = data.copy()
@@ -37,13 +40,81 @@ def create_access_token(
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
-def decode_token(token: str) -> Optional[dict]:
+def decode_token(token: str, scope: Optional[str] = None) -> Optional[dict]:
+    """
+    Giải mã + kiểm tra chữ ký / hạn. Token có claim "scope" (vd vé "events" của /events/stream)
+    chỉ hợp lệ khi gọi đúng scope đó => không dùng thay access token được.
+    """
     try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
+    return payload if payload.get("scope") == scope else None
+
+# ===================== User cache (AUTH_MODE=claims) =====================
+@dataclass(frozen=True)
+class CurrentUser:
+    """User đã xác thực, dựng từ claim JWT (không phải ORM object, không gắn session)."""
+    id: int
+    username: str
+    role: str
+    token_version: int = 0
+
+# user_id -> (hết hạn lúc, CurrentUser theo DB)
+_user_cache: Dict[int, Tuple[float, CurrentUser]] = {}
+_user_cache_lock = threading.Lock()
+_USER_CACHE_MAX = 10_000
+
+def invalidate_user(user_id: int) -> None:
+    """Gọi sau khi đổi role / mật khẩu / xoá user (đã commit)."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+def _cache_user(user: User) -> CurrentUser:
+    cu = CurrentUser(user.id, user.username, user.role, user.token_version or 0)
+    with _user_cache_lock:
+        if len(_user_cache) >= _USER_CACHE_MAX:
+            _user_cache.clear()
+        _user_cache[user.id] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL_S, cu)
+    return cu
+
+def _cached_user(db: Session, user_id: int) -> Optional[CurrentUser]:
+    with _user_cache_lock:
+        hit = _user_cache.get(user_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    row = db.query(User.id, User.username, User.role, User.token_version).filter(User.id == user_id).first()
+    if row is None:
+        invalidate_user(user_id)
+        return None
+    return _cache_user(row)
+
+def bump_token_version(user: User) -> None:
+    """Thu hồi mọi token đã cấp cho user (caller tự commit rồi gọi invalidate_user)."""
+    user.token_version = (user.token_version or 0) + 1
+
+def principal_from_claims(db: Session, payload: dict) -> Optional[CurrentUser]:
+    """
+    User của claim đã xác thực (vd lúc mở / mỗi heartbeat của SSE) nếu còn hiệu lực: user còn,
+    token_version / role chưa đổi (qua cache, hết TTL mới SELECT 1 dòng). Ngược lại None.
+    """
+    cu = _cached_user(db, int(payload.get("user_id") or 0))
+    if cu is None:
+        return None
+    if "ver" in payload and payload["ver"] != cu.token_version:
+        return None
+    if payload.get("role") not in (None, cu.role):
+        return None
+    return cu
 
 # ===================== Current user dependency =====================
+def _unauthorized(detail: str = "Không xác thực được người dùng") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
@@ -51,14 +122,12 @@ def get_current_user(
     """
     Lấy JWT từ header Authorization -> giải mã -> tìm User trong DB.
     Hỗ trợ cả 'sub' (username) và 'user_id' trong payload.
+    Dùng khi endpoint cần cả bản ghi User (sửa hồ sơ, đổi mật khẩu...);
+    chỉ cần id/role thì dùng get_current_principal.
     """
     payload = decode_token(token)
     if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Không xác thực được người dùng",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized()
 
     username = payload.get("sub") or payload.get("username")
     user_id = payload.get("user_id")
@@ -70,9 +139,30 @@ def get_current_user(
         user = db.query(User).filter(User.username == username).first()
 
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Tài khoản không tồn tại hoặc token không hợp lệ",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Tài khoản không tồn tại hoặc token không hợp lệ")
+    if "ver" in payload and payload["ver"] != (user.token_version or 0):
+        raise _unauthorized("Phiên đăng nhập đã hết hiệu lực, vui lòng đăng nhập lại")
+    if settings.AUTH_MODE == "claims":
+        _cache_user(user)
     return user
+
+def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> CurrentUser | User:
+    """
+    User hiện tại cho kiểm tra quyền / lấy id.
+    AUTH_MODE=claims + token có "ver": tin claim đã ký, chỉ đối chiếu token_version với cache
+    (hết TTL mới SELECT lại 1 dòng) => đa số request không chạm DB.
+    Token cũ (không có "ver") hoặc AUTH_MODE=db: như get_current_user.
+    """
+    payload = decode_token(token)
+    if settings.AUTH_MODE != "claims" or not payload or "ver" not in payload or not payload.get("user_id"):
+        return get_current_user(token, db)
+
+    cu = _cached_user(db, int(payload["user_id"]))
+    if cu is None:
+        raise _unauthorized("Tài khoản không tồn tại hoặc token không hợp lệ")
+    if payload["ver"] != cu.token_version or payload.get("role") != cu.role:
+        raise _unauthorized("Phiên đăng nhập đã hết hiệu lực, vui lòng đăng nhập lại")
+    return cu
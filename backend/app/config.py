@@ -10,4 +10,67 @@ class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./ktx_dnu.db")
     CORS_ORIGINS: list[str] = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://127.0.0.1:5500,http://localhost:5500").split(",") if o.strip()]
 
+    # AI enrichment chạy nền cho report (app/enrichment.py)
+    ENRICH_ASYNC: bool = os.getenv("ENRICH_ASYNC", "1") in ("1", "true", "True")  # 0 = chạy ngay trong request như cũ
+    ENRICH_WORKERS: int = int(os.getenv("ENRICH_WORKERS", "2"))
+    ENRICH_MAX_ATTEMPTS: int = int(os.getenv("ENRICH_MAX_ATTEMPTS", "4"))
+    ENRICH_RETRY_BASE_S: float = float(os.getenv("ENRICH_RETRY_BASE_S", "5"))    # backoff: base * 2^(attempt-1)
+    ENRICH_POLL_S: float = float(os.getenv("ENRICH_POLL_S", "10"))               # chu kỳ quét bảng enrichment_jobs
+    ENRICH_LEASE_S: float = float(os.getenv("ENRICH_LEASE_S", "300"))            # job 'processing' quá lâu => nhận lại
+
+    # Nạp sẵn + làm nóng model AI khi khởi động (app/ai_warmup.py); GET /readyz = 200 sau khi xong
+    AI_PRELOAD: bool = os.getenv("AI_PRELOAD", "1") in ("1", "true", "True")
+    AI_WARMUP_SEQ_LENS: list[int] = [int(x) for x in os.getenv("AI_WARMUP_SEQ_LENS", "16,64,256").split(",") if x.strip()]
+    AI_WARMUP_BATCH: int = int(os.getenv("AI_WARMUP_BATCH", "8"))
+
+    # Luồng torch cho suy luận trong tiến trình (ai/torch_threads.py); rỗng = mặc định torch (số core).
+    # Giới hạn lượt forward đồng thời: AI_INFER_CONCURRENCY / AI_INFER_POOL (đọc thẳng ở ai/torch_threads.py)
+    AI_TORCH_THREADS: int | None = int(os.getenv("AI_TORCH_THREADS") or 0) or None           # intra-op / lượt forward
+    AI_TORCH_INTEROP_THREADS: int | None = int(os.getenv("AI_TORCH_INTEROP_THREADS") or 0) or None
+
+    # Inference server riêng (ai/inference_server.py, app/ai_client.py); rỗng = chạy model trong tiến trình web
+    AI_SERVER_URL: str = os.getenv("AI_SERVER_URL", "").strip()                  # unix:///tmp/kssv-ai.sock | http://127.0.0.1:8765
+    AI_SERVER_TIMEOUT_S: float = float(os.getenv("AI_SERVER_TIMEOUT_S", "10"))   # quá => heuristic thay vì chờ
+    AI_SERVER_POOL_SIZE: int = int(os.getenv("AI_SERVER_POOL_SIZE", "8"))        # kết nối keep-alive / tiến trình web
+    AI_SERVER_RETRY_S: float = float(os.getenv("AI_SERVER_RETRY_S", "5"))        # server không chạy => chờ bấy lâu mới thử lại
+
+    # Cache kết quả GET /stats (giây, 0 = tắt)
+    STATS_CACHE_TTL_S: float = float(os.getenv("STATS_CACHE_TTL_S", "30"))
+
+    # Upload ảnh (app/upload_utils.py)
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "").strip()                                 # rỗng = app/uploads
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))   # 10 MB
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))     # 256 KB / lần ghi
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))                            # thread sinh ảnh thu nhỏ
+    # Dọn ảnh đã upload nhưng không gắn vào report / check-in nào (app/upload_gc.py).
+    # UPLOAD_GC_INTERVAL_S=0 => tắt, chạy cron: cd backend && python -m app.migrate_uploads --gc --grace-hours 24
+    UPLOAD_ORPHAN_GRACE_H: float = float(os.getenv("UPLOAD_ORPHAN_GRACE_H", "24"))
+    UPLOAD_GC_INTERVAL_S: float = float(os.getenv("UPLOAD_GC_INTERVAL_S", "3600"))
+
+    # Xác thực: "claims" = quyền lấy từ JWT + cache user ngắn hạn (không SELECT users mỗi request),
+    #           "db" = tra bảng users ở mọi request như cũ
+    AUTH_MODE: str = os.getenv("AUTH_MODE", "claims").strip().lower()
+    AUTH_USER_CACHE_TTL_S: float = float(os.getenv("AUTH_USER_CACHE_TTL_S", "30"))
+
+    # bcrypt chạy trong pool riêng (app/password_service.py); quá PASSWORD_MAX_PENDING việc => 503
+    PASSWORD_WORKERS: int = int(os.getenv("PASSWORD_WORKERS", "4"))
+    PASSWORD_MAX_PENDING: int = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+    PASSWORD_RETRY_AFTER_S: int = int(os.getenv("PASSWORD_RETRY_AFTER_S", "2"))
+    # POST /users/import: số tài khoản tạo tối đa / request (~0.25s bcrypt mỗi cái / PASSWORD_WORKERS
+    # luồng => 500 dòng ~30s, còn xa timeout 120s của gunicorn); file lớn hơn => chia file hoặc CLI
+    USERS_IMPORT_MAX_ROWS: int = int(os.getenv("USERS_IMPORT_MAX_ROWS", "500"))
+
+    # Đồng bộ delta GET .../changes (app/crud/sync.py)
+    SYNC_OVERLAP_S: float = float(os.getenv("SYNC_OVERLAP_S", "2"))          # lùi watermark để không sót transaction commit muộn
+    SYNC_TOMBSTONE_DAYS: int = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))   # giữ dấu xoá; since cũ hơn => client tải lại toàn bộ
+
+    # Server-Sent Events GET /events/stream (app/events.py)
+    EVENTS_BUFFER_SIZE: int = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))           # ring buffer phát lại theo Last-Event-ID
+    EVENTS_QUEUE_SIZE: int = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))              # sự kiện chờ gửi / kết nối, đầy => ngắt
+    EVENTS_HEARTBEAT_S: float = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+    EVENTS_RETRY_MS: int = int(os.getenv("EVENTS_RETRY_MS", "3000"))                 # trình duyệt chờ bao lâu rồi nối lại
+    EVENTS_MAX_CONNECTIONS: int = int(os.getenv("EVENTS_MAX_CONNECTIONS", "500"))
+    EVENTS_MAX_PER_USER: int = int(os.getenv("EVENTS_MAX_PER_USER", "5"))            # ~ số tab cùng mở
+    EVENTS_TICKET_TTL_S: int = int(os.getenv("EVENTS_TICKET_TTL_S", "60"))           # vé ?ticket= của EventSource
+
 settings = Settings()
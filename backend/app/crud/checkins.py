@@ -3,6 +3,9 @@ from typing import List, Optional
 
 from ..models import CheckinRequest
 from ..schemas import CheckinCreate, CheckinUpdate
+from . import stats as crud_stats
+from . import uploads as crud_uploads
+from .. import events
 
 
 def create_checkin(db: Session, student_id: int, data: CheckinCreate) -> CheckinRequest:
@@ -18,14 +21,19 @@ def create_checkin(db: Session, student_id: int, data: CheckinCreate) -> Checkin
         student_id=student_id,
     )
     db.add(ck)
+    db.flush()
+    crud_uploads.attach(db, crud_uploads.OWNER_CHECKIN, ck.id, ck.image_url)
     db.commit()
+    crud_stats.invalidate()
 
     # Trả về bản ghi kèm thông tin sinh viên
-    return (
+    ck = (
         db.query(CheckinRequest)
         .options(selectinload(CheckinRequest.student))
         .get(ck.id)
     )
+    events.publish(events.CHECKIN_CREATED, events.checkin_payload(ck), student_id)
+    return ck
 
 
 def list_checkins(db: Session, skip: int = 0, limit: int = 200) -> List[CheckinRequest]:
@@ -79,10 +87,17 @@ def update_checkin(db: Session, ck_id: int, upd: CheckinUpdate) -> Optional[Chec
         ck.status = upd.status
     if upd.admin_reply is not None:
         ck.admin_reply = upd.admin_reply
+    gc_blobs: List[int] = []
     if hasattr(upd, "image_url") and upd.image_url is not None:
+        if upd.image_url != ck.image_url:
+            gc_blobs = crud_uploads.replace(db, crud_uploads.OWNER_CHECKIN, ck.id, upd.image_url)
         ck.image_url = upd.image_url
 
     db.commit()
+    crud_stats.invalidate()
+    crud_uploads.collect_garbage(db, gc_blobs)
 
     # Trả về bản ghi sau cập nhật, có kèm student
-    return get_checkin(db, ck_id)
+    ck = get_checkin(db, ck_id)
+    events.publish(events.CHECKIN_UPDATED, events.checkin_payload(ck), ck.student_id)
+    return ck
@@ -2,20 +2,22 @@
 from __future__ import annotations
 
 import json
+import base64
 import logging
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta
 
+from sqlalchemy import and_, or_  # type: ignore
 from sqlalchemy.orm import Session, selectinload  # type: ignore
 from sqlalchemy.exc import SQLAlchemyError  # type: ignore
 
-from .. import models, schemas
+from .. import models, schemas, events
+from . import stats as crud_stats
+from . import uploads as crud_uploads
+from . import sync as crud_sync
 
-# ✅ PhoBERT / bộ phân loại
-try:
-    from ai.predictor import classify_one_full  # type: ignore
-except Exception:
-    classify_one_full = None  # fallback nếu môi trường chưa có AI
+# ✅ PhoBERT / bộ phân loại: trong tiến trình (micro-batcher) hoặc inference server riêng (AI_SERVER_URL)
+from .. import ai_client
 
 # ✅ Gemini auto-reply
 try:
@@ -92,130 +94,252 @@ def _normalize_priority(p: Optional[str]) -> str:
     return p2 if p2 in ALLOWED_PRIORITIES else "high"
 
 
-# --------- CRUD ----------
-def create_report(db: Session, reporter_id: int, data: schemas.ReportCreate) -> models.Report:
-    # Làm sạch input
-    title = (data.title or "").strip() or "(không có tiêu đề)"
-    description = (data.description or None)
-    category = (data.category or None)
-    client_priority = (data.priority or None)
+# --------- AI enrichment (chạy nền, xem app/enrichment.py) ----------
+DEFAULT_AUTO_REPLY = "Hệ thống đã ghi nhận sự cố, bộ phận kỹ thuật sẽ xử lý trong thời gian sớm nhất."
 
-    image_url = (getattr(data, "image_url", None) or None)
-    if isinstance(image_url, str):
-        image_url = image_url.strip() or None
+LABEL_TO_CATEGORY = {
+    "điện": "Điện",
+    "nước": "Nước",
+    "internet": "Internet",
+    "thiết bị": "Cơ sở vật chất",
+    "vệ sinh": "Vệ sinh",
+    "khác": "Khác",
+}
 
-    building = (getattr(data, "building", None) or None)
-    if isinstance(building, str):
-        building = building.strip() or None
 
-    room = (getattr(data, "room", None) or None)
-    if isinstance(room, str):
-        room = room.strip() or None
+class EnrichmentError(RuntimeError):
+    """AI / Gemini lỗi ở một lần chạy, worker sẽ thử lại."""
 
-    rpt = models.Report(
-        title=title,
-        description=description,
-        category=category,        # có thể None, sẽ map từ AI nếu có
-        priority=None,            # set ở dưới
-        reporter_id=reporter_id,
-        status="open",
-        image_url=image_url,
-        building=building,
-        room=room,
-    )
-
-    db.add(rpt)
-    db.flush()  # có id tạm cho log
 
+def compute_enrichment(
+    title: str,
+    description: Optional[str],
+    client_priority: Optional[str],
+    strict: bool = True,
+) -> dict:
+    """
+    Chạy PhoBERT + Gemini cho 1 report, KHÔNG đụng tới DB (gọi ngoài transaction).
+    - strict=True : lỗi AI/Gemini => raise EnrichmentError để worker thử lại
+    - strict=False: lần thử cuối, lỗi thì dùng fallback như trước (priority dự phòng, câu trả lời mặc định)
+    Trả về dict các trường cần ghi + "errors" (list lỗi đã bỏ qua khi strict=False).
+    """
+    errors: List[str] = []
+    fields: dict = {}
     ai_label: Optional[str] = None
     pred: dict = {}
 
     # ✅ Gọi AI phân loại (nếu có)
-    if classify_one_full:
+    if ai_client.available():
         try:
             text = f"{title}. {description or ''}"
-            pred = classify_one_full(text) or {}
+            pred = ai_client.classify_one(text) or {}
             ai_label = pred.get("label")
-            rpt.ai_label = ai_label
-            rpt.ai_confidence = float(pred.get("label_confidence") or 0.0) or None
+            fields["ai_label"] = ai_label
+            fields["ai_confidence"] = float(pred.get("label_confidence") or 0.0) or None
             meta = pred.get("meta") or {}
-            rpt.ai_room = meta.get("phong")
+            fields["ai_room"] = meta.get("phong")
 
             # Tầng: ưu tiên NER, nếu thiếu thì suy từ số phòng
             floor_val = meta.get("tang")
             if floor_val is None:
-                floor_val = _infer_floor_from_room(rpt.ai_room)
+                floor_val = _infer_floor_from_room(fields["ai_room"])
             try:
-                rpt.ai_floor = int(floor_val) if floor_val is not None else None
+                fields["ai_floor"] = int(floor_val) if floor_val is not None else None
             except Exception:
-                rpt.ai_floor = None
-
-            # Thời gian: nếu NER không có, set theo thời điểm gửi
-            rpt.ai_time_text = meta.get("thoigian") or datetime.now().strftime("%H:%M:%S %d/%m/%Y")
-
-            # Map category theo nhãn (nếu thiếu)
-            if not rpt.category and ai_label:
-                mapping = {
-                    "điện": "Điện",
-                    "nước": "Nước",
-                    "internet": "Internet",
-                    "thiết bị": "Cơ sở vật chất",
-                    "vệ sinh": "Vệ sinh",
-                    "khác": "Khác",
-                }
-                rpt.category = mapping.get(ai_label, "Khác")
-
+                fields["ai_floor"] = None
+
+            # Thời gian: chỉ ghi đè khi NER bắt được (mặc định đã set lúc tạo report)
+            if meta.get("thoigian"):
+                fields["ai_time_text"] = meta.get("thoigian")
+
+            # Map category theo nhãn (chỉ áp dụng nếu report chưa có category)
+            if ai_label:
+                fields["category"] = LABEL_TO_CATEGORY.get(ai_label, "Khác")
+        except ai_client.InferenceBusy as e:
+            # inference server quá tải: không thử lại, chốt priority bằng heuristic bên dưới
+            logger.info(f"[AI busy] dùng priority dự phòng: {e}")
+            pred = {}
         except Exception as e:
-            logger.warning(f"[AI enrich failed][report_id={rpt.id}] {e}")
+            if strict:
+                raise EnrichmentError(f"classify: {e}") from e
+            errors.append(f"classify: {e}")
+            pred = {}
 
     # ✅ Chốt priority
     ai_priority = (pred.get("priority") if pred else None)
     chosen_priority = client_priority or ai_priority or _auto_priority_backup(title, description, ai_label)
-    rpt.priority = _normalize_priority(chosen_priority)
+    fields["priority"] = _normalize_priority(chosen_priority)
 
     # ✅ Gọi Gemini để sinh phản hồi tự động
     if generate_auto_reply:
         try:
-            auto_reply = generate_auto_reply(description or title, ai_label or "khác", rpt.priority)
+            auto_reply = generate_auto_reply(description or title, ai_label or "khác", fields["priority"])
             if auto_reply and len(auto_reply) > 500:
                 auto_reply = auto_reply[:500].rstrip() + "…"
-            rpt.admin_reply = auto_reply
-            rpt.admin_reply_source = "ai"  # 👈 Đánh dấu nguồn phản hồi là AI
+            fields["admin_reply"] = auto_reply
+            fields["admin_reply_source"] = "ai"  # 👈 Đánh dấu nguồn phản hồi là AI
         except Exception as e:
-            logger.warning(f"[Gemini auto-reply failed][report_id={rpt.id}] {e}")
+            if strict:
+                raise EnrichmentError(f"gemini: {e}") from e
+            errors.append(f"gemini: {e}")
             # Không gán source để biết đây không phải AI
-            rpt.admin_reply = "Hệ thống đã ghi nhận sự cố, bộ phận kỹ thuật sẽ xử lý trong thời gian sớm nhất."
+            fields["admin_reply"] = DEFAULT_AUTO_REPLY
 
     # ✅ Lưu meta AI (nếu có)
     if pred:
         try:
-            rpt.ai_meta = json.dumps(pred, ensure_ascii=False)
+            fields["ai_meta"] = json.dumps(pred, ensure_ascii=False)
         except Exception:
             pass
 
-    # Nếu vẫn chưa có ai_time_text (trường hợp không có AI), đặt theo giờ thực
-    if not getattr(rpt, "ai_time_text", None):
-        rpt.ai_time_text = datetime.now().strftime("%H:%M:%S %d/%m/%Y")
+    fields["errors"] = errors
+    return fields
+
+
+def apply_enrichment(rpt: models.Report, fields: dict, keep_priority: bool = False) -> None:
+    """
+    Ghi kết quả compute_enrichment vào report (caller tự commit).
+    Không ghi đè những gì người dùng/admin đã sửa trong lúc job đang chạy:
+      - category đã có
+      - admin_reply do admin nhập tay (admin_reply_source = "manual")
+      - priority khi keep_priority=True (client tự chọn hoặc admin đã đổi: job.client_priority)
+    """
+    for key in ("ai_label", "ai_confidence", "ai_room", "ai_floor", "ai_time_text", "ai_meta"):
+        if key in fields:
+            setattr(rpt, key, fields[key])
+    if not rpt.category and fields.get("category"):
+        rpt.category = fields["category"]
+    if not keep_priority and fields.get("priority"):
+        rpt.priority = fields["priority"]
+    if "admin_reply" in fields and rpt.admin_reply_source != "manual":
+        rpt.admin_reply = fields["admin_reply"]
+        rpt.admin_reply_source = fields.get("admin_reply_source")
+
+
+# --------- CRUD ----------
+def create_report(db: Session, reporter_id: int, data: schemas.ReportCreate) -> models.Report:
+    """
+    Ghi report và commit NGAY (không chờ AI/Gemini). Priority tạm lấy từ client hoặc
+    luật dự phòng; phần làm giàu AI được ghi vào bảng enrichment_jobs cùng transaction
+    để worker nền (app/enrichment.py) xử lý — caller gọi enrichment.enqueue(rpt.id).
+    """
+    # Làm sạch input
+    title = (data.title or "").strip() or "(không có tiêu đề)"
+    description = (data.description or None)
+    category = (data.category or None)
+    client_priority = (data.priority or None)
+
+    image_url = (getattr(data, "image_url", None) or None)
+    if isinstance(image_url, str):
+        image_url = image_url.strip() or None
 
+    building = (getattr(data, "building", None) or None)
+    if isinstance(building, str):
+        building = building.strip() or None
+
+    room = (getattr(data, "room", None) or None)
+    if isinstance(room, str):
+        room = room.strip() or None
+
+    rpt = models.Report(
+        title=title,
+        description=description,
+        category=category,        # có thể None, worker sẽ map từ nhãn AI
+        priority=_normalize_priority(client_priority or _auto_priority_backup(title, description, None)),
+        reporter_id=reporter_id,
+        status="open",
+        image_url=image_url,
+        building=building,
+        room=room,
+        # Thời gian mặc định = lúc gửi, worker ghi đè nếu NER bắt được
+        ai_time_text=datetime.now().strftime("%H:%M:%S %d/%m/%Y"),
+        ai_status="pending",
+    )
+    rpt.enrichment_job = models.EnrichmentJob(
+        status="pending",
+        client_priority=_normalize_priority(client_priority) if client_priority else None,
+        next_run_at=datetime.now(),
+    )
+
+    db.add(rpt)
     try:
+        db.flush()
+        crud_uploads.attach(db, crud_uploads.OWNER_REPORT, rpt.id, image_url)
         db.commit()
     except SQLAlchemyError:
         db.rollback()
         logger.exception(f"[DB COMMIT FAILED][report_id={getattr(rpt,'id',None)}]")
         raise
+    crud_stats.invalidate()
     db.refresh(rpt)
+    events.publish(events.REPORT_CREATED, events.report_payload(rpt), rpt.reporter_id)
     return rpt
 
 
-def list_reports(db: Session, skip: int = 0, limit: int = 200) -> List[models.Report]:
-    return (
-        db.query(models.Report)
-        .options(selectinload(models.Report.reporter))
-        .order_by(models.Report.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+# --------- Keyset pagination ----------
+def encode_cursor(rpt: models.Report) -> str:
+    """Cursor = base64url("<created_at ISO>|<id>") của dòng cuối trang."""
+    raw = f"{rpt.created_at.isoformat()}|{rpt.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raise ValueError nếu cursor hỏng."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, rid = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(rid)
+    except Exception as e:
+        raise ValueError("cursor không hợp lệ") from e
+
+
+def list_reports_page(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    category: Optional[str] = None,
+    ai_label: Optional[str] = None,
+    building: Optional[str] = None,
+    room: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Tuple[List[models.Report], Optional[str]]:
+    """
+    1 trang report mới nhất trước, phân trang keyset theo (created_at, id):
+    trang sau = các dòng "nhỏ hơn" dòng cuối trang trước => không phải OFFSET qua N dòng.
+    date_to tính cả ngày đó. Trả về (items, next_cursor) — next_cursor=None là hết.
+    """
+    R = models.Report
+    q = db.query(R).options(selectinload(R.reporter))
+
+    if status:
+        q = q.filter(R.status == status)
+    if priority:
+        q = q.filter(R.priority == _normalize_priority(priority))
+    if category:
+        q = q.filter(R.category == category)
+    if ai_label:
+        q = q.filter(R.ai_label == ai_label)
+    if building:
+        q = q.filter(R.building == building.strip())
+    if room:
+        q = q.filter(R.room == room.strip())
+    if date_from:
+        q = q.filter(R.created_at >= crud_sync.bind_ts(db, datetime.combine(date_from, datetime.min.time())))
+    if date_to:
+        q = q.filter(R.created_at < crud_sync.bind_ts(db, datetime.combine(date_to + timedelta(days=1), datetime.min.time())))
+
+    if cursor:
+        c_at, c_id = decode_cursor(cursor)
+        c_ts = crud_sync.bind_ts(db, c_at)   # SQLite: so cùng định dạng chuỗi, không thì trang sau lặp lại trang trước
+        q = q.filter(or_(R.created_at < c_ts, and_(R.created_at == c_ts, R.id < c_id)))
+
+    rows = q.order_by(R.created_at.desc(), R.id.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
 
 
 def list_reports_by_user(db: Session, user_id: int) -> List[models.Report]:
@@ -258,20 +382,26 @@ def update_report(db: Session, report_id: int, upd: schemas.ReportUpdate) -> Opt
             rpt.admin_reply_source = "manual"
     if hasattr(upd, "priority") and upd.priority is not None:
         rpt.priority = _normalize_priority(upd.priority)
+        # ghi nhận priority admin chọn để worker làm giàu (đang chờ / retry) không ghi đè
+        if rpt.enrichment_job is not None:
+            rpt.enrichment_job.client_priority = rpt.priority
     if hasattr(upd, "building") and upd.building is not None:
         rpt.building = (upd.building or "").strip() or None
     if hasattr(upd, "room") and upd.room is not None:
         rpt.room = (upd.room or "").strip() or None
+    gc_blobs: List[int] = []
     if hasattr(upd, "image_url") and upd.image_url is not None:
         img = (upd.image_url or "").strip()
+        if (img or None) != rpt.image_url:
+            gc_blobs = crud_uploads.replace(db, crud_uploads.OWNER_REPORT, rpt.id, img or None)
         rpt.image_url = img or None
 
     # Tùy chọn: phân loại lại nếu admin yêu cầu
     reclass = getattr(upd, "reclassify", False)
-    if reclass and classify_one_full:
+    if reclass and ai_client.available():
         try:
             text = f"{rpt.title}. {rpt.description or ''}"
-            pred = classify_one_full(text) or {}
+            pred = ai_client.classify_one(text) or {}
             if pred:
                 rpt.ai_label = pred.get("label") or rpt.ai_label
                 rpt.ai_confidence = float(pred.get("label_confidence") or 0.0) or rpt.ai_confidence
@@ -281,6 +411,8 @@ def update_report(db: Session, report_id: int, upd: schemas.ReportUpdate) -> Opt
                     rpt.ai_meta = json.dumps(pred, ensure_ascii=False)
                 except Exception:
                     pass
+        except ai_client.InferenceBusy as e:
+            logger.info(f"[AI busy][report_id={rpt.id}] bỏ qua phân loại lại: {e}")
         except Exception as e:
             logger.warning(f"[AI reclassify failed][report_id={rpt.id}] {e}")
 
@@ -289,7 +421,10 @@ def update_report(db: Session, report_id: int, upd: schemas.ReportUpdate) -> Opt
     except SQLAlchemyError:
         db.rollback()
         raise
+    crud_stats.invalidate()
+    crud_uploads.collect_garbage(db, gc_blobs)
     db.refresh(rpt)
+    events.publish(events.REPORT_UPDATED, events.report_payload(rpt), rpt.reporter_id)
     return rpt
 
 
@@ -298,10 +433,19 @@ def delete_report(db: Session, report_id: int) -> bool:
     rpt = get_report(db, report_id)
     if not rpt:
         return False
+    payload, owner_id = events.report_payload(rpt), rpt.reporter_id
+    gc_blobs = crud_uploads.detach_all(db, crud_uploads.OWNER_REPORT, rpt.id)
+    # Dấu xoá cho GET /reports/changes (cùng transaction với lệnh xoá)
+    crud_sync.record_tombstones(db, crud_sync.ENTITY_REPORT, [(rpt.id, rpt.reporter_id)])
     db.delete(rpt)
     try:
         db.commit()
     except SQLAlchemyError:
         db.rollback()
         raise
+    crud_stats.invalidate()
+    # Ảnh không còn report / check-in nào dùng => xoá khỏi kho
+    crud_uploads.collect_garbage(db, gc_blobs)
+    crud_sync.prune_tombstones(db)
+    events.publish(events.REPORT_DELETED, payload, owner_id)
     return True
@@ -0,0 +1,129 @@
+# app/crud/stats.py
+from __future__ import annotations
+
+import time
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from .. import models
+from ..config import settings
+
+# --------- Cache ngắn hạn ----------
+# Mỗi tiến trình 1 cache; crud reports/checkins gọi invalidate() khi dữ liệu đổi.
+# Tiến trình khác (nhiều worker uvicorn/gunicorn) chỉ cũ tối đa STATS_CACHE_TTL_S giây.
+_CACHE: Dict[Tuple[Optional[date], Optional[date]], Tuple[float, Dict[str, Any]]] = {}
+_LOCK = threading.Lock()
+_GEN = 0  # tăng mỗi lần invalidate: kết quả tính dở trước đó sẽ không được lưu
+
+
+def invalidate() -> None:
+    global _GEN
+    with _LOCK:
+        _CACHE.clear()
+        _GEN += 1
+
+
+# --------- Helpers ----------
+def _day_expr(db: Session, col):
+    """Cắt datetime về ngày theo dialect (SQLite không có CAST AS DATE đúng nghĩa)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(col)
+    return cast(col, Date)
+
+
+def _as_date(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+def _window(q, col, date_from: Optional[date], date_to: Optional[date]):
+    if date_from:
+        q = q.filter(col >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        q = q.filter(col < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return q
+
+
+def _group_count(db: Session, key, created_col, date_from, date_to) -> List[Dict[str, Any]]:
+    q = db.query(key, func.count()).select_from(created_col.class_)
+    q = _window(q, created_col, date_from, date_to).group_by(key)
+    rows = [{"key": k, "count": int(n)} for k, n in q.all()]
+    rows.sort(key=lambda r: -r["count"])
+    return rows
+
+
+def _by_day(db: Session, created_col, date_from, date_to) -> List[Dict[str, Any]]:
+    day = _day_expr(db, created_col)
+    q = db.query(day, func.count()).select_from(created_col.class_)
+    q = _window(q, created_col, date_from, date_to).group_by(day).order_by(day)
+    return [{"date": _as_date(d).isoformat(), "count": int(n)} for d, n in q.all() if d is not None]
+
+
+def _by_week(by_day: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gộp theo tuần (bắt đầu thứ Hai) từ kết quả theo ngày — tránh hàm tuần khác nhau giữa các DB."""
+    weeks: Dict[str, int] = {}
+    for row in by_day:
+        d = date.fromisoformat(row["date"])
+        start = (d - timedelta(days=d.weekday())).isoformat()
+        weeks[start] = weeks.get(start, 0) + row["count"]
+    return [{"week_start": k, "count": v} for k, v in sorted(weeks.items())]
+
+
+# --------- Thống kê ----------
+def compute_stats(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, Any]:
+    R, C = models.Report, models.CheckinRequest
+
+    report_days = _by_day(db, R.created_at, date_from, date_to)
+    checkin_days = _by_day(db, C.created_at, date_from, date_to)
+
+    return {
+        "window": {
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+        },
+        "reports": {
+            "total": sum(r["count"] for r in report_days),
+            "by_status": _group_count(db, R.status, R.created_at, date_from, date_to),
+            "by_priority": _group_count(db, R.priority, R.created_at, date_from, date_to),
+            # category người dùng chọn, rỗng thì dùng nhãn AI (giống biểu đồ cũ)
+            "by_category": _group_count(db, func.coalesce(R.category, R.ai_label), R.created_at, date_from, date_to),
+            "by_building": _group_count(db, R.building, R.created_at, date_from, date_to),
+            "by_day": report_days,
+            "by_week": _by_week(report_days),
+        },
+        "checkins": {
+            "total": sum(r["count"] for r in checkin_days),
+            "by_type": _group_count(db, C.type, C.created_at, date_from, date_to),
+            "by_status": _group_count(db, C.status, C.created_at, date_from, date_to),
+            "by_day": checkin_days,
+            "by_week": _by_week(checkin_days),
+        },
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def get_stats(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, Any]:
+    """compute_stats qua cache TTL (STATS_CACHE_TTL_S, 0 = tắt cache)."""
+    key = (date_from, date_to)
+    ttl = settings.STATS_CACHE_TTL_S
+    now = time.monotonic()
+    if ttl > 0:
+        with _LOCK:
+            hit = _CACHE.get(key)
+            gen = _GEN
+        if hit and hit[0] > now:
+            return {**hit[1], "cached": True}
+
+    data = compute_stats(db, date_from, date_to)
+    if ttl > 0:
+        with _LOCK:
+            if gen == _GEN:
+                _CACHE[key] = (now + ttl, data)
+    return {**data, "cached": False}
@@ -0,0 +1,156 @@
+# app/crud/sync.py
+"""
+Đồng bộ delta cho FE: GET /reports/changes, /reports/mine/changes, /checkins/changes, /checkins/mine/changes.
+
+Client giữ cache cục bộ + 1 watermark `since` (chuỗi mờ do server cấp):
+  - lần đầu không gửi since => reset=true, nhận toàn bộ (phân trang theo has_more)
+  - các lần sau gửi lại next_since => chỉ nhận dòng tạo / sửa sau watermark (items)
+    và id đã bị xoá (deleted, lấy từ bảng tombstones)
+  - since cũ hơn SYNC_TOMBSTONE_DAYS (dấu xoá đã bị dọn) => reset=true, client xoá cache rồi nạp lại
+
+Watermark = (updated_at, id), quét theo index (updated_at, id). Trang cuối trả về
+"giờ DB - SYNC_OVERLAP_S" để không sót dòng của transaction commit muộn hơn lúc ghi updated_at;
+dòng trong khoảng chồng lấn có thể nhận lại lần nữa (client upsert theo id nên vô hại).
+"""
+from __future__ import annotations
+
+import base64
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, func, literal  # type: ignore
+from sqlalchemy.orm import Session, selectinload  # type: ignore
+
+from .. import models
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+ENTITY_REPORT = "report"
+ENTITY_CHECKIN = "checkin"
+
+# entity_type -> (model, cột chủ sở hữu, quan hệ cần nạp kèm)
+_ENTITIES = {
+    ENTITY_REPORT: (models.Report, "reporter_id", "reporter"),
+    ENTITY_CHECKIN: (models.CheckinRequest, "student_id", "student"),
+}
+
+PRUNE_EVERY_S = 3600
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+# --------- Watermark ----------
+def encode_since(ts: datetime, last_id: int) -> str:
+    """since = base64url("<updated_at ISO>|<id>")."""
+    raw = f"{ts.isoformat()}|{last_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_since(token: str) -> Tuple[datetime, int]:
+    """Raise ValueError nếu since hỏng."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        ts, last_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(last_id)
+    except Exception as e:
+        raise ValueError("since không hợp lệ") from e
+
+
+def _db_now(db: Session) -> datetime:
+    """Giờ theo DB (cùng nguồn với server_default/onupdate func.now() của updated_at)."""
+    return db.execute(select(func.now())).scalar_one()
+
+
+def bind_ts(db: Session, ts: datetime):
+    """
+    Tham số so sánh với cột DateTime server_default=now() (updated_at, deleted_at, created_at
+    của cursor trang report...). SQLite lưu CURRENT_TIMESTAMP dạng chuỗi
+    'YYYY-MM-DD HH:MM:SS' còn SQLAlchemy bind datetime thành '...SS.ffffff' => so sánh chuỗi
+    sai ở đúng mốc (dòng cùng giây với watermark bị bỏ sót) -> bind cùng định dạng.
+    """
+    if db.get_bind().dialect.name == "sqlite" and not ts.microsecond:
+        return literal(ts.strftime("%Y-%m-%d %H:%M:%S"))
+    return ts
+
+
+# --------- Tombstones ----------
+def record_tombstones(db: Session, entity_type: str, rows: Iterable[Tuple[int, Optional[int]]]) -> None:
+    """Ghi dấu xoá cho các (entity_id, owner_id) — gọi trong transaction xoá, caller tự commit."""
+    for entity_id, owner_id in rows:
+        db.add(models.Tombstone(entity_type=entity_type, entity_id=entity_id, owner_id=owner_id))
+
+
+def prune_tombstones(db: Session, force: bool = False) -> int:
+    """Xoá dấu xoá cũ hơn SYNC_TOMBSTONE_DAYS (tối đa 1 lần / giờ trừ khi force). Trả về số dòng đã xoá."""
+    global _last_prune
+    with _prune_lock:
+        if not force and time.monotonic() - _last_prune < PRUNE_EVERY_S:
+            return 0
+        _last_prune = time.monotonic()
+    cutoff = _db_now(db) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    n = (
+        db.query(models.Tombstone)
+        .filter(models.Tombstone.deleted_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    if n:
+        logger.info(f"[sync] đã dọn {n} tombstone cũ hơn {settings.SYNC_TOMBSTONE_DAYS} ngày")
+    return n
+
+
+# --------- Delta ----------
+def changes(
+    db: Session,
+    entity_type: str,
+    since: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    limit: int = 200,
+) -> Dict[str, object]:
+    """
+    Dòng tạo / sửa sau watermark (tăng dần theo (updated_at, id)) + id bị xoá từ cùng mốc.
+    owner_id: chỉ lấy bản ghi của 1 người (các endpoint /mine/changes).
+    Trả về {items, deleted, next_since, has_more, reset}. Raise ValueError nếu since hỏng.
+    """
+    model, owner_attr, rel = _ENTITIES[entity_type]
+    now = _db_now(db)
+
+    reset = since is None
+    since_ts, since_id = (datetime.min, 0) if reset else decode_since(since)
+    if not reset and since_ts < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        reset, since_ts, since_id = True, datetime.min, 0
+
+    q = db.query(model).options(selectinload(getattr(model, rel)))
+    if owner_id is not None:
+        q = q.filter(getattr(model, owner_attr) == owner_id)
+    if not reset:
+        ts = bind_ts(db, since_ts)
+        q = q.filter(or_(
+            model.updated_at > ts,
+            and_(model.updated_at == ts, model.id > since_id),
+        ))
+    rows = q.order_by(model.updated_at.asc(), model.id.asc()).limit(limit + 1).all()
+    items = rows[:limit]
+    has_more = len(rows) > limit
+
+    deleted: List[int] = []
+    if not reset:
+        T = models.Tombstone
+        tq = db.query(T.entity_id).filter(T.entity_type == entity_type, T.deleted_at >= bind_ts(db, since_ts))
+        if owner_id is not None:
+            tq = tq.filter(T.owner_id == owner_id)
+        if has_more:
+            # Trang giữa: chỉ lấy dấu xoá tới mốc của trang sau để không lặp / sót giữa các trang
+            tq = tq.filter(T.deleted_at < bind_ts(db, items[-1].updated_at))
+        alive = {r.id for r in items}
+        deleted = sorted({tid for (tid,) in tq.all() if tid not in alive})
+
+    if has_more:
+        next_since = encode_since(items[-1].updated_at, items[-1].id)
+    else:
+        next_since = encode_since(now - timedelta(seconds=settings.SYNC_OVERLAP_S), 0)
+    return {"items": items, "deleted": deleted, "next_since": next_since, "has_more": has_more, "reset": reset}
@@ -0,0 +1,193 @@
+# app/crud/uploads.py
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from .. import models
+from ..upload_utils import (
+    UPLOAD_DIR, VARIANT_EXTS, VARIANT_KINDS, blob_path, parse_blob_url, variant_path,
+)
+
+logger = logging.getLogger(__name__)
+
+OWNER_REPORT = "report"
+OWNER_CHECKIN = "checkin"
+
+
+# --------- Blob ----------
+def register_blob(db: Session, saved: Dict[str, object]) -> models.UploadBlob:
+    """
+    Ghi (hoặc lấy lại) dòng upload_blobs cho file vừa lưu bởi upload_utils.save_stream và commit.
+    Ảnh trùng cũng đặt lại last_uploaded_at: blob mồ côi cũ vừa được upload lại không bị
+    collect_orphans xoá trước khi report mới kịp gắn vào.
+    """
+    sha = str(saved["sha256"])
+    now = datetime.now()
+    blob = db.query(models.UploadBlob).filter(models.UploadBlob.sha256 == sha).first()
+    if blob:
+        blob.last_uploaded_at = now
+        db.commit()
+        return blob
+    blob = models.UploadBlob(
+        sha256=sha,
+        ext=str(saved["ext"]),
+        content_type=saved.get("content_type"),
+        size=int(saved["size"]),
+        ref_count=0,
+        last_uploaded_at=now,
+    )
+    db.add(blob)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 2 request upload cùng ảnh một lúc: bên kia đã insert trước
+        db.rollback()
+        blob = db.query(models.UploadBlob).filter(models.UploadBlob.sha256 == sha).one()
+        blob.last_uploaded_at = now
+        db.commit()
+    return blob
+
+
+def set_variants(db: Session, sha256: str, names: List[str], rewritten: bool = False) -> None:
+    """
+    Ghi danh sách bản thu nhỏ đã có trên đĩa ("thumb.webp", ...) để API dựng URL mà không stat file.
+    rewritten=True (vừa ghi file mới, kể cả --force) => tăng variants_rev: URL đổi ?v=, cache immutable cũ không dùng lại.
+    """
+    value = ",".join(names) or None
+    B = models.UploadBlob
+    q = db.query(B).filter(B.sha256 == sha256)
+    if rewritten:
+        q.update({B.variants: value, B.variants_rev: func.coalesce(B.variants_rev, 0) + 1}, synchronize_session=False)
+    else:
+        q.filter((B.variants.is_(None)) | (B.variants != value)).update({B.variants: value}, synchronize_session=False)
+    db.commit()
+
+
+def _blob_for_url(db: Session, url: Optional[str]) -> Optional[models.UploadBlob]:
+    key = parse_blob_url(url)
+    if not key:
+        return None  # URL ngoài kho (link ngoài, file cũ chưa migrate...)
+    return db.query(models.UploadBlob).filter(models.UploadBlob.sha256 == key[0]).first()
+
+
+# --------- Tham chiếu (caller tự commit) ----------
+def attach(db: Session, owner_type: str, owner_id: int, url: Optional[str]) -> Optional[models.UploadBlob]:
+    """Ghi nhận owner đang dùng ảnh ở url (+1 ref_count). Gọi lặp lại không đếm trùng."""
+    blob = _blob_for_url(db, url)
+    if blob is None:
+        return None
+    exists = (
+        db.query(models.UploadRef.id)
+        .filter_by(blob_id=blob.id, owner_type=owner_type, owner_id=owner_id)
+        .first()
+    )
+    if not exists:
+        db.add(models.UploadRef(blob_id=blob.id, owner_type=owner_type, owner_id=owner_id))
+        db.query(models.UploadBlob).filter(models.UploadBlob.id == blob.id).update(
+            {models.UploadBlob.ref_count: models.UploadBlob.ref_count + 1}, synchronize_session=False
+        )
+    return blob
+
+
+def detach_all(db: Session, owner_type: str, owner_id: int) -> List[int]:
+    """Bỏ mọi ảnh của owner (-1 ref_count mỗi blob). Trả về id các blob có thể đã về 0 để gc sau commit."""
+    refs = db.query(models.UploadRef).filter_by(owner_type=owner_type, owner_id=owner_id).all()
+    blob_ids = [r.blob_id for r in refs]
+    for r in refs:
+        db.delete(r)
+    if blob_ids:
+        db.query(models.UploadBlob).filter(models.UploadBlob.id.in_(blob_ids)).update(
+            {models.UploadBlob.ref_count: models.UploadBlob.ref_count - 1}, synchronize_session=False
+        )
+    return blob_ids
+
+
+def replace(db: Session, owner_type: str, owner_id: int, url: Optional[str]) -> List[int]:
+    """image_url của owner đổi: bỏ ref cũ, gắn ref mới. Trả về blob cần gc như detach_all."""
+    new_blob = _blob_for_url(db, url)
+    old = detach_all(db, owner_type, owner_id)
+    db.flush()
+    if new_blob is not None:
+        attach(db, owner_type, owner_id, url)
+    return [b for b in old if new_blob is None or b != new_blob.id]
+
+
+# --------- Dọn rác ----------
+def _delete_files(blob: models.UploadBlob) -> None:
+    path = blob_path(blob.sha256, blob.ext, UPLOAD_DIR)
+    variants = [variant_path(blob.sha256, k, v, UPLOAD_DIR) for k in VARIANT_KINDS for v in VARIANT_EXTS]
+    for p in [*variants, path]:
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[uploads] không xoá được {p}: {e}")
+            return
+    # bỏ thư mục shard ab/cd rỗng
+    for d in (path.parent, path.parent.parent):
+        try:
+            d.rmdir()
+        except OSError:
+            break
+
+
+def collect_garbage(db: Session, blob_ids: List[int]) -> int:
+    """Xoá blob (dòng + file) không còn ai tham chiếu. Gọi SAU khi đã commit detach. Trả về số blob đã xoá."""
+    if not blob_ids:
+        return 0
+    blobs = (
+        db.query(models.UploadBlob)
+        .filter(models.UploadBlob.id.in_(blob_ids), models.UploadBlob.ref_count <= 0)
+        .all()
+    )
+    for b in blobs:
+        db.delete(b)
+    db.commit()
+    for b in blobs:
+        _delete_files(b)
+    return len(blobs)
+
+
+def collect_orphans(db: Session, grace: timedelta = timedelta(hours=24)) -> int:
+    """
+    Blob upload lên nhưng không được gắn vào report/check-in nào (ref_count = 0)
+    quá thời gian grace kể từ lần upload gần nhất => xoá. Grace để FE kịp tạo report sau khi upload ảnh.
+    """
+    B = models.UploadBlob
+    cutoff = datetime.now() - grace
+    ids = [
+        bid for (bid,) in db.query(B.id)
+        .filter(B.ref_count <= 0, func.coalesce(B.last_uploaded_at, B.created_at) < cutoff)
+        .all()
+    ]
+    return collect_garbage(db, ids)
+
+
+def recount(db: Session) -> int:
+    """
+    Dựng lại ref_count từ upload_refs, bỏ ref trỏ tới report/check-in đã bị xoá
+    (vd report / check-in bị xoá thẳng trong DB, không qua crud). Trả về số ref mồ côi đã xoá.
+    """
+    owners = {OWNER_REPORT: models.Report, OWNER_CHECKIN: models.CheckinRequest}
+    removed = 0
+    for owner_type, model in owners.items():
+        alive = db.query(model.id)
+        removed += (
+            db.query(models.UploadRef)
+            .filter(models.UploadRef.owner_type == owner_type, ~models.UploadRef.owner_id.in_(alive))
+            .delete(synchronize_session=False)
+        )
+    counts = dict(
+        db.query(models.UploadRef.blob_id, func.count()).group_by(models.UploadRef.blob_id).all()
+    )
+    for blob in db.query(models.UploadBlob).all():
+        blob.ref_count = int(counts.get(blob.id, 0))
+    db.commit()
+    return removed
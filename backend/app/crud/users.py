@@ -1,16 +1,19 @@
 # app/crud/users.py
 from sqlalchemy.orm import Session  # type: ignore
-from sqlalchemy import select  # type: ignore
-from typing import Optional, List
+from sqlalchemy import func, or_, select  # type: ignore
+from typing import Optional, List, Tuple
 
-from ..models import User, StudentProfile
+from ..models import User, StudentProfile, Report, CheckinRequest
 from ..schemas import (
     AdminUserCreate,
     UserUpdateAdmin,
     ProfileUpdate,
     UserCreate,
 )
-from ..auth_utils import hash_password, verify_password
+from ..auth_utils import hash_password, verify_password, bump_token_version, invalidate_user
+from . import sync as crud_sync
+from . import uploads as crud_uploads
+from . import stats as crud_stats
 
 
 # =========================================================
@@ -30,52 +33,83 @@ def get_users(db: Session) -> List[User]:
     return db.query(User).all()
 
 
-# ===== NEW =====
-def get_users_admin_rows(db: Session) -> List[dict]:
+def _like_prefix(q: str) -> str:
+    """'abc' -> 'abc%' (escape % _ \\) để LIKE dùng được index."""
+    for ch in ("\\", "%", "_", "["):   # "[" cũng là ký tự đặc biệt của LIKE trên MSSQL
+        q = q.replace(ch, "\\" + ch)
+    return q + "%"
+
+
+def list_users_page(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[int] = None,
+    order: str = "asc",
+    q: Optional[str] = None,
+    faculty: Optional[str] = None,
+    room: Optional[str] = None,
+    building: Optional[str] = None,
+    role: Optional[str] = None,
+) -> Tuple[List[dict], Optional[int], Optional[int]]:
     """
-    Danh sách cho bảng Admin (JOIN users + student_profiles)
-    -> có đủ: faculty, room (từ users) + bed, address (từ student_profiles).
+    Bảng Admin phân trang keyset theo users.id (cursor = id cuối trang trước).
+    q: tiền tố username hoặc họ tên. faculty/room/role/building: so khớp chính xác
+    (ix_users_faculty_room, ix_users_role_id, ix_profiles_building_user).
+    Trả về (items, next_cursor, total) — total chỉ đếm ở trang đầu.
     """
+    conds = []
+    if q and q.strip():
+        pattern = _like_prefix(q.strip())
+        conds.append(or_(User.username.like(pattern, escape="\\"), User.full_name.like(pattern, escape="\\")))
+    if faculty:
+        conds.append(User.faculty == faculty)
+    if room:
+        conds.append(User.room == room)
+    if role:
+        conds.append(User.role == role)
+    if building:
+        conds.append(StudentProfile.building == building)
+
+    desc = order == "desc"
     stmt = (
         select(
-            User.id,
-            User.username,
-            User.full_name,
-            User.email,
-            User.role,
-            User.faculty,
-            User.room,
-            StudentProfile.bed,
-            StudentProfile.address,
+            User.id, User.username, User.full_name, User.email, User.phone, User.role,
+            User.faculty, User.room, StudentProfile.bed, StudentProfile.address, StudentProfile.building,
         )
         .select_from(User)
         .join(StudentProfile, StudentProfile.user_id == User.id, isouter=True)
-        .order_by(User.id.asc())
+        .where(*conds)
     )
+    if cursor is not None:
+        stmt = stmt.where(User.id < cursor if desc else User.id > cursor)
+    stmt = stmt.order_by(User.id.desc() if desc else User.id.asc()).limit(limit + 1)
     rows = db.execute(stmt).all()
-    return [
-        {
-            "id": r.id,
-            "username": r.username,
-            "full_name": r.full_name,
-            "email": r.email,
-            "role": r.role,
-            "faculty": r.faculty,
-            "room": r.room,
-            "bed": r.bed,
-            "address": r.address,
-        }
-        for r in rows
-    ]
+
+    items = [dict(r._mapping) for r in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+
+    total = None
+    if cursor is None:
+        # COUNT không cần JOIN profile trừ khi lọc theo building
+        count = select(func.count()).select_from(User)
+        if building:
+            count = count.join(StudentProfile, StudentProfile.user_id == User.id)
+        total = db.execute(count.where(*conds)).scalar_one()
+    return items, next_cursor, total
 
 
 # =========================================================
 # 🧩 Tạo tài khoản mới
 # =========================================================
-def create_user(db: Session, user_in: AdminUserCreate | UserCreate) -> User:
+def create_user(
+    db: Session,
+    user_in: AdminUserCreate | UserCreate,
+    hashed_password: Optional[str] = None,
+) -> User:
     """
     Admin hoặc hệ thống tạo tài khoản mới.
     - username chính là MÃ SINH VIÊN.
+    - hashed_password: router đã băm sẵn qua password_service (không truyền => băm tại chỗ).
     - Các cột email/phone/faculty/room lưu ở bảng users.
     - Các thông tin chi tiết khác (address, major, ...) ở student_profiles.
     """
@@ -86,7 +120,7 @@ def create_user(db: Session, user_in: AdminUserCreate | UserCreate) -> User:
     u = User(
         username=user_in.username,  # 👈 mã sinh viên
         full_name=getattr(user_in, "full_name", None),
-        hashed_password=hash_password(user_in.password),
+        hashed_password=hashed_password or hash_password(user_in.password),
         role=(user_in.role or "student"),
         # các cột thuộc users
         email=getattr(user_in, "email", None),
@@ -124,7 +158,12 @@ def create_user(db: Session, user_in: AdminUserCreate | UserCreate) -> User:
 # =========================================================
 # ✏️ Admin cập nhật tài khoản
 # =========================================================
-def update_user_admin(db: Session, user_id: int, data: UserUpdateAdmin) -> Optional[User]:
+def update_user_admin(
+    db: Session,
+    user_id: int,
+    data: UserUpdateAdmin,
+    hashed_password: Optional[str] = None,
+) -> Optional[User]:
     """
     Admin được sửa mọi thứ:
       - Bảng users: username (nếu không trùng), full_name, role, password,
@@ -141,16 +180,21 @@ def update_user_admin(db: Session, user_id: int, data: UserUpdateAdmin) -> Optio
         new_username = data.username.strip()
         if new_username != u.username and get_user_by_username(db, new_username):
             raise ValueError("Username already exists")
+        if new_username != u.username:
+            bump_token_version(u)
         u.username = new_username
 
     if getattr(data, "full_name", None):
         u.full_name = data.full_name
 
     if getattr(data, "role", None):
+        if data.role != u.role:
+            bump_token_version(u)
         u.role = data.role
 
     if getattr(data, "password", None):
-        u.hashed_password = hash_password(data.password)
+        u.hashed_password = hashed_password or hash_password(data.password)
+        bump_token_version(u)
 
     # Các cột thuộc bảng users
     for field in ["email", "phone", "faculty", "room"]:
@@ -179,6 +223,7 @@ def update_user_admin(db: Session, user_id: int, data: UserUpdateAdmin) -> Optio
                 setattr(p, field, val)
 
     db.commit()
+    invalidate_user(u.id)
     db.refresh(u)
     return u
 
@@ -190,15 +235,35 @@ def delete_user(db: Session, user_id: int) -> bool:
     u = get_user_by_id(db, user_id)
     if not u:
         return False
+    # Report / check-in của user bị xoá theo cascade => ghi dấu xoá cho các endpoint .../changes
+    report_ids = db.execute(select(Report.id).where(Report.reporter_id == user_id)).scalars().all()
+    checkin_ids = db.execute(select(CheckinRequest.id).where(CheckinRequest.student_id == user_id)).scalars().all()
+    crud_sync.record_tombstones(db, crud_sync.ENTITY_REPORT, [(i, user_id) for i in report_ids])
+    crud_sync.record_tombstones(db, crud_sync.ENTITY_CHECKIN, [(i, user_id) for i in checkin_ids])
+    # Cascade không qua crud => tự bỏ tham chiếu ảnh, không thì ref_count không bao giờ về 0
+    gc_blobs: List[int] = []
+    for i in report_ids:
+        gc_blobs += crud_uploads.detach_all(db, crud_uploads.OWNER_REPORT, i)
+    for i in checkin_ids:
+        gc_blobs += crud_uploads.detach_all(db, crud_uploads.OWNER_CHECKIN, i)
     db.delete(u)
     db.commit()
+    invalidate_user(user_id)
+    if report_ids or checkin_ids:
+        crud_stats.invalidate()
+    crud_uploads.collect_garbage(db, sorted(set(gc_blobs)))
     return True
 
 
 # =========================================================
 # 👤 Sinh viên tự cập nhật hồ sơ
 # =========================================================
-def update_profile_self(db: Session, user_id: int, data: ProfileUpdate) -> Optional[User]:
+def update_profile_self(
+    db: Session,
+    user_id: int,
+    data: ProfileUpdate,
+    hashed_password: Optional[str] = None,
+) -> Optional[User]:
     """
     Sinh viên chỉ được sửa: full_name, password (bảng users),
     email, phone (bảng users) và address (bảng student_profiles).
@@ -213,7 +278,8 @@ def update_profile_self(db: Session, user_id: int, data: ProfileUpdate) -> Optio
 
     # Cập nhật mật khẩu
     if getattr(data, "password", None):
-        u.hashed_password = hash_password(data.password)
+        u.hashed_password = hashed_password or hash_password(data.password)
+        bump_token_version(u)
 
     # email/phone là cột ở users
     for field in ["email", "phone"]:
@@ -235,6 +301,7 @@ def update_profile_self(db: Session, user_id: int, data: ProfileUpdate) -> Optio
         p.address = data.address
 
     db.commit()
+    invalidate_user(u.id)
     db.refresh(u)
     return u
 
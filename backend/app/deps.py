@@ -1,38 +1,15 @@
 # app/deps.py
 from fastapi import Depends, HTTPException, status  # type: ignore
-from sqlalchemy.orm import Session  # type: ignore
 
-from .database import get_db
-from .auth_utils import decode_token, oauth2_scheme  # ✅ dùng chung oauth2_scheme
-from .models import User
-from .crud.users import get_user_by_username
+from .auth_utils import CurrentUser, get_current_principal, get_current_user  # noqa: F401
 
 
 # =========================================================
 # 🔑 Lấy user từ JWT token
 # =========================================================
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    """Giải mã token, trả về User tương ứng."""
-    payload = decode_token(token)
-    if not payload or "sub" not in payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    username = payload["sub"]
-    user = get_user_by_username(db, username)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
+# get_current_user     : bản ghi User đầy đủ (1 SELECT) — dùng khi cần sửa user
+# get_current_principal: id / username / role từ claim đã ký + cache (AUTH_MODE=claims)
+# Cả hai nằm ở auth_utils.py, re-export ở đây cho router.
 
 
 # =========================================================
@@ -40,7 +17,7 @@ def get_current_user(
 # =========================================================
 def require_role(required: str):
     """Decorator tạo dependency giới hạn quyền (ví dụ: require_role('admin'))."""
-    def checker(user: User = Depends(get_current_user)) -> User:
+    def checker(user: CurrentUser = Depends(get_current_principal)) -> CurrentUser:
         if user.role != required:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -53,7 +30,7 @@ def require_role(required: str):
 # =========================================================
 # 🧠 Shortcut tiện dụng
 # =========================================================
-def get_current_admin(user: User = Depends(get_current_user)) -> User:
+def get_current_admin(user: CurrentUser = Depends(get_current_principal)) -> CurrentUser:
     """Chỉ cho phép admin truy cập."""
     if user.role != "admin":
         raise HTTPException(
@@ -63,7 +40,7 @@ def get_current_admin(user: User = Depends(get_current_user)) -> User:
     return user
 
 
-def get_current_student(user: User = Depends(get_current_user)) -> User:
+def get_current_student(user: CurrentUser = Depends(get_current_principal)) -> CurrentUser:
     """Chỉ cho phép sinh viên truy cập."""
     if user.role != "student":
         raise HTTPException(
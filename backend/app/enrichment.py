@@ -0,0 +1,256 @@
+# app/enrichment.py
+"""
+Làm giàu AI cho report chạy nền (PhoBERT + Gemini auto-reply).
+
+Luồng:
+  1) crud.reports.create_report commit report (ai_status="pending") + 1 dòng enrichment_jobs
+  2) router gọi enqueue(report_id) -> đẩy vào ThreadPoolExecutor trong tiến trình
+  3) worker "nhận" job bằng 1 câu UPDATE có điều kiện (chỉ 1 worker/tiến trình thắng),
+     chạy AI ngoài transaction, rồi ghi kết quả trong 1 session ngắn
+  4) lỗi -> lùi next_run_at theo backoff; thread quét định kỳ bảng enrichment_jobs
+     nhặt lại job đến hạn, job treo (processing quá ENRICH_LEASE_S) và job còn sót sau khi restart
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import and_, or_  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from . import models, events
+from .config import settings
+from .database import SessionLocal
+from .crud import reports as crud_reports
+from .crud import stats as crud_stats
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH = 100  # số job tối đa nhặt mỗi lần quét
+
+_executor: Optional[ThreadPoolExecutor] = None
+_sweeper: Optional[threading.Thread] = None
+_stop = threading.Event()
+_lock = threading.Lock()
+_inflight: Set[int] = set()          # report_id đang nằm trong executor của tiến trình này
+_counters: Dict[str, int] = {"done": 0, "retried": 0, "failed": 0, "skipped": 0}
+
+
+# ================== HÀNG ĐỢI ==================
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.ENRICH_WORKERS), thread_name_prefix="enrich"
+            )
+        return _executor
+
+def enqueue(report_id: int) -> None:
+    """
+    Đưa report vào hàng đợi làm giàu. Gọi lặp lại với cùng id là vô hại
+    (bỏ qua nếu đang chờ trong tiến trình này; job đã done thì worker không nhận).
+    ENRICH_ASYNC=0 => chạy luôn trong request (report vẫn đã được commit trước).
+    """
+    if not settings.ENRICH_ASYNC:
+        process_job(report_id)
+        return
+    with _lock:
+        if report_id in _inflight:
+            return
+        _inflight.add(report_id)
+    try:
+        _get_executor().submit(_run, report_id)
+    except RuntimeError:
+        # executor đã shutdown (app đang tắt) -> để lần khởi động sau quét lại
+        with _lock:
+            _inflight.discard(report_id)
+
+def _run(report_id: int) -> None:
+    try:
+        process_job(report_id)
+    except Exception:
+        logger.exception(f"[enrichment][report_id={report_id}] worker crashed")
+    finally:
+        with _lock:
+            _inflight.discard(report_id)
+
+
+# ================== XỬ LÝ 1 JOB ==================
+def _claim(db: Session, report_id: int) -> bool:
+    """Chuyển job sang processing nếu đến hạn (hoặc treo quá lease). True nếu nhận được."""
+    now = datetime.now()
+    Job = models.EnrichmentJob
+    n = (
+        db.query(Job)
+        .filter(
+            Job.report_id == report_id,
+            or_(
+                and_(Job.status == "pending", Job.next_run_at <= now),
+                and_(Job.status == "processing", Job.locked_at < now - timedelta(seconds=settings.ENRICH_LEASE_S)),
+            ),
+        )
+        .update(
+            {Job.status: "processing", Job.attempts: Job.attempts + 1, Job.locked_at: now},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return n == 1
+
+def _backoff_s(attempts: int) -> float:
+    return settings.ENRICH_RETRY_BASE_S * (2 ** max(0, attempts - 1))
+
+def process_job(report_id: int) -> bool:
+    """Chạy enrichment cho 1 report. True nếu đã ghi kết quả (done hoặc failed có fallback)."""
+    # 1) Nhận job + chụp dữ liệu cần cho AI, đóng session trước khi gọi model/Gemini
+    with SessionLocal() as db:
+        if not _claim(db, report_id):
+            _counters["skipped"] += 1
+            return False
+        job = db.query(models.EnrichmentJob).filter(models.EnrichmentJob.report_id == report_id).first()
+        rpt = db.get(models.Report, report_id)
+        if job is None:
+            return False
+        if rpt is None:
+            # report đã xoá nhưng job còn (DB không cascade): đóng job, không để treo ở processing
+            job.status, job.locked_at, job.last_error = "failed", None, "report không còn tồn tại"
+            db.commit()
+            _counters["skipped"] += 1
+            return False
+        rpt.ai_status = "processing"
+        db.commit()
+        title, description = rpt.title, rpt.description
+        client_priority, attempts = job.client_priority, job.attempts
+
+    last_try = attempts >= settings.ENRICH_MAX_ATTEMPTS
+
+    # 2) AI + Gemini (không giữ connection / transaction)
+    try:
+        fields = crud_reports.compute_enrichment(title, description, client_priority, strict=not last_try)
+    except Exception as e:
+        _on_error(report_id, attempts, e)
+        return False
+
+    # 3) Ghi kết quả trong session ngắn
+    errors: List[str] = fields.pop("errors", [])
+    with SessionLocal() as db:
+        rpt = db.get(models.Report, report_id)
+        job = db.query(models.EnrichmentJob).filter(models.EnrichmentJob.report_id == report_id).first()
+        if rpt is None or job is None:
+            return False  # report bị xoá trong lúc chạy
+        # đọc lại client_priority: admin có thể đã sửa priority trong lúc job chờ / chạy
+        crud_reports.apply_enrichment(rpt, fields, keep_priority=bool(job.client_priority))
+        rpt.ai_status = "failed" if errors else "done"
+        job.status = "failed" if errors else "done"
+        job.last_error = "; ".join(errors)[:2000] if errors else None
+        job.locked_at = None
+        db.commit()
+        payload, owner_id = events.report_payload(rpt), rpt.reporter_id
+    crud_stats.invalidate()  # priority / category có thể đã đổi
+    events.publish(events.REPORT_UPDATED, payload, owner_id)
+
+    _counters["failed" if errors else "done"] += 1
+    return True
+
+def _on_error(report_id: int, attempts: int, err: Exception) -> None:
+    logger.warning(f"[enrichment][report_id={report_id}] attempt {attempts} failed: {err}")
+    with SessionLocal() as db:
+        job = db.query(models.EnrichmentJob).filter(models.EnrichmentJob.report_id == report_id).first()
+        rpt = db.get(models.Report, report_id)
+        if job is None:
+            return
+        job.last_error = str(err)[:2000]
+        job.locked_at = None
+        if attempts < settings.ENRICH_MAX_ATTEMPTS:
+            job.status = "pending"
+            job.next_run_at = datetime.now() + timedelta(seconds=_backoff_s(attempts))
+            _counters["retried"] += 1
+        else:
+            job.status = "failed"
+            _counters["failed"] += 1
+        if rpt is not None:
+            rpt.ai_status = "pending" if job.status == "pending" else "failed"
+        db.commit()
+
+
+# ================== QUÉT BẢNG (retry + khôi phục sau restart) ==================
+def sweep_once() -> int:
+    """Đưa các job đến hạn / bị treo vào hàng đợi. Trả về số job đã enqueue."""
+    now = datetime.now()
+    Job = models.EnrichmentJob
+    with SessionLocal() as db:
+        ids = [
+            rid for (rid,) in db.query(Job.report_id)
+            .filter(
+                or_(
+                    and_(Job.status == "pending", Job.next_run_at <= now),
+                    and_(Job.status == "processing", Job.locked_at < now - timedelta(seconds=settings.ENRICH_LEASE_S)),
+                )
+            )
+            .order_by(Job.next_run_at)
+            .limit(SWEEP_BATCH)
+            .all()
+        ]
+    for rid in ids:
+        enqueue(rid)
+    return len(ids)
+
+def _sweep_loop() -> None:
+    while not _stop.is_set():
+        try:
+            sweep_once()
+        except Exception:
+            logger.exception("[enrichment] sweep failed")
+        _stop.wait(settings.ENRICH_POLL_S)
+
+def start() -> None:
+    """Gọi ở startup: bật thread quét (lần quét đầu nhặt luôn job còn sót từ lần chạy trước)."""
+    global _sweeper
+    if not settings.ENRICH_ASYNC:
+        return
+    with _lock:
+        if _sweeper is not None and _sweeper.is_alive():
+            return
+        _stop.clear()
+        _sweeper = threading.Thread(target=_sweep_loop, name="enrich-sweeper", daemon=True)
+        _sweeper.start()
+
+def stop(wait: bool = False) -> None:
+    global _executor, _sweeper
+    _stop.set()
+    with _lock:
+        ex, _executor = _executor, None
+        _sweeper = None
+    if ex is not None:
+        ex.shutdown(wait=wait, cancel_futures=True)
+
+
+# ================== TRẠNG THÁI ==================
+def job_status(db: Session, report_id: int) -> Optional[dict]:
+    rpt = db.get(models.Report, report_id)
+    if rpt is None:
+        return None
+    job = db.query(models.EnrichmentJob).filter(models.EnrichmentJob.report_id == report_id).first()
+    return {
+        "report_id": report_id,
+        "ai_status": rpt.ai_status or "done",
+        "attempts": job.attempts if job else 0,
+        "next_run_at": job.next_run_at if job and job.status == "pending" else None,
+        "last_error": job.last_error if job else None,
+        "updated_at": job.updated_at if job else rpt.updated_at,
+    }
+
+def stats() -> dict:
+    with _lock:
+        inflight = len(_inflight)
+    return {
+        "async": settings.ENRICH_ASYNC,
+        "workers": settings.ENRICH_WORKERS,
+        "inflight": inflight,
+        "sweeper_alive": bool(_sweeper and _sweeper.is_alive()),
+        **_counters,
+    }
@@ -0,0 +1,267 @@
+# app/events.py
+"""
+Kênh đẩy sự kiện (Server-Sent Events) thay cho việc FE poll lại danh sách.
+
+  - crud.reports / crud.checkins / enrichment gọi publish(...) SAU khi commit
+    (report.created | report.updated | report.deleted | checkin.created | checkin.updated)
+  - GET /events/stream (routers/events_router.py) giữ 1 kết nối text/event-stream / tab:
+      admin nhận mọi sự kiện, sinh viên chỉ nhận sự kiện của bản ghi của mình (owner_id)
+  - mỗi sự kiện có id "<boot>-<seq>" (boot = pid + uuid, sinh lười trong từng tiến trình, kể cả sau fork);
+    trình duyệt tự kết nối lại kèm Last-Event-ID -> phát lại từ ring buffer EVENTS_BUFFER_SIZE sự kiện
+    gần nhất; id quá cũ / của tiến trình hay lần chạy khác => gửi "resync" để FE tải lại dữ liệu
+    (rẻ nhờ GET .../changes)
+  - heartbeat ": ping" mỗi EVENTS_HEARTBEAT_S giây để proxy không cắt kết nối im lặng; cùng nhịp đó
+    kiểm tra lại quyền của người nghe (still_allowed) => bị hạ quyền / thu hồi token / hết hạn thì đóng
+  - tối đa EVENTS_MAX_CONNECTIONS kết nối (EVENTS_MAX_PER_USER / user); client đọc chậm làm đầy
+    hàng đợi => đóng kết nối, client nối lại và phát lại từ buffer
+
+Bus nằm trong tiến trình: chạy nhiều worker thì mỗi worker chỉ thấy sự kiện do chính nó phát
+=> available() = False và router từ chối mở stream (503), FE quay về tải lại định kỳ.
+Số worker: gunicorn.conf.py gọi configure(workers) sau fork; uvicorn --workers đọc WEB_CONCURRENCY.
+"""
+from __future__ import annotations
+
+import os
+import asyncio
+import json
+import threading
+import time
+from uuid import uuid4
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .config import settings
+
+REPORT_CREATED = "report.created"
+REPORT_UPDATED = "report.updated"
+REPORT_DELETED = "report.deleted"
+CHECKIN_CREATED = "checkin.created"
+CHECKIN_UPDATED = "checkin.updated"
+RESYNC = "resync"
+
+# Định danh tiến trình trong id sự kiện, sinh lười (publish / subscribe) => mỗi worker sau fork có
+# id riêng; Last-Event-ID của worker khác / lần chạy trước bị nhận ra và trả "resync"
+_BOOT: Optional[str] = None
+_workers: Optional[int] = None   # gunicorn: configure(); None => WEB_CONCURRENCY
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    type: str
+    data: dict
+    owner_id: Optional[int] = None    # None = chỉ admin thấy
+
+    @property
+    def id(self) -> str:
+        return f"{_BOOT}-{self.seq}"
+
+
+def _ensure_boot() -> str:
+    """Gọi khi đang giữ _lock."""
+    global _BOOT
+    if _BOOT is None:
+        _BOOT = f"{os.getpid():x}.{uuid4().hex[:12]}"
+    return _BOOT
+
+
+class TooManyConnections(Exception):
+    """Vượt EVENTS_MAX_CONNECTIONS / EVENTS_MAX_PER_USER."""
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    user_id: int
+    role: str
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Optional[Event]]" = field(default_factory=lambda: asyncio.Queue(settings.EVENTS_QUEUE_SIZE))
+    overflow: bool = False
+
+    def sees(self, ev: Event) -> bool:
+        return self.role == "admin" or (ev.owner_id is not None and ev.owner_id == self.user_id)
+
+    def offer(self, ev: Optional[Event]) -> None:
+        """Chạy trên event loop của kết nối (qua call_soon_threadsafe)."""
+        try:
+            self.queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            # bỏ phần còn tồn, đánh dấu để stream() đóng kết nối; client nối lại sẽ phát lại từ buffer
+            self.overflow = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+_lock = threading.Lock()
+_seq = 0
+_buffer: Deque[Event] = deque(maxlen=max(1, settings.EVENTS_BUFFER_SIZE))
+_subs: Set[_Subscriber] = set()
+_counters: Dict[str, int] = {"published": 0, "dropped_slow": 0, "rejected": 0, "revoked": 0}
+
+
+def _after_fork() -> None:
+    """Tiến trình con (worker gunicorn preload_app) không kế thừa boot / seq / buffer của master."""
+    global _lock, _seq, _BOOT
+    _lock = threading.Lock()
+    _seq, _BOOT = 0, None
+    _buffer.clear()
+    _subs.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def configure(workers: int) -> None:
+    """gunicorn.conf.py post_fork: số worker thật của server."""
+    global _workers
+    _workers = int(workers)
+
+
+def available() -> bool:
+    """Bus trong tiến trình chỉ đúng khi có 1 worker; nhiều worker => không mở stream."""
+    n = _workers if _workers is not None else int(os.getenv("WEB_CONCURRENCY", "1") or 1)
+    return n <= 1
+
+
+# ================== PHÁT ==================
+def publish(type_: str, data: dict, owner_id: Optional[int] = None) -> None:
+    """Gọi được từ thread bất kỳ (endpoint sync chạy trong threadpool, worker enrichment)."""
+    global _seq
+    with _lock:
+        _ensure_boot()
+        _seq += 1
+        ev = Event(_seq, type_, data, owner_id)
+        _buffer.append(ev)
+        targets = [s for s in _subs if s.sees(ev)]
+        _counters["published"] += 1
+    for s in targets:
+        try:
+            s.loop.call_soon_threadsafe(s.offer, ev)
+        except RuntimeError:
+            pass  # loop đã đóng (đang tắt server)
+
+
+def report_payload(rpt) -> dict:
+    return {
+        "id": rpt.id, "title": rpt.title, "status": rpt.status, "priority": rpt.priority,
+        "category": rpt.category, "ai_status": rpt.ai_status, "reporter_id": rpt.reporter_id,
+    }
+
+
+def checkin_payload(ck) -> dict:
+    return {
+        "id": ck.id, "type": ck.type, "date": ck.date, "status": ck.status,
+        "admin_reply": ck.admin_reply, "student_id": ck.student_id,
+    }
+
+
+# ================== NHẬN ==================
+def _parse_last_id(last_event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not last_event_id:
+        return None
+    boot, _, seq = last_event_id.strip().rpartition("-")
+    try:
+        return boot, int(seq)
+    except ValueError:
+        return ("", 0)
+
+
+def subscribe(user_id: int, role: str, last_event_id: Optional[str] = None) -> Tuple[_Subscriber, List[Event]]:
+    """
+    Đăng ký 1 kết nối (gọi trên event loop). Trả về (subscriber, sự kiện cần phát lại).
+    Raise TooManyConnections nếu vượt giới hạn.
+    """
+    sub = _Subscriber(user_id=user_id, role=role, loop=asyncio.get_running_loop())
+    last = _parse_last_id(last_event_id)
+    with _lock:
+        _ensure_boot()
+        mine = sum(1 for s in _subs if s.user_id == user_id)
+        if len(_subs) >= settings.EVENTS_MAX_CONNECTIONS or mine >= settings.EVENTS_MAX_PER_USER:
+            _counters["rejected"] += 1
+            raise TooManyConnections()
+        _subs.add(sub)
+
+        backlog: List[Event] = []
+        if last is not None:
+            boot, seq = last
+            oldest = _buffer[0].seq if _buffer else _seq + 1
+            if boot != _BOOT or seq > _seq or seq < oldest - 1:
+                # khác lần khởi động / đã trôi khỏi buffer => không phát lại được đầy đủ
+                backlog.append(Event(_seq, RESYNC, {}, user_id))
+            else:
+                backlog.extend(ev for ev in _buffer if ev.seq > seq and sub.sees(ev))
+    return sub, backlog
+
+
+def unsubscribe(sub: _Subscriber) -> None:
+    """Gọi nhiều lần không sao (finally của stream() + response của router)."""
+    with _lock:
+        _subs.discard(sub)
+
+
+def _format(ev: Event) -> str:
+    data = json.dumps(ev.data, ensure_ascii=False, default=str)
+    return f"id: {ev.id}\nevent: {ev.type}\ndata: {data}\n\n"
+
+
+async def stream(
+    sub: _Subscriber,
+    backlog: List[Event],
+    is_disconnected,
+    still_allowed: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Thân response text/event-stream; is_disconnected = request.is_disconnected.
+    still_allowed: gọi mỗi EVENTS_HEARTBEAT_S giây (kể cả khi sự kiện tới liên tục), False => đóng.
+    """
+    next_check = time.monotonic() + settings.EVENTS_HEARTBEAT_S
+    try:
+        yield f"retry: {int(settings.EVENTS_RETRY_MS)}\n\n"
+        for ev in backlog:
+            yield _format(ev)
+        while True:
+            try:
+                ev = await asyncio.wait_for(sub.queue.get(), timeout=settings.EVENTS_HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                ev = False
+            if still_allowed is not None and time.monotonic() >= next_check:
+                next_check = time.monotonic() + settings.EVENTS_HEARTBEAT_S
+                if not await still_allowed():
+                    _counters["revoked"] += 1
+                    return
+            if ev is False:
+                if await is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if ev is None:  # stop() hoặc client đọc quá chậm
+                if sub.overflow:
+                    _counters["dropped_slow"] += 1
+                return
+            yield _format(ev)
+    finally:
+        unsubscribe(sub)
+
+
+def stop() -> None:
+    """Đóng mọi kết nối đang mở (shutdown) để server không chờ stream vô hạn."""
+    with _lock:
+        subs = list(_subs)
+    for s in subs:
+        try:
+            s.loop.call_soon_threadsafe(s.offer, None)
+        except RuntimeError:
+            pass
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "connections": len(_subs),
+            "buffered": len(_buffer),
+            "last_id": f"{_BOOT}-{_seq}" if _BOOT else None,
+            "available": available(),
+            **_counters,
+        }
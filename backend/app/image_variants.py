@@ -0,0 +1,184 @@
+# app/image_variants.py
+"""
+Sinh ảnh thu nhỏ cho ảnh trong kho upload (cần Pillow, không có thì bỏ qua):
+  - thumb : cạnh dài tối đa 320px  -> ab/cd/<sha256>.thumb.webp   (danh sách admin)
+  - medium: cạnh dài tối đa 1280px -> ab/cd/<sha256>.medium.webp  (xem ảnh)
+WebP nếu Pillow hỗ trợ, không thì JPEG. Xoay theo EXIF Orientation rồi lưu KHÔNG kèm EXIF
+(ảnh gốc giữ nguyên vì tên file là hash nội dung). File đã có thì bỏ qua => chạy lại bao nhiêu lần cũng được.
+
+Sinh xong ghi upload_blobs.variants => API dựng image_thumb_url / image_medium_url từ DB, không stat file.
+Upload xong router gọi schedule() -> chạy trong thread pool riêng.
+Sinh bù cho ảnh cũ (chạy trong thư mục backend/):
+  python -m app.image_variants --backfill
+  python -m app.image_variants --backfill --force   # sinh lại tất cả
+(--backfill cũng ghi bù cột variants cho ảnh đã có bản thu nhỏ từ trước.)
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import logging
+import argparse
+import threading
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps, features  # type: ignore
+    HAS_PIL = True
+except ImportError:  # Pillow là tuỳ chọn
+    HAS_PIL = False
+
+from .config import settings
+from .database import SessionLocal
+from .crud import uploads as crud_uploads
+from .upload_utils import UPLOAD_DIR, blob_path, variant_path
+
+logger = logging.getLogger(__name__)
+
+# kind -> (cạnh dài tối đa, quality)
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (320, 70),
+    "medium": (1280, 80),
+}
+
+_BLOB_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,5})$")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def output_ext() -> str:
+    return ".webp" if HAS_PIL and features.check("webp") else ".jpg"
+
+
+def _save(img, path: Path, vext: str, quality: int) -> None:
+    tmp = path.with_name(f".{uuid4().hex}.part")
+    try:
+        if vext == ".webp":
+            img.save(tmp, format="WEBP", quality=quality, method=4)
+        else:
+            img.save(tmp, format="JPEG", quality=quality, optimize=True, progressive=True)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def generate(sha256: str, ext: str, force: bool = False) -> List[str]:
+    """Sinh các bản thu nhỏ còn thiếu của 1 blob. Trả về danh sách kind đã ghi."""
+    if not HAS_PIL:
+        return []
+    vext = output_ext()
+    todo = [k for k in VARIANTS if force or not variant_path(sha256, k, vext).exists()]
+    if not todo:
+        return []
+
+    with Image.open(blob_path(sha256, ext)) as src:
+        src.seek(0)  # GIF động: lấy khung đầu
+        img = ImageOps.exif_transpose(src)
+        if vext == ".jpg" and img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, mask=img.split()[-1])
+            img = bg
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+
+        for kind in todo:
+            max_side, quality = VARIANTS[kind]
+            out = img.copy()
+            out.thumbnail((max_side, max_side), Image.LANCZOS)  # không phóng to ảnh nhỏ
+            _save(out, variant_path(sha256, kind, vext), vext, quality)
+    return todo
+
+
+def _record(sha256: str, rewritten: bool) -> None:
+    """Sinh xong (đủ mọi kind) => ghi upload_blobs.variants (+ variants_rev nếu vừa ghi file) cho blob."""
+    vext = output_ext()
+    with SessionLocal() as db:
+        crud_uploads.set_variants(db, sha256, [f"{kind}{vext}" for kind in VARIANTS], rewritten)
+
+
+def _safe_generate(sha256: str, ext: str, force: bool = False) -> List[str]:
+    try:
+        written = generate(sha256, ext, force)
+        if HAS_PIL:
+            _record(sha256, bool(written))
+        return written
+    except Exception as e:
+        logger.warning(f"[image_variants] {sha256}{ext}: {e}")
+        return []
+
+
+# ================== THREAD POOL ==================
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.IMAGE_WORKERS), thread_name_prefix="imgvar"
+            )
+        return _executor
+
+def schedule(sha256: str, ext: str) -> None:
+    """Đưa 1 ảnh vừa upload vào hàng đợi sinh thumbnail (không chờ)."""
+    if not HAS_PIL:
+        return
+    try:
+        _get_executor().submit(_safe_generate, sha256, ext)
+    except RuntimeError:
+        pass  # app đang tắt -> để --backfill sinh bù
+
+def stop(wait: bool = False) -> None:
+    global _executor
+    with _lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=wait, cancel_futures=True)
+
+
+# ================== BACKFILL ==================
+def iter_blobs(base_dir: Path = UPLOAD_DIR) -> List[Tuple[str, str]]:
+    """(sha256, ext) của mọi ảnh gốc trong kho ab/cd/ (bỏ qua file thu nhỏ và file tạm)."""
+    out = []
+    for d1 in sorted(base_dir.glob("[0-9a-f][0-9a-f]")):
+        for d2 in sorted(d1.glob("[0-9a-f][0-9a-f]")):
+            for f in sorted(d2.iterdir()):
+                m = _BLOB_NAME_RE.match(f.name)
+                if m and f.is_file():
+                    out.append((m.group(1), m.group(2)))
+    return out
+
+def backfill(force: bool = False, workers: Optional[int] = None) -> Dict[str, int]:
+    blobs = iter_blobs()
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers or max(1, settings.IMAGE_WORKERS)) as ex:
+        for written in ex.map(lambda b: _safe_generate(b[0], b[1], force), blobs):
+            done += bool(written)
+    return {"blobs": len(blobs), "generated": done, "skipped": len(blobs) - done}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sinh ảnh thu nhỏ (thumb/medium) cho kho upload")
+    parser.add_argument("--backfill", action="store_true", help="Sinh cho mọi ảnh còn thiếu bản thu nhỏ")
+    parser.add_argument("--force", action="store_true", help="Sinh lại cả những bản đã có")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if not HAS_PIL:
+        print("❌ Cần Pillow: pip install Pillow")
+        return 1
+    if not args.backfill:
+        parser.print_help()
+        return 0
+    print(f"🔹 Kho upload: {UPLOAD_DIR} (định dạng {output_ext()})")
+    print(f"✅ {backfill(args.force, args.workers)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
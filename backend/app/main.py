@@ -2,14 +2,25 @@
 from __future__ import annotations
 
 import os
-from pathlib import Path
+import logging
 from fastapi import FastAPI  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
-from fastapi.staticfiles import StaticFiles  # type: ignore
+from fastapi.responses import JSONResponse  # type: ignore
+from sqlalchemy import inspect, text  # type: ignore
 
 from .config import settings
 from .database import Base, engine
 from . import models  # noqa: F401  # đảm bảo load models để tạo bảng
+from . import enrichment
+from . import image_variants
+from . import password_service
+from . import events
+from . import ai_warmup
+from . import upload_gc
+from .static_cache import CachedStaticFiles
+from .upload_utils import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
 
 # 1) Khởi tạo app
 app = FastAPI(
@@ -34,27 +45,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 3) Static uploads
-# Gốc lưu upload: app/uploads
-BASE_DIR = Path(__file__).resolve().parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-(UPLOAD_DIR / "reports").mkdir(parents=True, exist_ok=True)
-(UPLOAD_DIR / "checkins").mkdir(parents=True, exist_ok=True)
-
-# a) /uploads -> duyệt toàn bộ cây uploads (giữ lại cho tương thích)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
-
-# b) /static/reports và /static/checkins -> đường dẫn ngắn gọn cho FE
-app.mount(
-    "/static/reports",
-    StaticFiles(directory=str(UPLOAD_DIR / "reports")),
-    name="reports-static",
-)
-app.mount(
-    "/static/checkins",
-    StaticFiles(directory=str(UPLOAD_DIR / "checkins")),
-    name="checkins-static",
-)
+# 3) Static uploads (file không bao giờ bị ghi đè -> cache immutable + ETag, xem static_cache.py)
+# Gốc lưu upload: app/uploads (hoặc UPLOAD_DIR, xem upload_utils.py)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# a) /uploads -> kho ảnh theo nội dung uploads/ab/cd/<sha256><ext> (và ảnh cũ nằm thẳng trong uploads/)
+app.mount("/uploads", CachedStaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+
+# b) /static/reports, /static/checkins -> đường dẫn cũ, upload mới không ghi vào đây nữa;
+#    chỉ mount khi thư mục còn (dữ liệu trước khi chuyển sang kho theo nội dung)
+for _sub in ("reports", "checkins"):
+    if (UPLOAD_DIR / _sub).is_dir():
+        app.mount(
+            f"/static/{_sub}",
+            CachedStaticFiles(directory=str(UPLOAD_DIR / _sub)),
+            name=f"{_sub}-static",
+        )
 
 # 4) Import routers
 from .routers.auth_router import router as auth_router          # noqa: E402
@@ -64,6 +70,8 @@ from .routers.profile import router as profile_router           # noqa: E402
 from .routers.ai_router import router as ai_router              # noqa: E402
 from .routers.files_router import router as files_router        # noqa: E402
 from .routers.users_router import router as users_router        # noqa: E402
+from .routers.stats_router import router as stats_router        # noqa: E402
+from .routers.events_router import router as events_router      # noqa: E402
 
 # 5) Gắn routers
 app.include_router(auth_router,     prefix="/auth",     tags=["Auth"])
@@ -73,11 +81,47 @@ app.include_router(profile_router)  # file profile đã tự đặt prefix="/pro
 app.include_router(ai_router,       prefix="/ai",       tags=["AI"])
 app.include_router(files_router)    # -> /files/upload
 app.include_router(users_router)    # -> /users
+app.include_router(stats_router)    # -> /stats
+app.include_router(events_router)   # -> /events/stream (SSE)
 
 # 6) Tạo bảng khi khởi động
+def _add_missing_columns() -> None:
+    """create_all không ALTER bảng đã có -> thêm các cột mới (nullable hoặc có server_default)."""
+    insp = inspect(engine)
+    ddl = engine.dialect.ddl_compiler(engine.dialect, None)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing or (not col.nullable and col.server_default is None):
+                continue
+            sql = f"ALTER TABLE {ddl.preparer.format_table(table)} ADD {ddl.get_column_specification(col)}"
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(sql))
+            except Exception as e:  # vd SQLite không cho DEFAULT CURRENT_TIMESTAMP khi ALTER
+                logger.warning(f"[startup] không thêm được cột {table.name}.{col.name}: {e}")
+
 @app.on_event("startup")
 def on_startup() -> None:
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all không thêm index mới vào bảng đã có sẵn -> tạo bù các index còn thiếu
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=engine, checkfirst=True)
+    enrichment.start()  # worker AI nền + nhặt lại job còn dở từ lần chạy trước
+    ai_warmup.start()   # nạp + làm nóng model trong nền (AI_PRELOAD), /readyz báo khi xong
+    upload_gc.start()   # dọn định kỳ ảnh upload không gắn vào report / check-in nào
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    events.stop()
+    enrichment.stop()
+    image_variants.stop()
+    upload_gc.stop()
+    password_service.stop()
 
 # 7) Health & root
 @app.get("/")
@@ -87,3 +131,9 @@ def root():
 @app.get("/healthz", include_in_schema=False)
 def healthz():
     return {"ok": True}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    """503 tới khi model AI đã nạp + làm nóng xong (AI_PRELOAD=0 => luôn 200), kèm thời gian nạp."""
+    st = ai_warmup.status()
+    return JSONResponse(st, status_code=200 if st["ready"] else 503)
@@ -0,0 +1,160 @@
+# app/migrate_uploads.py
+"""
+Chuyển ảnh upload kiểu cũ (uploads/<uuid>.jpg, uploads/reports/..., uploads/checkins/...)
+sang kho theo nội dung uploads/ab/cd/<sha256><ext>, ghi upload_blobs / upload_refs,
+sửa image_url của reports & checkins trỏ sang URL mới, rồi đếm lại ref_count.
+
+Ví dụ (chạy trong thư mục backend/):
+  python -m app.migrate_uploads --dry-run
+  python -m app.migrate_uploads                 # di chuyển file (ảnh trùng chỉ giữ 1 bản)
+  python -m app.migrate_uploads --keep-originals # copy, giữ nguyên file cũ
+  python -m app.migrate_uploads --gc --grace-hours 24   # dọn blob không còn ai dùng
+"""
+from __future__ import annotations
+
+import re
+import sys
+import shutil
+import hashlib
+import argparse
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .database import Base, SessionLocal, engine
+from . import models
+from .crud import uploads as crud_uploads
+from .upload_utils import UPLOAD_DIR, blob_path, blob_url, parse_blob_url, sniff_image_type, SNIFF_BYTES
+
+LEGACY_SUBDIRS = ("", "reports", "checkins")
+
+# /uploads/<name>, /uploads/reports/<name>, /static/checkins/<name> ... (có thể kèm http://host)
+_LEGACY_URL_RE = re.compile(r"/(?:uploads|static)/(?:(reports|checkins)/)?([^/?#]+)(?:[?#].*)?$")
+
+
+def _hash_file(path: Path) -> Tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _legacy_files() -> List[Tuple[str, Path]]:
+    """(subdir, path) của các file phẳng kiểu cũ — bỏ qua thư mục shard 2 ký tự hex."""
+    out = []
+    for sub in LEGACY_SUBDIRS:
+        d = UPLOAD_DIR / sub if sub else UPLOAD_DIR
+        if not d.is_dir():
+            continue
+        for entry in sorted(d.iterdir()):
+            if entry.is_file() and not entry.name.startswith(".") and not entry.name.endswith(".part"):
+                out.append((sub, entry))
+    return out
+
+
+def migrate_files(keep_originals: bool, dry_run: bool) -> Dict[Tuple[str, str], str]:
+    """Đưa file vào kho. Trả về map (subdir, tên file cũ) -> URL mới."""
+    mapping: Dict[Tuple[str, str], str] = {}
+    saved = deduped = skipped = 0
+    with SessionLocal() as db:
+        for sub, path in _legacy_files():
+            with open(path, "rb") as f:
+                kind = sniff_image_type(f.read(SNIFF_BYTES))
+            if kind is None:
+                print(f"  ⚠️  bỏ qua (không phải ảnh hỗ trợ): {path}")
+                skipped += 1
+                continue
+            ext, ctype = kind
+            sha, size = _hash_file(path)
+            target = blob_path(sha, ext)
+            mapping[(sub, path.name)] = blob_url(sha, ext)
+            if dry_run:
+                print(f"  {path.relative_to(UPLOAD_DIR)} -> {target.relative_to(UPLOAD_DIR)}")
+                continue
+
+            if target.exists():
+                deduped += 1
+                if not keep_originals:
+                    path.unlink()
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                (shutil.copy2 if keep_originals else shutil.move)(str(path), str(target))
+                saved += 1
+            crud_uploads.register_blob(db, {"sha256": sha, "ext": ext, "content_type": ctype, "size": size})
+    print(f"✅ File: {saved} chuyển vào kho, {deduped} trùng nội dung, {skipped} bỏ qua")
+    return mapping
+
+
+def _new_url(old: Optional[str], mapping: Dict[Tuple[str, str], str]) -> Optional[str]:
+    if not old or parse_blob_url(old):
+        return None
+    m = _LEGACY_URL_RE.search(old.strip())
+    if not m:
+        return None
+    path = mapping.get((m.group(1) or "", m.group(2)))
+    if not path:
+        return None
+    # giữ nguyên phần host (FE lưu URL tuyệt đối http://host/uploads/...)
+    return old.strip()[: m.start()] + path
+
+
+def relink(mapping: Dict[Tuple[str, str], str], dry_run: bool) -> None:
+    """Sửa image_url sang URL mới và đảm bảo mỗi report/check-in có ref tới blob của mình."""
+    owners = (
+        (crud_uploads.OWNER_REPORT, models.Report),
+        (crud_uploads.OWNER_CHECKIN, models.CheckinRequest),
+    )
+    with SessionLocal() as db:
+        for owner_type, model in owners:
+            changed = linked = 0
+            rows = db.query(model.id, model.image_url).filter(model.image_url.isnot(None)).all()
+            for row_id, url in rows:
+                new = _new_url(url, mapping)
+                if new:
+                    if dry_run:
+                        print(f"  {owner_type}#{row_id}: {url} -> {new}")
+                    else:
+                        db.query(model).filter(model.id == row_id).update(
+                            {model.image_url: new}, synchronize_session=False
+                        )
+                    url = new
+                    changed += 1
+                if not dry_run and crud_uploads.attach(db, owner_type, row_id, url):
+                    linked += 1
+            if not dry_run:
+                db.commit()
+            print(f"✅ {owner_type}: {changed} image_url được sửa, {linked} có ảnh trong kho")
+        if not dry_run:
+            removed = crud_uploads.recount(db)
+            print(f"✅ Đếm lại ref_count (bỏ {removed} ref mồ côi)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chuyển uploads cũ sang kho theo SHA-256 + dọn rác")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ in kế hoạch, không đổi gì")
+    parser.add_argument("--keep-originals", action="store_true", help="Copy thay vì move file cũ")
+    parser.add_argument("--gc", action="store_true", help="Đếm lại ref + xoá blob không còn ai dùng")
+    parser.add_argument("--grace-hours", type=float, default=24.0,
+                        help="Blob chưa được gắn vào report/check-in quá số giờ này mới bị xoá (--gc)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)  # đảm bảo có upload_blobs / upload_refs
+
+    if args.gc:
+        with SessionLocal() as db:
+            removed = crud_uploads.recount(db)
+            n = crud_uploads.collect_orphans(db, timedelta(hours=args.grace_hours))
+        print(f"✅ GC: bỏ {removed} ref mồ côi, xoá {n} blob")
+        return 0
+
+    print(f"🔹 Kho upload: {UPLOAD_DIR}")
+    mapping = migrate_files(args.keep_originals, args.dry_run)
+    relink(mapping, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
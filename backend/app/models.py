@@ -8,6 +8,7 @@ from sqlalchemy.sql import func  # type: ignore
 from sqlalchemy.types import Unicode, UnicodeText  # type: ignore
 
 from .database import Base
+from .upload_utils import variant_url
 
 
 # ==============================
@@ -24,6 +25,8 @@ class User(Base):
     full_name = Column(Unicode(100), nullable=True)
     hashed_password = Column(Unicode(255), nullable=False)
     role = Column(Unicode(20), nullable=False, default="student")  # student | admin
+    # Tăng khi đổi role / mật khẩu => JWT cũ (claim "ver") hết hiệu lực
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Thông tin gốc nằm ở users
     email = Column(Unicode(100), nullable=True, index=True)
@@ -50,6 +53,9 @@ class User(Base):
 
     __table_args__ = (
         Index("ix_users_faculty_room", "faculty", "room"),
+        # GET /users: tìm theo tiền tố họ tên, lọc theo role (keyset theo id)
+        Index("ix_users_full_name", "full_name"),
+        Index("ix_users_role_id", "role", "id"),
     )
 
 
@@ -80,16 +86,117 @@ class Report(Base):
     ai_floor = Column(Integer, nullable=True)
     ai_time_text = Column(Unicode(64), nullable=True)
     ai_meta = Column(UnicodeText, nullable=True)
+    ai_status = Column(Unicode(20), nullable=True)  # pending | processing | done | failed (NULL: report cũ)
 
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
     reporter_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     reporter = relationship("User", back_populates="reports")
+    enrichment_job = relationship(
+        "EnrichmentJob", back_populates="report",
+        uselist=False, cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    # Blob của image_url (qua upload_refs), nạp theo lô cùng danh sách => không N+1
+    image_blob = relationship(
+        "UploadBlob", secondary="upload_refs", uselist=False, viewonly=True, lazy="selectin",
+        primaryjoin="and_(upload_refs.c.owner_type == 'report', foreign(upload_refs.c.owner_id) == Report.id)",
+        secondaryjoin="UploadBlob.id == foreign(upload_refs.c.blob_id)",
+    )
+
+    # URL ảnh thu nhỏ (None nếu chưa sinh) — ReportOut đọc qua from_attributes
+    @property
+    def image_thumb_url(self):
+        return variant_url(self.image_url, "thumb", self.image_blob)
+
+    @property
+    def image_medium_url(self):
+        return variant_url(self.image_url, "medium", self.image_blob)
 
     __table_args__ = (
         CheckConstraint("status in ('open','in_progress','resolved')", name="ck_reports_status"),
         CheckConstraint("priority in ('normal','high','urgent')", name="ck_reports_priority"),
+        # Keyset pagination (created_at DESC, id DESC) + các bộ lọc của GET /reports
+        Index("ix_reports_created_id", "created_at", "id"),
+        Index("ix_reports_status_created", "status", "created_at", "id"),
+        Index("ix_reports_priority_created", "priority", "created_at", "id"),
+        Index("ix_reports_category_created", "category", "created_at", "id"),
+        Index("ix_reports_ai_label_created", "ai_label", "created_at", "id"),
+        Index("ix_reports_building_room_created", "building", "room", "created_at", "id"),
+        # GET /reports/changes: quét theo (updated_at, id)
+        Index("ix_reports_updated_id", "updated_at", "id"),
+    )
+
+
+# ==============================
+# 🤖 ENRICHMENT JOBS (hàng đợi bền cho AI + Gemini chạy nền)
+# ==============================
+class EnrichmentJob(Base):
+    __tablename__ = "enrichment_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 1 job / report => idempotent theo report id
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, unique=True)
+
+    status = Column(Unicode(20), nullable=False, default="pending")  # pending | processing | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    client_priority = Column(Unicode(20), nullable=True)  # priority do client chọn / admin đã sửa (giữ nguyên khi có)
+    last_error = Column(UnicodeText, nullable=True)
+
+    next_run_at = Column(DateTime, nullable=False)        # thời điểm được chạy (lùi dần khi retry)
+    locked_at = Column(DateTime, nullable=True)           # lúc worker nhận job (job treo quá lâu sẽ được nhận lại)
+
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    report = relationship("Report", back_populates="enrichment_job")
+
+    __table_args__ = (
+        CheckConstraint("status in ('pending','processing','done','failed')", name="ck_enrichment_jobs_status"),
+        Index("ix_enrichment_jobs_status_next_run", "status", "next_run_at"),
+    )
+
+
+# ==============================
+# 🖼️ UPLOAD BLOBS (lưu theo SHA-256, dùng chung giữa các report / check-in)
+# ==============================
+class UploadBlob(Base):
+    __tablename__ = "upload_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(Unicode(64), nullable=False, unique=True)
+    ext = Column(Unicode(10), nullable=False)              # .jpg | .png | .webp | .gif
+    content_type = Column(Unicode(50), nullable=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # = số dòng upload_refs trỏ tới
+
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    last_uploaded_at = Column(DateTime, nullable=True)      # lần upload gần nhất (kể cả ảnh trùng): mốc grace dọn mồ côi
+    variants = Column(Unicode(40), nullable=True)           # bản thu nhỏ đã sinh: "thumb.webp,medium.webp" (image_variants ghi)
+    variants_rev = Column(Integer, nullable=True)           # tăng mỗi lần sinh lại => ?v= trong URL bản thu nhỏ
+
+    refs = relationship(
+        "UploadRef", back_populates="blob",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class UploadRef(Base):
+    __tablename__ = "upload_refs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    blob_id = Column(Integer, ForeignKey("upload_blobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    owner_type = Column(Unicode(20), nullable=False)  # report | checkin
+    owner_id = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    blob = relationship("UploadBlob", back_populates="refs")
+
+    __table_args__ = (
+        UniqueConstraint("owner_type", "owner_id", "blob_id", name="uq_upload_refs_owner_blob"),
+        Index("ix_upload_refs_owner", "owner_type", "owner_id"),
     )
 
 
@@ -116,9 +223,44 @@ class CheckinRequest(Base):
     student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     student = relationship("User", back_populates="checkins")
 
+    image_blob = relationship(
+        "UploadBlob", secondary="upload_refs", uselist=False, viewonly=True, lazy="selectin",
+        primaryjoin="and_(upload_refs.c.owner_type == 'checkin', foreign(upload_refs.c.owner_id) == CheckinRequest.id)",
+        secondaryjoin="UploadBlob.id == foreign(upload_refs.c.blob_id)",
+    )
+
+    @property
+    def image_thumb_url(self):
+        return variant_url(self.image_url, "thumb", self.image_blob)
+
+    @property
+    def image_medium_url(self):
+        return variant_url(self.image_url, "medium", self.image_blob)
+
     __table_args__ = (
         CheckConstraint("type in ('checkin','checkout')", name="ck_checkins_type"),
         CheckConstraint("status in ('pending','approved','rejected')", name="ck_checkins_status"),
+        # GET /checkins/changes: quét theo (updated_at, id)
+        Index("ix_checkins_updated_id", "updated_at", "id"),
+    )
+
+
+# ==============================
+# 🪦 TOMBSTONES (dấu vết bản ghi đã xoá, cho các endpoint .../changes)
+# ==============================
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(Unicode(20), nullable=False)  # report | checkin
+    entity_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=True)          # reporter_id / student_id (lọc cho /mine/changes)
+    deleted_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("entity_type in ('report','checkin')", name="ck_tombstones_entity_type"),
+        Index("ix_tombstones_type_deleted", "entity_type", "deleted_at"),
+        Index("ix_tombstones_type_owner_deleted", "entity_type", "owner_id", "deleted_at"),
     )
 
 
@@ -154,4 +296,5 @@ class StudentProfile(Base):
     __table_args__ = (
         UniqueConstraint("user_id", name="uq_student_profiles_user_id"),
         Index("ix_profiles_building_room_bed", "building", "bed"),
+        Index("ix_profiles_building_user", "building", "user_id"),
     )
@@ -0,0 +1,89 @@
+# app/password_service.py
+"""
+Băm / kiểm tra mật khẩu bcrypt cho các endpoint async (login, đăng ký, tạo user, đổi mật khẩu).
+
+bcrypt cố ý chậm (~0.2-0.3s/lần). Chạy thẳng trong threadpool chung của Starlette thì một đợt
+đăng nhập đầu kỳ chiếm hết thread, các API khác phải chờ. Ở đây bcrypt chạy trong pool riêng
+PASSWORD_WORKERS thread (bcrypt nhả GIL nên thread là đủ), số việc đang chạy + chờ
+tối đa PASSWORD_MAX_PENDING; vượt => 503 + Retry-After ngay, không xếp hàng vô hạn.
+
+CryptContext dùng chung nằm ở auth_utils.pwd_ctx (hash_password / verify_password bản đồng bộ
+vẫn dùng được cho script, CLI).
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from fastapi import HTTPException, status  # type: ignore
+
+from .config import settings
+from .auth_utils import hash_password, verify_password
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_pending = 0                      # việc đang chạy + đang chờ trong pool
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.PASSWORD_WORKERS), thread_name_prefix="bcrypt"
+            )
+        return _executor
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Hệ thống đang bận xử lý đăng nhập, vui lòng thử lại sau giây lát.",
+        headers={"Retry-After": str(settings.PASSWORD_RETRY_AFTER_S)},
+    )
+
+
+async def _submit(fn: Callable[..., T], *args) -> T:
+    global _pending
+    with _lock:
+        if _pending >= settings.PASSWORD_MAX_PENDING:
+            raise _busy()
+        _pending += 1
+    try:
+        return await asyncio.wrap_future(_get_executor().submit(fn, *args))
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await _submit(hash_password, plain_password)
+
+
+async def hash_many_async(passwords: List[str]) -> List[str]:
+    """
+    Băm nhiều mật khẩu (import tài khoản) qua cùng pool: mỗi lượt tối đa PASSWORD_WORKERS việc
+    nên đăng nhập xen vào được giữa các lượt; pool đầy => 503 như các endpoint khác.
+    """
+    step = max(1, settings.PASSWORD_WORKERS)
+    out: List[str] = []
+    for i in range(0, len(passwords), step):
+        out += await asyncio.gather(*(_submit(hash_password, p) for p in passwords[i:i + step]))
+    return out
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _submit(verify_password, plain_password, hashed_password)
+
+
+def stop(wait: bool = False) -> None:
+    global _executor
+    with _lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=wait, cancel_futures=True)
+
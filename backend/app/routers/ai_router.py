@@ -1,9 +1,11 @@
 # app/routers/ai_router.py
 from fastapi import APIRouter, HTTPException # type: ignore
 from pydantic import BaseModel, Field # type: ignore
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
-from ai.predictor import classify_one  # type: ignore
+from .. import ai_client
+from ..config import settings
+from ..enrichment import stats as enrichment_stats
 
 router = APIRouter()
 
@@ -15,6 +17,10 @@ class PredictOut(BaseModel):
     confidence: float
     meta: Dict[str, Any]
 
+class PredictBatchIn(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=512, description="Danh sách câu phản ánh")
+    batch_size: int = Field(16, ge=1, le=64, description="Số câu mỗi lô khi chạy model")
+
 def _normalize_result(res: Any) -> Tuple[str, float, Dict[str, Any]]:
     """Chấp nhận (label, prob, meta), (label, prob, meta, ...), hoặc dict."""
     if isinstance(res, dict):
@@ -33,15 +39,72 @@ def _normalize_result(res: Any) -> Tuple[str, float, Dict[str, Any]]:
         label, conf, meta, *_ = res
         return str(label), float(conf), dict(meta)
 
+def _ai_unavailable(e: ai_client.InferenceUnavailable) -> HTTPException:
+    """Inference server quá tải / không chạy => 503 + Retry-After (không trả nhãn giả)."""
+    busy = isinstance(e, ai_client.InferenceBusy)
+    retry_after = 1 if busy else max(1, int(round(settings.AI_SERVER_RETRY_S)))
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+
 @router.post("/predict", response_model=PredictOut, summary="Predict Endpoint")
 def predict(payload: PredictIn) -> PredictOut:
     try:
-        res = classify_one(payload.text)
-        label, prob, meta = _normalize_result(res)
+        r = ai_client.classify_one(payload.text)
+        label, prob, meta = _normalize_result(
+            (r.get("label"), float(r.get("label_confidence", 0.0)), dict(r.get("meta") or {}))
+        )
         return PredictOut(label=label, confidence=prob, meta=meta)
+    except ai_client.InferenceUnavailable as e:
+        raise _ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/predict/batch", response_model=List[PredictOut], summary="Predict Batch Endpoint")
+def predict_batch(payload: PredictBatchIn) -> List[PredictOut]:
+    try:
+        results = ai_client.classify_many(payload.texts, batch_size=payload.batch_size)
+        out: List[PredictOut] = []
+        for r in results:
+            # cùng dạng với classify_one: (label, label_confidence, meta)
+            label, prob, meta = _normalize_result(
+                (r.get("label"), float(r.get("label_confidence", 0.0)), dict(r.get("meta") or {}))
+            )
+            out.append(PredictOut(label=label, confidence=prob, meta=meta))
+        return out
+    except ai_client.InferenceUnavailable as e:
+        raise _ai_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/batcher/stats", summary="Micro-batcher Stats")
+def micro_batcher_stats() -> Dict[str, Any]:
+    """Độ sâu hàng đợi, histogram kích thước lô & thời gian chờ để tinh chỉnh AI_BATCH_*."""
+    return ai_client.stats("batcher")
+
+@router.get("/cache/stats", summary="Prediction Cache Stats")
+def prediction_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction của cache kết quả + fingerprint model hiện tại."""
+    return ai_client.stats("cache")
+
+@router.get("/infer/stats", summary="Torch Threads / Forward Gate Stats")
+def inference_gate_stats() -> Dict[str, Any]:
+    """Số luồng torch, số lượt forward đang chạy / chờ (AI_INFER_CONCURRENCY) để tinh chỉnh AI_TORCH_*."""
+    return ai_client.stats("infer")
+
+@router.get("/predlog/stats", summary="Prediction Log Writer Stats")
+def prediction_log_stats() -> Dict[str, Any]:
+    """Độ sâu hàng đợi log, số bản ghi đã ghi / bị bỏ (hàng đợi đầy) để tinh chỉnh PRED_LOG_*."""
+    return ai_client.stats("predlog")
+
+@router.get("/server/stats", summary="Inference Server Client Stats")
+def inference_client_stats() -> Dict[str, Any]:
+    """Chế độ chạy model (trong tiến trình / inference server) + đếm ok/busy/unavailable của client."""
+    return ai_client.stats("client")
+
+@router.get("/enrichment/stats", summary="Report Enrichment Worker Stats")
+def report_enrichment_stats() -> Dict[str, Any]:
+    """Số job đang chạy trong tiến trình + đếm done/retried/failed của worker làm giàu report."""
+    return enrichment_stats()
+
 @router.post("/classify", response_model=PredictOut, summary="Classify (alias of /predict)")
 def classify(payload: PredictIn) -> PredictOut:
     return predict(payload)
@@ -2,30 +2,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status  # type: ignore
 from fastapi.security import OAuth2PasswordRequestForm  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
 
 from ..database import get_db
 from ..schemas import UserCreate, UserOut, Token
-from ..crud.users import create_user, authenticate
+from ..crud.users import create_user, get_user_by_username
 from ..auth_utils import create_access_token
 from ..deps import get_current_user
+from .. import password_service
 
 router = APIRouter(tags=["auth"])
 
 @router.post("/register", response_model=UserOut)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(get_user_by_username, db, user_in.username):
+        raise HTTPException(status_code=400, detail="Username already exists")
+    hashed = await password_service.hash_password_async(user_in.password)  # bcrypt ở pool riêng
     try:
-        return create_user(db, user_in)
+        return await run_in_threadpool(create_user, db, user_in, hashed)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate(db, form_data.username, form_data.password)
-    if not user:
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(get_user_by_username, db, form_data.username)
+    # bcrypt ở pool riêng, quá tải => 503 + Retry-After (password_service)
+    if not user or not await password_service.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
 
     # ✅ tạo payload rồi sinh token
-    payload = {"sub": user.username, "user_id": user.id, "role": user.role}
+    # "ver": đổi role / mật khẩu => token_version tăng => token này hết hiệu lực
+    payload = {"sub": user.username, "user_id": user.id, "role": user.role, "ver": user.token_version or 0}
     token = create_access_token(payload)
     return {"access_token": token, "token_type": "bearer"}
 
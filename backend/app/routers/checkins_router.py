@@ -1,22 +1,38 @@
 # app/routers/checkins_router.py
-from fastapi import APIRouter, Depends, HTTPException  # type: ignore
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
-from typing import List
+from starlette.concurrency import run_in_threadpool  # type: ignore
+from typing import List, Optional
 
 from ..database import get_db
-from ..schemas import CheckinCreate, CheckinOut, CheckinUpdate
-from ..models import User
-from ..deps import get_current_user, require_role
+from ..schemas import CheckinCreate, CheckinOut, CheckinUpdate, CheckinChanges
+from ..deps import CurrentUser, get_current_principal, require_role
 from ..crud import checkins as crud_ck
+from ..crud import sync as crud_sync
+from ..upload_utils import save_upload
+from ..crud import uploads as crud_uploads
+from .. import image_variants
 
 router = APIRouter(tags=["Checkins"])  # ❌ bỏ prefix ở đây
 
+# Student + Admin: upload ảnh kèm yêu cầu (FE gọi /checkins/upload)
+@router.post("/upload")
+async def upload_image(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),
+):
+    saved = await save_upload(file)
+    await run_in_threadpool(crud_uploads.register_blob, db, saved)
+    image_variants.schedule(saved["sha256"], saved["ext"])  # thumb/medium sinh nền
+    return {"url": saved["url"], "sha256": saved["sha256"], "size": saved["size"], "deduped": saved["deduped"]}
+
 # Student: create
 @router.post("", response_model=CheckinOut, status_code=201)
 def create_checkin(
     data: CheckinCreate,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_principal),
 ):
     if data.type not in ("checkin", "checkout"):
         raise HTTPException(400, "type must be 'checkin' or 'checkout'")
@@ -26,15 +42,41 @@ def create_checkin(
 @router.get("/mine", response_model=List[CheckinOut])
 def my_checkins(
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_principal),
 ):
     return crud_ck.list_checkins_by_user(db, user.id)
 
+# Student: delta của mình (xem app/crud/sync.py)
+@router.get("/mine/changes", response_model=CheckinChanges)
+def my_checkin_changes(
+    since: Optional[str] = Query(None, description="next_since của lần gọi trước (bỏ trống = tải toàn bộ)"),
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),
+):
+    try:
+        return crud_sync.changes(db, crud_sync.ENTITY_CHECKIN, since=since, owner_id=user.id, limit=limit)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# Admin: delta toàn bộ
+@router.get("/changes", response_model=CheckinChanges)
+def checkin_changes(
+    since: Optional[str] = Query(None, description="next_since của lần gọi trước (bỏ trống = tải toàn bộ)"),
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    admin: CurrentUser = Depends(require_role("admin")),
+):
+    try:
+        return crud_sync.changes(db, crud_sync.ENTITY_CHECKIN, since=since, limit=limit)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 # Admin: list all
 @router.get("", response_model=List[CheckinOut])
 def list_checkins(
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
     return crud_ck.list_checkins(db)
 
@@ -44,7 +86,7 @@ def update_checkin(
     ck_id: int,
     data: CheckinUpdate,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
     ck = crud_ck.update_checkin(db, ck_id, data)
     if not ck:
@@ -0,0 +1,139 @@
+# app/routers/events_router.py
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status  # type: ignore
+from fastapi.responses import StreamingResponse  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..auth_utils import create_access_token, decode_token, oauth2_scheme, principal_from_claims
+from ..config import settings
+from ..database import SessionLocal, get_db
+from ..deps import CurrentUser, get_current_principal, require_role
+from .. import events
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+TICKET_SCOPE = "events"
+
+
+class _EventStreamResponse(StreamingResponse):
+    """
+    Bỏ đăng ký subscriber khi response kết thúc theo MỌI đường: finally của events.stream()
+    không chạy nếu thân response chưa từng được lặp (client ngắt trước khi nhận header,
+    gửi http.response.start lỗi) => subscriber kẹt trong _subs, chiếm chỗ EVENTS_MAX_*.
+    """
+
+    def __init__(self, sub: events._Subscriber, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.sub = sub
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            events.unsubscribe(self.sub)   # idempotent
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Sự kiện đẩy chỉ chạy khi server có 1 worker (WEB_CONCURRENCY=1).",
+    )
+
+
+def _principal(claims: dict) -> Optional[CurrentUser]:
+    """User nếu access token gốc chưa hết hạn và user / role / token_version chưa đổi, ngược lại None."""
+    until = claims.get("until") or claims.get("exp")
+    if until and time.time() >= float(until):
+        return None
+    # Session ngắn (chỉ mở connection khi cache user hết TTL) — không giữ DB suốt thời gian stream mở
+    with SessionLocal() as db:
+        return principal_from_claims(db, claims)
+
+
+# ==========================
+# 🟢 Student + Admin: vé mở luồng sự kiện
+# ==========================
+@router.post("/ticket")
+def event_ticket(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),
+) -> Dict[str, Any]:
+    """
+    EventSource không gửi được header Authorization => FE xin 1 vé ngắn hạn (EVENTS_TICKET_TTL_S)
+    chỉ dùng được cho /events/stream, thay vì để JWT đăng nhập nằm trong URL / log proxy.
+    """
+    if not events.available():
+        raise _unavailable()
+    payload = decode_token(token) or {}
+    until = payload.get("exp")
+    ttl = settings.EVENTS_TICKET_TTL_S
+    if until:
+        ttl = max(1, min(ttl, int(until - time.time())))
+    ticket = create_access_token({
+        "sub": user.username, "user_id": user.id, "role": user.role,
+        "ver": user.token_version or 0, "scope": TICKET_SCOPE, "until": until,
+    }, expires_minutes=ttl / 60)
+    return {"ticket": ticket, "expires_in": ttl}
+
+
+# ==========================
+# 🟢 Student + Admin: luồng sự kiện (text/event-stream)
+# ==========================
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    ticket: Optional[str] = Query(None, description="Vé từ POST /events/ticket (EventSource không gửi được header)"),
+    last_event_id: Optional[str] = Query(None, description="Thay cho header Last-Event-ID khi tự kết nối lại"),
+):
+    """
+    Admin nhận report.* / checkin.* của mọi người, sinh viên chỉ nhận của mình.
+    Kết nối lại kèm Last-Event-ID => phát lại sự kiện bị lỡ (hoặc 1 sự kiện "resync").
+    Quyền được kiểm tra lại mỗi EVENTS_HEARTBEAT_S giây; bị hạ quyền / thu hồi token / token hết hạn => đóng.
+    """
+    if not events.available():
+        raise _unavailable()
+    auth = request.headers.get("authorization", "")
+    if ticket:
+        claims = decode_token(ticket, scope=TICKET_SCOPE)
+    elif auth.lower().startswith("bearer "):
+        claims = decode_token(auth[7:].strip())
+    else:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Thiếu vé")
+    user = await run_in_threadpool(_principal, claims) if claims and claims.get("user_id") else None
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Vé không hợp lệ hoặc đã hết hạn")
+
+    async def still_allowed() -> bool:
+        now = await run_in_threadpool(_principal, claims)
+        return now is not None and now.role == user.role
+
+    try:
+        sub, backlog = events.subscribe(
+            user.id, user.role, request.headers.get("last-event-id") or last_event_id
+        )
+    except events.TooManyConnections:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Quá nhiều kết nối sự kiện, vui lòng thử lại sau.",
+            headers={"Retry-After": str(max(1, settings.EVENTS_RETRY_MS // 1000))},
+        )
+    return _EventStreamResponse(
+        sub,
+        events.stream(sub, backlog, request.is_disconnected, still_allowed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # tắt buffer của nginx
+    )
+
+
+# ==========================
+# 🔵 Admin: số kết nối / sự kiện (theo dõi)
+# ==========================
+@router.get("/stats")
+def event_stats(admin: CurrentUser = Depends(require_role("admin"))) -> Dict[str, Any]:
+    return events.stats()
@@ -3,23 +3,14 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
-from passlib.context import CryptContext  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
 
 from ..database import get_db
-from .. import models, schemas
-from ..auth_utils import get_current_user  # middleware xác thực JWT
+from .. import models, schemas, password_service
+from ..auth_utils import get_current_user, bump_token_version, invalidate_user  # middleware xác thực JWT
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
-# ===== Password helpers =====
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
 # ===== Helper: build output dict phù hợp StudentProfileOut =====
 def _profile_out(
     profile: models.StudentProfile,
@@ -165,15 +156,18 @@ def get_profile_by_user_id(
 
 # ===== Me: Change password =====
 @router.post("/change-password", response_model=schemas.ChangePasswordOut)
-def change_password(
+async def change_password(
     payload: schemas.ChangePasswordIn,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    if not verify_password(payload.old_password, current_user.hashed_password):
+    # bcrypt (CryptContext chung ở auth_utils) chạy trong pool riêng của password_service
+    if not await password_service.verify_password_async(payload.old_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Mật khẩu hiện tại không đúng")
 
-    current_user.hashed_password = get_password_hash(payload.new_password)
+    current_user.hashed_password = await password_service.hash_password_async(payload.new_password)
+    bump_token_version(current_user)  # token cũ (kể cả token đang dùng) hết hiệu lực
     db.add(current_user)
-    db.commit()
+    await run_in_threadpool(db.commit)
+    invalidate_user(current_user.id)
     return schemas.ChangePasswordOut(message="Đổi mật khẩu thành công")
@@ -1,18 +1,23 @@
 # app/routers/reports_router.py
 from __future__ import annotations
 
-import os
-from uuid import uuid4
-from typing import List
+from datetime import date
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File  # type: ignore
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
 
 from ..database import get_db
-from ..schemas import ReportCreate, ReportOut, ReportUpdate
-from ..models import User
-from ..deps import get_current_user, require_role
+from ..schemas import ReportCreate, ReportOut, ReportUpdate, ReportEnrichmentOut, ReportPage, ReportChanges
+from ..deps import CurrentUser, get_current_principal, require_role
 from ..crud import reports as crud_reports
+from ..crud import sync as crud_sync
+from ..config import settings
+from .. import enrichment
+from ..upload_utils import save_upload
+from ..crud import uploads as crud_uploads
+from .. import image_variants
 
 # Router chính cho Reports
 router = APIRouter(tags=["Reports"])
@@ -20,32 +25,20 @@ router = APIRouter(tags=["Reports"])
 # --------------------------
 # 📁 Upload ảnh minh hoạ
 # --------------------------
-# Thư mục lưu ảnh: <app>/uploads  (được serve tĩnh qua /uploads trong main.py)
-UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @router.post("/upload")
 async def upload_image(
     file: UploadFile = File(...),
-    user: User = Depends(get_current_user),   # yêu cầu đăng nhập khi upload
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),   # yêu cầu đăng nhập khi upload
 ):
     """
-    Upload ảnh minh hoạ cho báo cáo.
+    Upload ảnh minh hoạ cho báo cáo (lưu theo khối, giới hạn UPLOAD_MAX_BYTES, nhận dạng bằng magic bytes).
     Trả về JSON: {"url": "/uploads/<filename>"} để front-end gắn vào `image_url`.
     """
-    ext = os.path.splitext(file.filename or "")[1].lower()
-    if ext not in {".jpg", ".jpeg", ".png", ".webp", ".gif"}:
-        raise HTTPException(status_code=400, detail="Chỉ hỗ trợ JPG/PNG/WebP/GIF")
-
-    fname = f"{uuid4().hex}{ext}"
-    fpath = os.path.join(UPLOAD_DIR, fname)
-
-    # Ghi file
-    content = await file.read()
-    with open(fpath, "wb") as f:
-        f.write(content)
-
-    return {"url": f"/uploads/{fname}"}
+    saved = await save_upload(file)
+    await run_in_threadpool(crud_uploads.register_blob, db, saved)
+    image_variants.schedule(saved["sha256"], saved["ext"])  # thumb/medium sinh nền
+    return {"url": saved["url"], "sha256": saved["sha256"], "size": saved["size"], "deduped": saved["deduped"]}
 
 # ==========================
 # 🟢 Student + Admin: Tạo phản ánh
@@ -54,12 +47,18 @@ async def upload_image(
 def create_report(
     data: ReportCreate,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_principal),
 ):
     """
-    Tạo phản ánh mới. AI/priority/image_url đã được xử lý ở CRUD hoặc từ client.
+    Tạo phản ánh mới và trả về ngay (ai_status="pending").
+    Nhãn AI / priority / phản hồi tự động được worker nền điền sau,
+    client poll GET /reports/{id}/enrichment để biết khi nào xong.
     """
-    return crud_reports.create_report(db, reporter_id=user.id, data=data)
+    rpt = crud_reports.create_report(db, reporter_id=user.id, data=data)
+    enrichment.enqueue(rpt.id)
+    if not settings.ENRICH_ASYNC:
+        db.refresh(rpt)  # chế độ đồng bộ: trả về luôn kết quả AI
+    return rpt
 
 # ==========================
 # 🟢 Student: Xem phản ánh của mình
@@ -67,19 +66,64 @@ def create_report(
 @router.get("/mine", response_model=List[ReportOut])
 def my_reports(
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_principal),
 ):
     return crud_reports.list_reports_by_user(db, user.id)
 
 # ==========================
-# 🔵 Admin: Xem tất cả phản ánh
+# 🔄 Đồng bộ delta (FE giữ cache, chỉ poll phần thay đổi) — khai báo trước /{report_id}
+# ==========================
+@router.get("/mine/changes", response_model=ReportChanges)
+def my_report_changes(
+    since: Optional[str] = Query(None, description="next_since của lần gọi trước (bỏ trống = tải toàn bộ)"),
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),
+):
+    try:
+        return crud_sync.changes(db, crud_sync.ENTITY_REPORT, since=since, owner_id=user.id, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/changes", response_model=ReportChanges)
+def report_changes(
+    since: Optional[str] = Query(None, description="next_since của lần gọi trước (bỏ trống = tải toàn bộ)"),
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    admin: CurrentUser = Depends(require_role("admin")),
+):
+    try:
+        return crud_sync.changes(db, crud_sync.ENTITY_REPORT, since=since, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==========================
+# 🔵 Admin: Xem tất cả phản ánh (phân trang cursor + lọc phía server)
 # ==========================
-@router.get("", response_model=List[ReportOut])
+@router.get("", response_model=ReportPage)
 def list_reports(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    status: Optional[str] = Query(None, description="open | in_progress | resolved"),
+    priority: Optional[str] = Query(None, description="normal | high | urgent"),
+    category: Optional[str] = None,
+    ai_label: Optional[str] = None,
+    building: Optional[str] = None,
+    room: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Đến hết ngày (YYYY-MM-DD)"),
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
-    return crud_reports.list_reports(db)
+    try:
+        items, next_cursor = crud_reports.list_reports_page(
+            db, limit=limit, cursor=cursor, status=status, priority=priority,
+            category=category, ai_label=ai_label, building=building, room=room,
+            date_from=date_from, date_to=date_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
 
 # ==========================
 # 🔵 Admin: Xem chi tiết phản ánh
@@ -88,13 +132,27 @@ def list_reports(
 def get_report(
     report_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
     rpt = crud_reports.get_report(db, report_id)
     if not rpt:
         raise HTTPException(status_code=404, detail="Report not found")
     return rpt
 
+# ==========================
+# 🟢 Student (chủ report) + Admin: Trạng thái làm giàu AI
+# ==========================
+@router.get("/{report_id}/enrichment", response_model=ReportEnrichmentOut)
+def get_report_enrichment(
+    report_id: int,
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_principal),
+):
+    rpt = crud_reports.get_report(db, report_id)
+    if not rpt or (user.role != "admin" and rpt.reporter_id != user.id):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return enrichment.job_status(db, report_id)
+
 # ==========================
 # 🔵 Admin: Cập nhật trạng thái / phản hồi
 # ==========================
@@ -103,7 +161,7 @@ def update_report(
     report_id: int,
     data: ReportUpdate,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
     rpt = crud_reports.update_report(db, report_id, data)
     if not rpt:
@@ -117,7 +175,7 @@ def update_report(
 def delete_report(
     report_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_role("admin")),
+    admin: CurrentUser = Depends(require_role("admin")),
 ):
     ok = crud_reports.delete_report(db, report_id)
     if not ok:
@@ -0,0 +1,36 @@
+# app/routers/stats_router.py
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..database import get_db
+from ..deps import CurrentUser, require_role
+from ..crud import stats as crud_stats
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+# ==========================
+# 🔵 Admin: Thống kê cho dashboard (GROUP BY phía DB, 1 request)
+# ==========================
+@router.get("")
+def get_stats(
+    date_from: Optional[date] = Query(None, description="Từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Đến hết ngày (YYYY-MM-DD)"),
+    days: Optional[int] = Query(None, ge=1, le=3660, description="N ngày gần nhất (bỏ qua nếu có date_from)"),
+    db: Session = Depends(get_db),
+    admin: CurrentUser = Depends(require_role("admin")),
+) -> Dict[str, Any]:
+    """
+    Đếm report theo category / status / priority / building / ngày / tuần
+    và check-in theo type / status / ngày / tuần, trong khoảng thời gian tuỳ chọn.
+    """
+    if days and not date_from:
+        date_from = (date_to or date.today()) - timedelta(days=days - 1)
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from phải <= date_to")
+    return crud_stats.get_stats(db, date_from, date_to)
@@ -1,11 +1,13 @@
 # app/routers/users_router.py
-from fastapi import APIRouter, Depends, HTTPException, status  # type: ignore
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
-from typing import List
+from starlette.concurrency import run_in_threadpool  # type: ignore
+from typing import List, Optional
 
-from .. import crud, schemas
+from .. import crud, schemas, password_service, user_import
+from ..config import settings
 from ..database import get_db
-from ..auth_utils import get_current_user
+from ..deps import CurrentUser, get_current_principal
 
 
 router = APIRouter(
@@ -16,25 +18,38 @@ router = APIRouter(
 # =========================================================
 # 🧩 ADMIN - Quản lý tài khoản
 # =========================================================
-@router.get("/", response_model=List[schemas.AdminUserRow])
+@router.get("/", response_model=schemas.UserPage)
 def list_users_admin_rows(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="next_cursor của trang trước"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sắp theo id"),
+    q: Optional[str] = Query(None, max_length=100, description="Tiền tố username / họ tên"),
+    faculty: Optional[str] = None,
+    room: Optional[str] = None,
+    building: Optional[str] = None,
+    role: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     """
-    Danh sách cho bảng Admin (JOIN users + student_profiles)
-    -> có đủ faculty, room (users) + bed, address (student_profiles).
+    Danh sách cho bảng Admin (JOIN users + student_profiles), phân trang keyset theo id
+    -> có đủ faculty, room (users) + bed, address, building (student_profiles).
+    total chỉ có ở trang đầu.
     """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Chỉ quản trị viên được truy cập.")
-    return crud.users.get_users_admin_rows(db)
+    items, next_cursor, total = crud.users.list_users_page(
+        db, limit=limit, cursor=cursor, order=order, q=q,
+        faculty=faculty, room=room, building=building, role=role,
+    )
+    return {"items": items, "next_cursor": next_cursor, "limit": limit, "total": total}
 
 
 # (Tuỳ chọn) Giữ endpoint raw cũ nếu chỗ khác đang dùng UserOut
 @router.get("/raw", response_model=List[schemas.UserOut])
 def list_users_raw(
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Chỉ quản trị viên được truy cập.")
@@ -42,29 +57,80 @@ def list_users_raw(
 
 
 @router.post("/", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user_in: schemas.AdminUserCreate,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Không có quyền tạo tài khoản.")
+    if await run_in_threadpool(crud.users.get_user_by_username, db, user_in.username):
+        raise HTTPException(status_code=400, detail="Username already exists")
+    hashed = await password_service.hash_password_async(user_in.password)
     try:
-        return crud.users.create_user(db, user_in)
+        return await run_in_threadpool(crud.users.create_user, db, user_in, hashed)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/import", response_model=schemas.UserImportResult)
+async def import_users(
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Chỉ kiểm tra, không tạo tài khoản"),
+    strict: bool = Query(False, description="Có dòng lỗi => không tạo tài khoản nào"),
+    default_password: Optional[str] = Query(None, description="Mật khẩu cho dòng để trống cột password"),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_principal)
+):
+    """
+    Tạo tài khoản hàng loạt từ CSV / XLSX (xem app/user_import.py):
+    kiểm tra mọi dòng trước, băm bcrypt song song, insert theo lô trong 1 transaction.
+    Tối đa USERS_IMPORT_MAX_ROWS tài khoản cần tạo / request (413 nếu hơn, cả khi dry_run).
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Không có quyền tạo tài khoản.")
+    data = await file.read(settings.UPLOAD_MAX_BYTES + 1)
+    await file.close()
+    if len(data) > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File quá lớn")
+    try:
+        records = await run_in_threadpool(user_import.read_file, file.filename or "", data)
+    except user_import.ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result, valid = await run_in_threadpool(
+        user_import.prepare_import, db, records, default_password, False, strict
+    )
+    # băm cả file trong 1 request sẽ vượt timeout worker => chặn luôn ở bước kiểm tra thử
+    if len(valid) > settings.USERS_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File có {len(valid)} tài khoản cần tạo, tối đa {settings.USERS_IMPORT_MAX_ROWS} / lần nhập. "
+                   f"Chia nhỏ file hoặc chạy: python -m app.user_import <file>",
+        )
+    if dry_run:
+        result["dry_run"] = True
+        return result
+    if not valid:
+        return result
+    # bcrypt qua pool của password_service (PASSWORD_MAX_PENDING => 503), không fork tiến trình web
+    hashes = await password_service.hash_many_async([r.password for _, r in valid])
+    return await run_in_threadpool(user_import.insert_users, db, valid, hashes, result)
+
+
 @router.patch("/{user_id}", response_model=schemas.UserOut)
-def update_user_admin(
+async def update_user_admin(
     user_id: int,
     user_in: schemas.UserUpdateAdmin,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Không có quyền cập nhật.")
-    u = crud.users.update_user_admin(db, user_id, user_in)
+    hashed = await password_service.hash_password_async(user_in.password) if user_in.password else None
+    try:
+        u = await run_in_threadpool(crud.users.update_user_admin, db, user_id, user_in, hashed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not u:
         raise HTTPException(status_code=404, detail="Không tìm thấy user.")
     return u
@@ -74,7 +140,7 @@ def update_user_admin(
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Không có quyền xóa.")
@@ -90,7 +156,7 @@ def delete_user(
 @router.get("/me", response_model=schemas.UserOut)
 def get_my_profile(
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
     u = crud.users.get_user_by_id(db, current_user.id)
     if not u:
@@ -99,12 +165,13 @@ def get_my_profile(
 
 
 @router.patch("/me", response_model=schemas.UserOut)
-def update_my_profile(
+async def update_my_profile(
     user_in: schemas.ProfileUpdate,
     db: Session = Depends(get_db),
-    current_user: schemas.UserOut = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_principal)
 ):
-    u = crud.users.update_profile_self(db, current_user.id, user_in)
+    hashed = await password_service.hash_password_async(user_in.password) if user_in.password else None
+    u = await run_in_threadpool(crud.users.update_profile_self, db, current_user.id, user_in, hashed)
     if not u:
         raise HTTPException(status_code=404, detail="Không tìm thấy tài khoản.")
     return u
@@ -1,6 +1,6 @@
 # app/schemas.py
 from pydantic import BaseModel, ConfigDict, EmailStr  # type: ignore
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 # =========================================================
@@ -105,10 +105,46 @@ class AdminUserRow(BaseModel):
 
     bed: Optional[str] = None
     address: Optional[str] = None
+    phone: Optional[str] = None
+    building: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserPage(BaseModel):
+    items: List[AdminUserRow]
+    next_cursor: Optional[int] = None   # id cuối trang; None = hết
+    limit: int
+    total: Optional[int] = None         # chỉ tính ở trang đầu (không có cursor)
+
+
+# Import hàng loạt (POST /users/import, python -m app.user_import)
+class UserImportRow(AdminUserCreate):
+    # thêm các cột student_profiles còn lại
+    major: Optional[str] = None
+    gender: Optional[str] = None
+    dob: Optional[date] = None
+    hometown: Optional[str] = None
+    guardian_name: Optional[str] = None
+    guardian_phone: Optional[str] = None
+    building: Optional[str] = None
+    checkin_date: Optional[date] = None
+
+
+class UserImportError(BaseModel):
+    row: int                      # số dòng trong file (dòng tiêu đề = 1)
+    username: Optional[str] = None
+    error: str
+
+
+class UserImportResult(BaseModel):
+    total: int
+    valid: int
+    created: int
+    dry_run: bool = False
+    errors: List[UserImportError] = []
+
+
 # =========================================================
 # AUTH
 # =========================================================
@@ -161,6 +197,8 @@ class ReportOut(BaseModel):
     building: Optional[str]
     room: Optional[str]
     image_url: Optional[str]
+    image_thumb_url: Optional[str] = None    # ~320px, dùng cho danh sách
+    image_medium_url: Optional[str] = None   # ~1280px, dùng khi xem ảnh
     created_at: datetime
     updated_at: datetime
     reporter_id: int
@@ -172,10 +210,41 @@ class ReportOut(BaseModel):
     ai_floor: Optional[int] = None
     ai_time_text: Optional[str] = None
     ai_meta: Optional[str] = None
+    ai_status: Optional[str] = None   # pending | processing | done | failed
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ReportPage(BaseModel):
+    """1 trang GET /reports; gửi lại next_cursor ở ?cursor= để lấy trang sau (null = hết)."""
+    items: List[ReportOut]
+    next_cursor: Optional[str] = None
+    limit: int
+
+
+class ReportChanges(BaseModel):
+    """
+    Delta GET /reports/changes: dòng tạo / sửa sau since (items) + id đã xoá (deleted).
+    Lưu next_since để gửi ở lần poll sau; has_more=true => gọi lại ngay với next_since;
+    reset=true => bỏ cache cũ (lần đầu hoặc since quá cũ).
+    """
+    items: List[ReportOut]
+    deleted: List[int] = []
+    next_since: str
+    has_more: bool = False
+    reset: bool = False
+
+
+class ReportEnrichmentOut(BaseModel):
+    """Trạng thái làm giàu AI chạy nền của 1 report (client poll)."""
+    report_id: int
+    ai_status: str
+    attempts: int = 0
+    next_run_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
 # =========================================================
 # CHECKINS (✅ đầy đủ, có image_url và thông tin sinh viên)
 # =========================================================
@@ -214,6 +283,8 @@ class CheckinOut(BaseModel):
     status: str
     admin_reply: Optional[str]
     image_url: Optional[str] = None
+    image_thumb_url: Optional[str] = None
+    image_medium_url: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     student_id: int
@@ -224,6 +295,15 @@ class CheckinOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CheckinChanges(BaseModel):
+    """Delta GET /checkins/changes — cùng quy ước với ReportChanges."""
+    items: List[CheckinOut]
+    deleted: List[int] = []
+    next_since: str
+    has_more: bool = False
+    reset: bool = False
+
+
 # =========================================================
 # STUDENT PROFILE
 # =========================================================
@@ -0,0 +1,214 @@
+# app/static_cache.py
+"""
+StaticFiles cho ảnh upload (/uploads, /static/reports, /static/checkins).
+File upload không bao giờ bị ghi đè (tên là sha256 hoặc uuid ngẫu nhiên) nên coi là bất biến;
+bản thu nhỏ sinh lại (--backfill --force) giữ tên nhưng URL API trả có ?v=<variants_rev> đổi theo:
+  - Cache-Control: public, max-age=1 năm, immutable -> trình duyệt không hỏi lại server
+  - ETag mạnh theo nội dung: blob trong kho dùng luôn sha256 ở tên file, file khác băm 1 lần rồi nhớ
+  - If-None-Match / If-Modified-Since -> 304; Range / If-Range -> 206 (FileResponse của Starlette)
+  - có sẵn <file>.br / <file>.gz và client chấp nhận -> trả bản nén kèm Content-Encoding + Vary
+  - không phục vụ file ẩn (.<uuid>.part đang ghi dở)
+
+So sánh số byte của 1 lần tải lại dashboard (chạy trong thư mục backend/):
+  python -m app.static_cache --bench
+"""
+from __future__ import annotations
+
+import os
+import sys
+import stat
+import hashlib
+import argparse
+import threading
+import mimetypes
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles  # type: ignore
+from starlette.datastructures import Headers  # type: ignore
+from starlette.responses import FileResponse, Response  # type: ignore
+from starlette.staticfiles import NotModifiedResponse  # type: ignore
+from starlette.types import Scope  # type: ignore
+
+from .upload_utils import UPLOAD_DIR, parse_blob_url
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))   # thứ tự ưu tiên
+ETAG_CACHE_SIZE = 4096
+
+# full_path -> (mtime_ns, size, etag, {encoding: (path, stat)})
+_Entry = Tuple[int, int, str, Dict[str, Tuple[str, os.stat_result]]]
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _blob_sha(full_path: str) -> Optional[str]:
+    """sha256 lấy từ tên file nếu là ảnh gốc trong kho ab/cd/<sha256><ext> (khỏi phải đọc file)."""
+    path = Path(full_path)
+    if not path.is_relative_to(UPLOAD_DIR):
+        return None
+    key = parse_blob_url("/uploads/" + path.relative_to(UPLOAD_DIR).as_posix())
+    return key[0] if key else None
+
+
+def _accepts(request_headers: Headers, encoding: str) -> bool:
+    for part in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._meta: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._meta_lock = threading.Lock()
+
+    # ---- chạy trong threadpool (StaticFiles.get_response gọi qua anyio.to_thread) ----
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        if any(part.startswith(".") for part in Path(path).parts):
+            return "", None
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            self._prepare(full_path, stat_result)  # đọc file để băm ở đây, không chặn event loop
+        return full_path, stat_result
+
+    def _prepare(self, full_path: str, st: os.stat_result) -> _Entry:
+        with self._meta_lock:
+            entry = self._meta.get(full_path)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._meta.move_to_end(full_path)
+                return entry
+
+        etag = f'"{_blob_sha(full_path) or _hash_file(full_path)}"'
+        encoded: Dict[str, Tuple[str, os.stat_result]] = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                enc_st = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if enc_st.st_mtime_ns >= st.st_mtime_ns:  # bản nén cũ hơn file gốc => bỏ
+                encoded[encoding] = (full_path + suffix, enc_st)
+
+        entry = (st.st_mtime_ns, st.st_size, etag, encoded)
+        with self._meta_lock:
+            self._meta[full_path] = entry
+            while len(self._meta) > ETAG_CACHE_SIZE:
+                self._meta.popitem(last=False)
+        return entry
+
+    # ---- event loop ----
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        with self._meta_lock:
+            entry = self._meta.get(str(full_path))
+        if entry is None or entry[0] != stat_result.st_mtime_ns:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        _, _, etag, encoded = entry
+
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+        path, st, headers = str(full_path), stat_result, {"cache-control": CACHE_CONTROL}
+        if encoded:
+            headers["vary"] = "Accept-Encoding"
+            for encoding, _suffix in ENCODINGS:
+                if encoding in encoded and _accepts(request_headers, encoding):
+                    path, st = encoded[encoding]
+                    headers["content-encoding"] = encoding
+                    etag = f'{etag[:-1]}-{encoding}"'
+                    break
+        headers["etag"] = etag
+
+        response = FileResponse(
+            path, status_code=status_code, headers=headers, media_type=media_type, stat_result=st
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# ================== BENCHMARK ==================
+def _dashboard_urls(limit: int) -> List[str]:
+    """Tối đa limit ảnh trong kho upload — coi như số ảnh 1 trang dashboard hiển thị."""
+    urls = []
+    for p in sorted(UPLOAD_DIR.rglob("*")):
+        if p.is_file() and not p.name.startswith(".") and p.suffix.lower() in (".jpg", ".png", ".webp", ".gif"):
+            urls.append("/uploads/" + p.relative_to(UPLOAD_DIR).as_posix())
+    return urls[:limit]
+
+
+def _header_bytes(headers) -> int:
+    return sum(len(k) + len(v) + 4 for k, v in headers.items())  # "k: v\r\n"
+
+
+def bench(limit: int = 50) -> Dict[str, Dict[str, int]]:
+    """
+    2 lần tải liên tiếp cùng 1 tập ảnh, mô phỏng cache trình duyệt:
+      - plain : StaticFiles cũ (không Cache-Control => trình duyệt revalidate bằng ETag/If-Modified-Since)
+      - cached: CachedStaticFiles (immutable => lần 2 không gửi request nào)
+    """
+    from fastapi import FastAPI  # type: ignore
+    from fastapi.testclient import TestClient  # type: ignore
+
+    urls = _dashboard_urls(limit)
+    out: Dict[str, Dict[str, int]] = {}
+    for name, cls in (("plain", StaticFiles), ("cached", CachedStaticFiles)):
+        app = FastAPI()
+        app.mount("/uploads", cls(directory=str(UPLOAD_DIR)), name="uploads")
+        client = TestClient(app)
+        browser: Dict[str, Tuple[Optional[str], Optional[str], bool]] = {}
+        stats = {"files": len(urls), "cold_bytes": 0, "warm_requests": 0, "warm_304": 0, "warm_bytes": 0}
+
+        for u in urls:  # lần 1: cache trống
+            r = client.get(u)
+            stats["cold_bytes"] += len(r.content) + _header_bytes(r.headers)
+            immutable = "immutable" in r.headers.get("cache-control", "")
+            browser[u] = (r.headers.get("etag"), r.headers.get("last-modified"), immutable)
+
+        for u in urls:  # lần 2: reload dashboard
+            etag, last_modified, immutable = browser[u]
+            if immutable:
+                continue  # trình duyệt dùng luôn bản trong cache
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            r = client.get(u, headers=headers)
+            stats["warm_requests"] += 1
+            stats["warm_304"] += r.status_code == 304
+            stats["warm_bytes"] += len(r.content) + _header_bytes(r.headers) + _header_bytes(headers)
+        out[name] = stats
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Static upload có cache HTTP")
+    parser.add_argument("--bench", action="store_true", help="So sánh byte khi tải lại dashboard")
+    parser.add_argument("--limit", type=int, default=50, help="Số ảnh trên 1 trang dashboard")
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return 0
+    print(f"🔹 Kho upload: {UPLOAD_DIR}")
+    for name, s in bench(args.limit).items():
+        print(f"  {name:6s}: {s}")
+    print("  (byte = body + header; mỗi request 304 còn tốn thêm 1 round-trip)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
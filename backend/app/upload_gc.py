@@ -0,0 +1,67 @@
+# app/upload_gc.py
+"""
+Dọn định kỳ ảnh upload mồ côi: blob đã lên /files/upload, /reports/upload, /checkins/upload nhưng
+không được gắn vào report / check-in nào (bỏ form giữa chừng, gửi report lỗi) quá
+UPLOAD_ORPHAN_GRACE_H giờ => xoá dòng upload_blobs + file (crud.uploads.collect_orphans).
+
+  - on_startup gọi start(): thread nền chạy mỗi UPLOAD_GC_INTERVAL_S giây
+  - nhiều worker cùng dọn: lượt đụng blob vừa bị worker khác xoá chỉ ghi log lỗi, lượt sau dọn tiếp
+  - UPLOAD_GC_INTERVAL_S=0: tắt, khi đó chạy bằng cron, vd mỗi giờ:
+      cd backend && python -m app.migrate_uploads --gc --grace-hours 24
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from .config import settings
+from .database import SessionLocal
+from .crud import uploads as crud_uploads
+
+logger = logging.getLogger(__name__)
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+_lock = threading.Lock()
+
+
+def collect_once() -> int:
+    """1 lượt dọn; trả về số blob đã xoá."""
+    with SessionLocal() as db:
+        try:
+            return crud_uploads.collect_orphans(db, timedelta(hours=settings.UPLOAD_ORPHAN_GRACE_H))
+        except Exception:
+            db.rollback()
+            raise
+
+
+def _loop() -> None:
+    # chờ 1 chu kỳ trước lượt đầu: không dồn việc vào lúc khởi động
+    while not _stop.wait(settings.UPLOAD_GC_INTERVAL_S):
+        try:
+            n = collect_once()
+            if n:
+                logger.info(f"[uploads] đã xoá {n} ảnh mồ côi")
+        except Exception:
+            logger.exception("[uploads] dọn ảnh mồ côi thất bại")
+
+
+def start() -> None:
+    global _thread
+    if settings.UPLOAD_GC_INTERVAL_S <= 0:
+        return
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_loop, name="upload-gc", daemon=True)
+        _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    _stop.set()
+    with _lock:
+        _thread = None
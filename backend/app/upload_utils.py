@@ -0,0 +1,190 @@
+# app/upload_utils.py
+"""
+Lưu file upload dùng chung cho /files/upload, /reports/upload, /checkins/upload:
+  - copy theo từng khối cố định (UPLOAD_CHUNK_BYTES) trong threadpool, không chặn event loop
+  - giới hạn dung lượng (UPLOAD_MAX_BYTES) -> 413
+  - nhận dạng ảnh bằng magic bytes thay vì đuôi file -> 400 nếu không phải JPG/PNG/WebP/GIF
+  - tính SHA-256 ngay trong lúc ghi
+  - lưu theo nội dung: uploads/ab/cd/<sha256><ext> (ảnh trùng chỉ lưu 1 lần, thư mục chia 2 tầng)
+File được ghi ra file tạm .part rồi mới đổi tên, nên không bao giờ còn file dở dang ở URL công khai.
+Bảng upload_blobs / upload_refs + đếm tham chiếu nằm ở crud/uploads.py,
+ảnh thu nhỏ (ab/cd/<sha256>.thumb.webp, .medium.webp) sinh ở image_variants.py.
+"""
+from __future__ import annotations
+
+import os
+import re
+import hashlib
+from pathlib import Path
+from uuid import uuid4
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from .config import settings
+
+# Gốc lưu upload: app/uploads hoặc UPLOAD_DIR (mount ở main.py -> /uploads)
+UPLOAD_DIR = Path(settings.UPLOAD_DIR).resolve() if settings.UPLOAD_DIR else Path(__file__).resolve().parent / "uploads"
+
+# (ext, content-type) theo chữ ký đầu file
+_SIGNATURES: Tuple[Tuple[bytes, str, str], ...] = (
+    (b"\xff\xd8\xff", ".jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", ".png", "image/png"),
+    (b"GIF87a", ".gif", "image/gif"),
+    (b"GIF89a", ".gif", "image/gif"),
+)
+SNIFF_BYTES = 16
+
+# .../uploads/ab/cd/<sha256>.<ext> (có thể kèm http://host phía trước như FE đang lưu)
+_BLOB_URL_RE = re.compile(r"/uploads/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[a-z0-9]{1,5})(?:[?#].*)?$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UnsupportedFileType(Exception):
+    pass
+
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """Trả về (ext, content_type) nếu head là ảnh được hỗ trợ, ngược lại None."""
+    for sig, ext, ctype in _SIGNATURES:
+        if head.startswith(sig):
+            return ext, ctype
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp", "image/webp"
+    return None
+
+
+def blob_relpath(sha256: str, ext: str) -> str:
+    """'ab/cd/abcd...<ext>' — tương đối so với UPLOAD_DIR."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def blob_path(sha256: str, ext: str, base_dir: Path = UPLOAD_DIR) -> Path:
+    return base_dir / blob_relpath(sha256, ext)
+
+
+def blob_url(sha256: str, ext: str) -> str:
+    return f"/uploads/{blob_relpath(sha256, ext)}"
+
+
+def parse_blob_url(url: Optional[str]) -> Optional[Tuple[str, str]]:
+    """image_url -> (sha256, ext) nếu trỏ tới blob trong kho, ngược lại None."""
+    if not url:
+        return None
+    m = _BLOB_URL_RE.search(url.strip())
+    if not m or m.group(3)[:2] != m.group(1) or m.group(3)[2:4] != m.group(2):
+        return None
+    return m.group(3), m.group(4)
+
+
+# --------- Ảnh thu nhỏ (file do image_variants.py sinh) ----------
+VARIANT_KINDS = ("thumb", "medium")
+VARIANT_EXTS = (".webp", ".jpg")   # WebP nếu Pillow hỗ trợ, không thì JPEG
+
+
+def variant_path(sha256: str, kind: str, vext: str, base_dir: Path = UPLOAD_DIR) -> Path:
+    """ab/cd/<sha256>.<kind><vext> cạnh ảnh gốc."""
+    return base_dir / sha256[:2] / sha256[2:4] / f"{sha256}.{kind}{vext}"
+
+
+def variant_url(image_url: Optional[str], kind: str, blob=None) -> Optional[str]:
+    """
+    URL bản thu nhỏ của image_url (giữ nguyên phần http://host nếu có), None nếu chưa sinh
+    hoặc image_url không nằm trong kho — FE khi đó dùng image_url gốc.
+    Không stat file: dựa vào upload_blobs.variants (image_variants ghi sau khi sinh xong),
+    blob là dòng UploadBlob của ảnh (Report.image_blob / CheckinRequest.image_blob).
+    """
+    key = parse_blob_url(image_url)
+    if not key or blob is None or blob.sha256 != key[0] or not blob.variants:
+        return None
+    sha = key[0]
+    for name in blob.variants.split(","):   # "thumb.webp,medium.webp"
+        if name.partition(".")[0] == kind:
+            prefix = image_url.strip()[: image_url.strip().rfind("/uploads/")]
+            url = f"{prefix}/uploads/{sha[:2]}/{sha[2:4]}/{sha}.{name}"
+            # file sinh lại (--backfill --force) giữ nguyên tên, được phục vụ immutable => đổi URL theo rev
+            return f"{url}?v={blob.variants_rev}" if blob.variants_rev else url
+    return None
+
+
+def save_stream(
+    src: BinaryIO,
+    dest_dir: Path = UPLOAD_DIR,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, object]:
+    """
+    (Đồng bộ) copy src -> dest_dir/ab/cd/<sha256><ext> theo khối, kiểm tra magic bytes + dung lượng.
+    Nội dung đã có sẵn trong kho => bỏ file vừa ghi (deduped=True).
+    Raise UnsupportedFileType / UploadTooLarge (đã dọn file tạm).
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+
+    head = src.read(SNIFF_BYTES)
+    kind = sniff_image_type(head)
+    if kind is None:
+        raise UnsupportedFileType()
+    ext, ctype = kind
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_dir / f".{uuid4().hex}.part"
+
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                h.update(chunk)
+                out.write(chunk)
+                chunk = src.read(chunk_size)
+        sha256 = h.hexdigest()
+        final_path = blob_path(sha256, ext, dest_dir)
+        deduped = final_path.exists()
+        if deduped:
+            tmp_path.unlink()
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+    return {
+        "url": blob_url(sha256, ext),
+        "path": str(final_path),
+        "size": size,
+        "sha256": sha256,
+        "ext": ext,
+        "content_type": ctype,
+        "deduped": deduped,
+    }
+
+
+async def save_upload(file: UploadFile, dest_dir: Path = UPLOAD_DIR) -> Dict[str, object]:
+    """
+    Lưu UploadFile (Starlette đã spool body ra file tạm) theo khối trong threadpool.
+    Lỗi được đổi thành HTTPException 413 / 400 cho router.
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File vượt quá {max_bytes / (1024 * 1024):g} MB")
+    try:
+        return await run_in_threadpool(save_stream, file.file, dest_dir, max_bytes)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File vượt quá {max_bytes / (1024 * 1024):g} MB")
+    except UnsupportedFileType:
+        raise HTTPException(status_code=400, detail="Chỉ hỗ trợ JPG/PNG/WebP/GIF")
+    finally:
+        await file.close()
@@ -0,0 +1,348 @@
+# app/user_import.py
+"""
+Tạo tài khoản hàng loạt từ file CSV / XLSX (đầu kỳ nhập vài nghìn sinh viên).
+
+  1) đọc + kiểm tra TẤT CẢ dòng trước (schemas.UserImportRow), trùng username trong file
+  2) username đã có trong DB: 1 câu SELECT ... IN cho mỗi IMPORT_CHUNK username
+  3) băm mật khẩu bcrypt: endpoint qua pool bcrypt của password_service (giới hạn PASSWORD_MAX_PENDING,
+     không fork tiến trình web đang giữ model / thread / kết nối DB), CLI bằng ProcessPoolExecutor
+  4) INSERT users rồi student_profiles bằng executemany (fast_executemany trên MSSQL)
+     trong CÙNG 1 transaction; username bị tạo chen vào trong lúc băm => lỗi theo dòng, không 500
+Endpoint nhận tối đa USERS_IMPORT_MAX_ROWS dòng cần tạo / request (bcrypt phải xong trước timeout
+của gunicorn); file lớn hơn => chia file hoặc dùng CLI.
+Kết quả kèm danh sách lỗi theo từng dòng; dòng hợp lệ vẫn được tạo trừ khi strict=True.
+
+Cột nhận diện (không phân biệt hoa thường / dấu): username (hoặc ma_sv, mssv, student_code),
+password (mat_khau), full_name (ho_ten), role (vai_tro), email, phone (sdt, dien_thoai),
+faculty (khoa), room (phong), bed (giuong), address (dia_chi), building (toa), major (nganh),
+gender (gioi_tinh), dob (ngay_sinh), hometown (que_quan), guardian_name, guardian_phone, checkin_date.
+
+CLI (chạy trong thư mục backend/):
+  python -m app.user_import sinhvien.csv --dry-run
+  python -m app.user_import sinhvien.xlsx --default-password 123456 --workers 4
+"""
+from __future__ import annotations
+
+import io
+import os
+import csv
+import sys
+import time
+import argparse
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError  # type: ignore
+from sqlalchemy import insert, select  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from .models import User, StudentProfile
+from .schemas import UserImportRow
+from .auth_utils import hash_password
+
+try:
+    import openpyxl  # type: ignore
+    HAS_OPENPYXL = True
+except ImportError:  # chỉ cần khi import .xlsx
+    HAS_OPENPYXL = False
+
+IMPORT_CHUNK = 1000   # số username / câu SELECT IN (MSSQL giới hạn 2100 tham số)
+ROLES = ("student", "admin")
+
+USER_FIELDS = ("username", "full_name", "role", "email", "phone", "faculty", "room")
+PROFILE_FIELDS = (
+    "address", "major", "gender", "dob", "hometown", "guardian_name", "guardian_phone",
+    "building", "bed", "checkin_date",
+)
+
+_ALIASES: Dict[str, str] = {
+    "ma_sv": "username", "masv": "username", "mssv": "username", "ma_sinh_vien": "username",
+    "student_code": "username", "tai_khoan": "username", "ten_dang_nhap": "username",
+    "mat_khau": "password",
+    "ho_ten": "full_name", "ho_va_ten": "full_name", "fullname": "full_name", "ten": "full_name",
+    "vai_tro": "role",
+    "sdt": "phone", "so_dien_thoai": "phone", "dien_thoai": "phone",
+    "khoa": "faculty", "phong": "room", "giuong": "bed", "dia_chi": "address",
+    "toa": "building", "toa_nha": "building", "nganh": "major", "gioi_tinh": "gender",
+    "ngay_sinh": "dob", "que_quan": "hometown",
+    "nguoi_giam_ho": "guardian_name", "sdt_giam_ho": "guardian_phone",
+    "ngay_vao": "checkin_date", "ngay_nhan_phong": "checkin_date",
+}
+
+
+class ImportFormatError(ValueError):
+    """File không đọc được / thiếu cột bắt buộc."""
+
+
+# ================== ĐỌC FILE ==================
+def _norm_header(h: object) -> str:
+    s = unicodedata.normalize("NFD", str(h or "")).replace("đ", "d").replace("Đ", "D")
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    s = "_".join(s.strip().lower().replace("-", " ").split())
+    return _ALIASES.get(s, s)
+
+
+def _cell(v: object) -> Optional[object]:
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)   # Excel lưu mã SV / SĐT dạng số
+    s = str(v).strip()
+    return s or None
+
+
+def _rows_from_table(header: List[object], body) -> List[Tuple[int, Dict[str, object]]]:
+    keys = [_norm_header(h) for h in header]
+    if "username" not in keys:
+        raise ImportFormatError("Thiếu cột username (mã sinh viên)")
+    out = []
+    for line_no, values in body:
+        rec = {k: _cell(v) for k, v in zip(keys, values) if k}
+        if any(v is not None for v in rec.values()):   # bỏ dòng trống
+            out.append((line_no, rec))
+    return out
+
+
+def read_csv(data: bytes) -> List[Tuple[int, Dict[str, object]]]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("cp1258", errors="replace")   # CSV lưu từ Excel tiếng Việt
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect)
+    header = next(reader, None)
+    if not header:
+        raise ImportFormatError("File CSV rỗng")
+    return _rows_from_table(header, ((i, r) for i, r in enumerate(reader, start=2)))
+
+
+def read_xlsx(data: bytes) -> List[Tuple[int, Dict[str, object]]]:
+    if not HAS_OPENPYXL:
+        raise ImportFormatError("Cần cài openpyxl để đọc file .xlsx (pip install openpyxl)")
+    try:
+        wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFormatError(f"Không đọc được file Excel: {e}")
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            raise ImportFormatError("Sheet đầu tiên rỗng")
+        return _rows_from_table(list(header), ((i, r) for i, r in enumerate(rows, start=2)))
+    finally:
+        wb.close()
+
+
+def read_file(filename: str, data: bytes) -> List[Tuple[int, Dict[str, object]]]:
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return read_xlsx(data)
+    return read_csv(data)
+
+
+# ================== KIỂM TRA ==================
+def _parse_date(s: str) -> object:
+    """Nhận cả dd/mm/yyyy (kiểu Excel Việt) lẫn yyyy-mm-dd; sai định dạng để pydantic báo lỗi."""
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return s
+
+
+def validate(
+    records: List[Tuple[int, Dict[str, object]]],
+    default_password: Optional[str] = None,
+) -> Tuple[List[Tuple[int, UserImportRow]], List[dict]]:
+    """Kiểm tra từng dòng + trùng username trong file. Trả về (dòng hợp lệ, lỗi)."""
+    valid: List[Tuple[int, UserImportRow]] = []
+    errors: List[dict] = []
+    seen: Dict[str, int] = {}
+    for line_no, rec in records:
+        username = rec.get("username")
+        if not rec.get("password"):
+            if not default_password:
+                errors.append({"row": line_no, "username": username, "error": "thiếu mật khẩu"})
+                continue
+            rec["password"] = default_password
+        for f in ("dob", "checkin_date"):
+            if isinstance(rec.get(f), str):
+                rec[f] = _parse_date(rec[f])
+        try:
+            row = UserImportRow(**rec)
+        except ValidationError as e:
+            msg = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append({"row": line_no, "username": username, "error": msg})
+            continue
+        row.username = row.username.strip()
+        row.role = (row.role or "student").strip().lower()
+        if not row.username:
+            errors.append({"row": line_no, "username": username, "error": "username trống"})
+        elif row.role not in ROLES:
+            errors.append({"row": line_no, "username": row.username, "error": f"role không hợp lệ: {row.role}"})
+        elif row.username in seen:
+            errors.append({"row": line_no, "username": row.username,
+                           "error": f"trùng username với dòng {seen[row.username]}"})
+        else:
+            seen[row.username] = line_no
+            valid.append((line_no, row))
+    return valid, errors
+
+
+def existing_usernames(db: Session, usernames: List[str]) -> set:
+    found = set()
+    for i in range(0, len(usernames), IMPORT_CHUNK):
+        chunk = usernames[i:i + IMPORT_CHUNK]
+        found.update(db.execute(select(User.username).where(User.username.in_(chunk))).scalars())
+    return found
+
+
+# ================== BĂM MẬT KHẨU ==================
+def hash_many(passwords: List[str], workers: Optional[int] = None) -> List[str]:
+    """
+    bcrypt song song nhiều tiến trình (mỗi lần băm ~0.2s CPU). CHỈ dùng cho CLI:
+    fork trong worker web (nhiều thread, torch, pool DB) dễ kẹt lock kế thừa — endpoint dùng
+    password_service.hash_many_async.
+    """
+    workers = workers or min(8, os.cpu_count() or 1)
+    if len(passwords) < 8 or workers == 1:
+        return [hash_password(p) for p in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+# ================== IMPORT ==================
+def prepare_import(
+    db: Session,
+    records: List[Tuple[int, Dict[str, object]]],
+    default_password: Optional[str] = None,
+    dry_run: bool = False,
+    strict: bool = False,
+) -> Tuple[dict, List[Tuple[int, UserImportRow]]]:
+    """Bước 1-2: kiểm tra + loại username đã có. Trả về (kết quả, dòng cần tạo — rỗng nếu không tạo gì)."""
+    valid, errors = validate(records, default_password)
+
+    taken = existing_usernames(db, [r.username for _, r in valid])
+    if taken:
+        errors += [
+            {"row": n, "username": r.username, "error": "username đã tồn tại"}
+            for n, r in valid if r.username in taken
+        ]
+        valid = [(n, r) for n, r in valid if r.username not in taken]
+    errors.sort(key=lambda e: e["row"])
+
+    result = {"total": len(records), "valid": len(valid), "created": 0, "dry_run": dry_run, "errors": errors}
+    if dry_run or (strict and errors):
+        return result, []
+    return result, valid
+
+
+def insert_users(
+    db: Session,
+    valid: List[Tuple[int, UserImportRow]],
+    hashes: List[str],
+    result: dict,
+) -> dict:
+    """
+    Bước 4: INSERT users + student_profiles (hashes cùng thứ tự với valid) trong 1 transaction.
+    Username bị tạo chen vào sau prepare_import (trong lúc băm) => IntegrityError: rollback,
+    chuyển các dòng đó sang lỗi theo dòng rồi insert lại phần còn lại.
+    """
+    pending = list(zip(valid, hashes))
+    while pending:
+        try:
+            _insert_rows(db, pending)
+            break
+        except IntegrityError:
+            db.rollback()
+            taken = existing_usernames(db, [r.username for (_, r), _ in pending])
+            if not taken:
+                raise   # không phải trùng username
+            result["errors"] += [
+                {"row": n, "username": r.username, "error": "username đã tồn tại"}
+                for (n, r), _ in pending if r.username in taken
+            ]
+            result["errors"].sort(key=lambda e: e["row"])
+            pending = [p for p in pending if p[0][1].username not in taken]
+        except Exception:
+            db.rollback()
+            raise
+    result["created"] = len(pending)
+    return result
+
+
+def _insert_rows(db: Session, rows: List[Tuple[Tuple[int, UserImportRow], str]]) -> None:
+    user_rows = [
+        {**{f: getattr(r, f) for f in USER_FIELDS}, "hashed_password": h}
+        for (_, r), h in rows
+    ]
+    db.execute(insert(User.__table__), user_rows)   # executemany
+    ids: Dict[str, int] = {}
+    names = [u["username"] for u in user_rows]
+    for i in range(0, len(names), IMPORT_CHUNK):
+        ids.update(db.execute(
+            select(User.username, User.id).where(User.username.in_(names[i:i + IMPORT_CHUNK]))
+        ).all())
+    profile_rows = [
+        {"user_id": ids[r.username], **{f: getattr(r, f) for f in PROFILE_FIELDS}}
+        for (_, r), _ in rows if r.role == "student"
+    ]
+    if profile_rows:
+        db.execute(insert(StudentProfile.__table__), profile_rows)
+    db.commit()
+
+
+def import_users(
+    db: Session,
+    records: List[Tuple[int, Dict[str, object]]],
+    default_password: Optional[str] = None,
+    dry_run: bool = False,
+    strict: bool = False,
+    workers: Optional[int] = None,
+) -> dict:
+    """Cả 4 bước trong 1 lời gọi đồng bộ (CLI)."""
+    result, valid = prepare_import(db, records, default_password, dry_run, strict)
+    if not valid:
+        return result
+    return insert_users(db, valid, hash_many([r.password for _, r in valid], workers), result)
+
+
+# ================== CLI ==================
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tạo tài khoản sinh viên hàng loạt từ CSV / XLSX")
+    parser.add_argument("file", help="Đường dẫn file .csv hoặc .xlsx")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ kiểm tra, không ghi DB")
+    parser.add_argument("--strict", action="store_true", help="Có dòng lỗi => không tạo tài khoản nào")
+    parser.add_argument("--default-password", default=None, help="Mật khẩu cho dòng để trống cột password")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình băm bcrypt")
+    args = parser.parse_args(argv)
+
+    from .database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+
+    with open(args.file, "rb") as f:
+        records = read_file(args.file, f.read())
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        res = import_users(db, records, args.default_password, args.dry_run, args.strict, args.workers)
+    dt = time.perf_counter() - t0
+
+    for e in res["errors"]:
+        print(f"  ⚠️  dòng {e['row']} ({e['username'] or '-'}): {e['error']}")
+    print(f"✅ {res['total']} dòng, {res['valid']} hợp lệ, tạo {res['created']} tài khoản"
+          f"{' (dry-run)' if args.dry_run else ''} trong {dt:.1f}s")
+    return 1 if res["errors"] and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
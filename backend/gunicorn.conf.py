@@ -0,0 +1,46 @@
+# backend/gunicorn.conf.py
+"""
+Chạy nhiều worker (Linux) dùng chung trọng số model copy-on-write:
+  cd backend && gunicorn -c gunicorn.conf.py app.main:app
+
+  - preload_app: master import app + nạp model (ai/prefork.py) rồi mới fork => các worker không nạp lại
+  - mỗi worker đặt số luồng torch = số core // WEB_CONCURRENCY (AI_TORCH_THREADS để ép)
+  - AI_PREFORK=0: mỗi worker tự nạp model như chạy uvicorn --workers
+  - AI_SERVER_URL đặt: model chạy ở ai/inference_server.py, master / worker không nạp model
+Bus SSE (app/events.py) nằm trong từng tiến trình: nhiều worker => /events/stream trả 503 và FE tự
+tải lại định kỳ; cần sự kiện đẩy thì chạy WEB_CONCURRENCY=1.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+_remote_ai = bool(os.getenv("AI_SERVER_URL", "").strip())
+preload_app = os.getenv("AI_PREFORK", "1") in ("1", "true", "True") and not _remote_ai
+
+
+def when_ready(server):
+    """Master, sau khi đã import app, trước khi fork worker."""
+    if not preload_app:
+        return
+    from ai import prefork  # type: ignore
+    try:
+        info = prefork.preload_in_master()
+    except Exception as e:  # thiếu model... => worker tự nạp lười như cũ
+        server.log.warning(f"[prefork] không nạp trước được model: {e}")
+        return
+    server.log.info(f"[prefork] model đã nạp ở master: {info} — RAM {prefork.mem_usage()} MB")
+
+
+def post_fork(server, worker):
+    # connection DB không được dùng chung giữa các tiến trình
+    from app.database import engine  # type: ignore
+    engine.dispose(close=False)
+    from app import events  # type: ignore
+    events.configure(server.cfg.workers)
+    if preload_app:
+        from ai import prefork  # type: ignore
+        n = prefork.configure_worker(server.cfg.workers)
+        server.log.info(f"[prefork] worker {worker.pid}: torch {n or 'mặc định'} luồng")
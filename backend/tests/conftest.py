@@ -0,0 +1,99 @@
+# backend/tests/conftest.py
+"""
+Chạy: cd backend && pip install -r requirements-dev.txt && python -m pytest -q
+
+Mỗi phiên test dùng 1 DB SQLite tạm; mỗi test bắt đầu với bảng trống và cache trong tiến trình
+(user, /stats) đã xoá. Không cần model AI: ENRICH_MAX_ATTEMPTS=1 => làm giàu report rơi về heuristic.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest  # type: ignore
+
+_TMP = Path(tempfile.mkdtemp(prefix="kssv-test-"))
+
+# Đặt trước khi import app: config / database đọc env lúc import (load_dotenv không ghi đè)
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["AI_SERVER_URL"] = ""
+os.environ["ENRICH_ASYNC"] = "0"
+os.environ["ENRICH_MAX_ATTEMPTS"] = "1"
+os.environ["AI_PRELOAD"] = "0"
+os.environ["PRED_LOG"] = "0"
+os.environ["UPLOAD_GC_INTERVAL_S"] = "0"
+os.environ["UPLOAD_DIR"] = str(_TMP / "uploads")
+os.environ["AUTH_MODE"] = "claims"
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# Dữ liệu train ở gốc repo — corpus cho các test đối chiếu bản cũ / bản tối ưu (không có thì bỏ qua)
+DATA_CSV = BACKEND_DIR.parent / "Datakssv.csv"
+
+
+def load_texts() -> list:
+    """Cột text của Datakssv.csv, [] nếu không có file."""
+    import csv
+
+    if not DATA_CSV.is_file():
+        return []
+    with open(DATA_CSV, encoding="utf-8-sig", newline="") as f:
+        return [row.get("text") or "" for row in csv.DictReader(f)]
+
+
+@pytest.fixture
+def clean_db():
+    """Bảng trống + cache trong tiến trình đã xoá."""
+    from app.database import Base, engine
+    from app import models  # noqa: F401
+    from app import auth_utils
+    from app.crud import stats as crud_stats
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with auth_utils._user_cache_lock:
+        auth_utils._user_cache.clear()
+    crud_stats.invalidate()
+    yield
+
+
+@pytest.fixture
+def db(clean_db):
+    from app.database import SessionLocal
+
+    with SessionLocal() as s:
+        yield s
+
+
+@pytest.fixture
+def client(clean_db):
+    from fastapi.testclient import TestClient  # type: ignore
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+def make_user(db, username: str, role: str = "student", **fields):
+    """Tạo user trực tiếp trong DB (mật khẩu giả, không tốn bcrypt)."""
+    from app import models
+
+    user = models.User(username=username, hashed_password="x", role=role, **fields)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def auth_headers(user) -> dict:
+    """Header Bearer giống token /auth/token cấp cho user."""
+    from app.auth_utils import create_access_token
+
+    token = create_access_token({
+        "sub": user.username, "user_id": user.id, "role": user.role, "ver": user.token_version or 0,
+    })
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,68 @@
+# backend/tests/test_auth.py
+"""AUTH_MODE=claims: token cũ hết hiệu lực ngay khi đổi role / mật khẩu / xoá user dù user đang nằm trong cache."""
+from __future__ import annotations
+
+from app import auth_utils
+from app.auth_utils import hash_password
+
+from .conftest import auth_headers, make_user
+
+
+def _me(client, h) -> int:
+    return client.get("/users/me", headers=h).status_code
+
+
+def test_role_change_revokes_old_token(client, db):
+    admin = auth_headers(make_user(db, "admin", role="admin"))
+    user = make_user(db, "sv1")
+    old = auth_headers(user)
+    assert _me(client, old) == 200  # user đã vào cache
+
+    r = client.patch(f"/users/{user.id}", json={"role": "staff"}, headers=admin)
+    assert r.status_code == 200, r.text
+    assert _me(client, old) == 401
+
+    db.refresh(user)
+    assert _me(client, auth_headers(user)) == 200
+
+
+def test_password_change_revokes_all_tokens(client, db):
+    user = make_user(db, "sv1")
+    user.hashed_password = hash_password("cu-123")
+    db.commit()
+    h = auth_headers(user)
+    other = auth_headers(user)  # phiên trên thiết bị khác
+    assert _me(client, other) == 200
+
+    r = client.post("/profile/change-password", json={"old_password": "cu-123", "new_password": "moi-456"}, headers=h)
+    assert r.status_code == 200, r.text
+    assert _me(client, h) == 401
+    assert _me(client, other) == 401
+
+    r = client.post("/auth/token", data={"username": "sv1", "password": "moi-456"})
+    assert r.status_code == 200, r.text
+    assert _me(client, {"Authorization": f"Bearer {r.json()['access_token']}"}) == 200
+
+
+def test_deleted_user_is_rejected(client, db):
+    admin = auth_headers(make_user(db, "admin", role="admin"))
+    user = make_user(db, "sv1")
+    h = auth_headers(user)
+    assert _me(client, h) == 200
+
+    assert client.delete(f"/users/{user.id}", headers=admin).status_code == 200
+    assert _me(client, h) == 401
+
+
+def test_writes_outside_crud_wait_for_invalidate_user(client, db):
+    """Cache chỉ tin DB trong TTL: sửa thẳng DB (không qua crud) thì phải tự gọi invalidate_user."""
+    user = make_user(db, "sv1")
+    h = auth_headers(user)
+    assert _me(client, h) == 200
+
+    auth_utils.bump_token_version(user)
+    db.commit()
+    assert _me(client, h) == 200  # còn trong TTL của cache
+
+    auth_utils.invalidate_user(user.id)
+    assert _me(client, h) == 401
@@ -0,0 +1,100 @@
+# backend/tests/test_events.py
+"""SSE: vé stream, kiểm tra lại quyền mỗi heartbeat, id sự kiện riêng từng tiến trình, từ chối khi nhiều worker."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app import auth_utils, events
+from app.config import settings
+from app.routers import events_router
+
+from .conftest import auth_headers, make_user
+
+
+def _claims(user, **extra) -> dict:
+    return {"user_id": user.id, "role": user.role, "ver": user.token_version or 0, **extra}
+
+
+def test_ticket_is_not_an_access_token(client, db):
+    admin = make_user(db, "admin", role="admin")
+
+    r = client.post("/events/ticket", headers=auth_headers(admin))
+    assert r.status_code == 200, r.text
+    ticket = r.json()["ticket"]
+
+    assert client.get("/reports", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
+    assert auth_utils.decode_token(ticket, scope=events_router.TICKET_SCOPE)["user_id"] == admin.id
+    access = auth_headers(admin)["Authorization"][7:]
+    assert client.get("/events/stream", params={"ticket": access}).status_code == 401
+
+
+def test_stream_refused_when_several_workers(client, db, monkeypatch):
+    monkeypatch.setattr(events, "_workers", 2)
+    h = auth_headers(make_user(db, "admin", role="admin"))
+
+    assert client.post("/events/ticket", headers=h).status_code == 503
+    assert client.get("/events/stream", headers=h).status_code == 503
+
+
+def test_principal_rechecked_against_role_version_and_expiry(db):
+    user = make_user(db, "admin", role="admin")
+    claims = _claims(user, until=time.time() + 60)
+    assert events_router._principal(claims).role == "admin"
+
+    user.role = "student"
+    db.commit()
+    auth_utils.invalidate_user(user.id)
+    assert events_router._principal(claims) is None
+
+    user.role = "admin"
+    auth_utils.bump_token_version(user)
+    db.commit()
+    auth_utils.invalidate_user(user.id)
+    assert events_router._principal(claims) is None
+    assert events_router._principal(_claims(user, until=time.time() + 60)) is not None
+    assert events_router._principal(_claims(user, until=time.time() - 1)) is None
+
+
+def test_stream_closes_once_principal_is_no_longer_allowed(monkeypatch):
+    monkeypatch.setattr(settings, "EVENTS_HEARTBEAT_S", 0.01)
+    allowed = [True]
+
+    async def still_allowed():
+        return allowed[0]
+
+    async def is_disconnected():
+        return False
+
+    async def run():
+        sub, backlog = events.subscribe(10_001, "admin")
+        gen = events.stream(sub, backlog, is_disconnected, still_allowed)
+        head = [await gen.__anext__(), await gen.__anext__()]
+        allowed[0] = False
+        rest = [chunk async for chunk in gen]
+        return sub, head, rest
+
+    sub, head, rest = asyncio.run(run())
+
+    assert head[0].startswith("retry:") and head[1] == ": ping\n\n"
+    assert rest == []
+    assert sub not in events._subs
+
+
+def test_event_ids_are_per_process_and_foreign_ids_resync():
+    async def last_id_after_publish():
+        events.publish(events.REPORT_CREATED, {"id": 1})
+        return events.stats()["last_id"]
+
+    before = asyncio.run(last_id_after_publish())
+    events._after_fork()   # như worker vừa fork từ master đã import app
+    after = asyncio.run(last_id_after_publish())
+    assert before.rpartition("-")[0] != after.rpartition("-")[0]
+
+    async def subscribe_with(last_id):
+        sub, backlog = events.subscribe(10_002, "admin", last_id)
+        events.unsubscribe(sub)
+        return [ev.type for ev in backlog]
+
+    assert asyncio.run(subscribe_with(before)) == [events.RESYNC]
+    assert asyncio.run(subscribe_with(after)) == []
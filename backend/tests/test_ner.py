@@ -0,0 +1,195 @@
+# backend/tests/test_ner.py
+"""
+ai.ner_vn.extract_info / extract_many (pattern gộp, biên dịch sẵn) phải cho kết quả giống bản gốc
+bên dưới: mẫu cố định, Datakssv.csv (thô và đã chuẩn hoá — predictor gọi trên câu đã chuẩn hoá)
+và câu ngẫu nhiên ghép từ khoá phòng / thời gian / ký tự Unicode khó.
+"""
+from __future__ import annotations
+
+import random
+import re
+from typing import Dict, Optional
+
+import pytest  # type: ignore
+
+from ai.ner_vn import VI_NUM, _clean_room_token, _infer_floor_from_room, _word_to_num, extract_info, extract_many
+from ai.text_preprocess_kssv import normalize_many
+
+from .conftest import load_texts
+
+
+# ==============================
+# Bản gốc — đối chiếu
+# ==============================
+def _extract_info_reference(text: str) -> Dict[str, Optional[str]]:
+    """Bản gốc: mỗi lần gọi re.search lần lượt từng pattern."""
+    info: Dict[str, Optional[str]] = {"toanha": None, "phong": None, "tang": None, "thoigian": None}
+    txt = text.strip()
+
+    # --------- PHÒNG (ưu tiên toà + phòng: B3-402 / b3 402 / B3.402) ----------
+    m_build = re.search(r'\b([A-Za-z]\d)[\-\s\.]?(\d{3,4})\b', txt, flags=re.IGNORECASE)
+    if m_build:
+        info["toanha"] = m_build.group(1).upper()      # B3
+        room_digits = m_build.group(2)                  # 402 / 1001
+        info["phong"] = room_digits
+    else:
+        # Các biến thể thường gặp
+        room_patterns = [
+            r"(?:phòng|phong|p\.?)\s*(?:khách\s*sạn\s*sinh\s*viên|kssv)?\s*[-:\s]?([A-Za-z]?\d{2,4}[A-Za-z]?)",
+            r"\bKSSV\s*[-:\s]?(\d{2,4})\b",
+            r"\bP\s*\.?\s*([A-Za-z]?\d{2,4}[A-Za-z]?)\b",
+        ]
+        for pat in room_patterns:
+            m = re.search(pat, txt, flags=re.IGNORECASE)
+            if m:
+                info["phong"] = _clean_room_token(m.group(1))
+                break
+
+    # --------- TẦNG ----------
+    # Ưu tiên 'tầng X', nếu không thì suy từ 'phong'
+    m_tang = re.search(r"tầng\s*(\d{1,2})\b", txt, flags=re.IGNORECASE)
+    if m_tang:
+        info["tang"] = m_tang.group(1)
+    elif info["phong"]:
+        info["tang"] = _infer_floor_from_room(info["phong"])
+
+    # --------- THỜI GIAN ----------
+    fixed_time_patterns = [
+        r"(từ\s*tối\s*qua)", r"(tối\s*qua)", r"(đêm\s*qua)", r"(chiều\s*hôm\s*qua)", r"(hôm\s*qua)",
+        r"(hôm\s*kia)", r"(sáng\s*nay)", r"(trưa\s*nay)", r"(chiều\s*nay)", r"(tối\s*nay)", r"(hôm\s*nay)",
+        r"(từ\s*sáng)",  # thêm 'từ sáng'
+    ]
+    for ptn in fixed_time_patterns:
+        m = re.search(ptn, txt, flags=re.IGNORECASE)
+        if m:
+            info["thoigian"] = m.group(1).lower().strip()
+            return info
+
+    m_date = re.search(r"(ngày\s*\d{1,2}/\d{1,2}(?:/\d{2,4})?)", txt, flags=re.IGNORECASE)
+    if m_date:
+        info["thoigian"] = m_date.group(1).lower().strip()
+        return info
+
+    m_cachd = re.search(r"cách\s*đây\s*(\d{1,2})\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
+    if m_cachd:
+        num = int(m_cachd.group(1))
+        info["thoigian"] = f"{num} ngày trước"
+        return info
+
+    m_num_truoc = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\s*trước\b", txt, flags=re.IGNORECASE)
+    if m_num_truoc:
+        num = int(m_num_truoc.group(1))
+        info["thoigian"] = f"{num} ngày trước"
+        return info
+
+    m_num_nay = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\s*nay\b", txt, flags=re.IGNORECASE)
+    if m_num_nay:
+        num = int(m_num_nay.group(1))
+        info["thoigian"] = f"{num} ngày gần đây"
+        return info
+
+    m_num_plain = re.search(r"\b(\d{1,2})\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
+    if m_num_plain:
+        num = int(m_num_plain.group(1))
+        info["thoigian"] = f"{num} ngày gần đây"
+        return info
+
+    m_word_truoc = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\s*trước\b", txt, flags=re.IGNORECASE)
+    if m_word_truoc:
+        num = _word_to_num(m_word_truoc.group(1))
+        if num:
+            info["thoigian"] = f"{num} ngày trước"
+            return info
+
+    m_word_nay = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\s*nay\b", txt, flags=re.IGNORECASE)
+    if m_word_nay:
+        num = _word_to_num(m_word_nay.group(1))
+        if num:
+            info["thoigian"] = f"{num} ngày gần đây"
+            return info
+
+    m_word_plain = re.search(r"\b(một|hai|ba|bốn|năm|sáu|bảy|tám|chín|mười)\s*(ngày|hôm)\b", txt, flags=re.IGNORECASE)
+    if m_word_plain:
+        num = _word_to_num(m_word_plain.group(1))
+        if num:
+            info["thoigian"] = f"{num} ngày gần đây"
+            return info
+
+    if re.search(r"\b(mấy|vài)\s*hôm\s*nay\b", txt, flags=re.IGNORECASE):
+        info["thoigian"] = "gần đây"
+        return info
+
+    return info
+
+
+# ==============================
+# Corpus
+# ==============================
+SAMPLES = [
+    "phòng 203 đèn bị hỏng từ hôm qua",
+    "phong B203 mất điện 2 ngày rồi",
+    "phòng KSSV-214 tối không sáng",
+    "P.305 bị mất nước 1 ngày trước",
+    "B3-402 mất nước từ sáng",
+    "P 12A2 bóng đèn cháy tối qua",
+    "phòng 1205 hư internet từ sáng nay",
+    "phòng tầng 5 bị hư wifi",
+    "Cách đây 3 ngày phòng 203 mất điện",
+    "vài hôm nay phòng 203 chập chờn",
+    "2 ngày nay wifi yếu phòng 203",
+    "hôm nay phòng 305 mất nước, từ tối qua đã yếu",          # pattern ưu tiên hơn đứng sau trong câu
+    "ba ngày trước ngày 10/10 phòng p.12 tầng 3",
+    "ſáu hôm nay KSSV 214",                                  # số bằng chữ không tra được -> pattern sau
+    "B3 402 hai hôm trước, mấy hôm nay vẫn hỏng",
+]
+
+
+def fuzz_corpus(n: int, seed: int = 0) -> list:
+    """Câu ngẫu nhiên ghép từ khoá phòng / thời gian / số / ký tự Unicode khó — dễ đụng ranh giới \b và thứ tự ưu tiên."""
+    rng = random.Random(seed)
+    pieces = {
+        " ", "  ", ",", ".", "-", ":", "/", "\t", "x", "a", "1", "12", "205", "1205", "10/10", "3/4/2024",
+        "phòng", "phong", "p", "P.", "kssv", "KSSV", "khách sạn sinh viên", "B3", "c2", "tầng", "Tầng",
+        "từ", "tối", "đêm", "chiều", "hôm", "qua", "kia", "sáng", "trưa", "nay", "ngày", "cách đây",
+        "trước", "mấy", "vài", "điện", "nước", "HÔM", "NGÀY", "Sáng",
+        "ſ", "İ", "K", "²", "٣", " ", "_",                 # ký tự unicode khó (IGNORECASE / \d / \b)
+    }
+    pieces.update(VI_NUM)
+    pieces.update(w.upper() for w in VI_NUM)
+    pieces = sorted(pieces)
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+
+def _mismatches(texts):
+    bad = []
+    for t, new in zip(texts, extract_many(texts)):
+        ref = _extract_info_reference(t)
+        if ref != new or extract_info(t) != new:
+            bad.append((t, ref, new))
+    return bad
+
+
+# ==============================
+# Test
+# ==============================
+def test_samples_match_reference():
+    assert _mismatches(SAMPLES) == []
+
+
+@pytest.mark.parametrize("normalized", [False, True], ids=["raw", "normalized"])
+def test_training_data_matches_reference(normalized):
+    texts = load_texts()
+    if not texts:
+        pytest.skip("không có Datakssv.csv")
+    assert _mismatches(normalize_many(texts) if normalized else texts)[:5] == []
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_fuzz_matches_reference(seed):
+    assert _mismatches(fuzz_corpus(25_000, seed))[:5] == []
+
+
+def test_extract_many_returns_independent_dicts():
+    a, b = extract_many(["phòng 203 từ hôm qua"] * 2)
+    a["phong"] = "x"
+    assert b["phong"] == "203"
@@ -0,0 +1,130 @@
+# backend/tests/test_normalize.py
+"""
+ai.text_preprocess_kssv.normalize_text (1 lượt, pattern biên dịch sẵn) phải cho kết quả giống
+từng byte bản gốc thay thế tuần tự bên dưới: mẫu cố định, Datakssv.csv và câu ngẫu nhiên
+ghép từ các mảnh dễ đụng ranh giới (khoá thay thế, output, stopword, ký tự Unicode khó).
+"""
+from __future__ import annotations
+
+import random
+import re
+import unicodedata
+
+import pytest  # type: ignore
+
+from ai.text_preprocess_kssv import REPLACEMENTS, STOPWORDS, normalize_many, normalize_text
+
+from .conftest import load_texts
+
+
+# ==============================
+# Bản gốc (tuần tự) — đối chiếu
+# ==============================
+def _normalize_text_reference(text: str) -> str:
+    if not isinstance(text, str):
+        return ""
+
+    text = unicodedata.normalize("NFC", text)
+    text = text.lower()
+
+    replacements = {
+        "ký túc": "kssv",
+        "ktx": "kssv",
+        "phòng ": "phong ",
+        "tầng ": "tang ",
+        "khu ": "khu ",
+        "khu vực ": "khu ",
+        "wifi": "wi-fi",
+        "mạng ": "internet ",
+        "mất mạng": "mất internet",
+        "đèn điện": "điện",
+        "bị hỏng": "hỏng",
+        "rò nước": "rò rỉ nước",
+        "vòi bị rỉ": "rò rỉ nước",
+        "rò rỉ": "rò rỉ nước",
+        "thiết bị điện": "thiết bị",
+        "wc": "vệ sinh",
+        "toilet": "vệ sinh",
+        "nhà tắm": "vệ sinh",
+    }
+    for k, v in replacements.items():
+        text = text.replace(k, v)
+
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+
+    stopwords = [
+        "phản ánh", "báo cáo", "bị", "tình trạng", "trong", "ở", "tại",
+        "đã", "vẫn", "rất", "có", "này", "kia", "đó", "rồi", "luôn", "luôn luôn",
+        "đang", "vừa", "cũng", "chưa", "nữa"
+    ]
+    pattern = r"\b(" + "|".join(stopwords) + r")\b"
+    text = re.sub(pattern, "", text).strip()
+
+    text = re.sub(r"\s+", " ", text).strip()
+
+    return text
+
+
+# ==============================
+# Corpus
+# ==============================
+SAMPLES = [
+    "Phòng KSSV-214 mất điện từ tối qua tầng 2 khu B",
+    "Vòi nước tầng 5 bị rò rỉ",
+    "Wi-Fi tầng 3 không kết nối được",
+    "Nhà vệ sinh khu C bị tắc nước",
+    "Thiết bị đèn điện phòng 305 bị hỏng, rò nước ở WC!!",
+    "Ktx khu vực A mất mạng   từ sáng; wifi yếu, toilet/nhà tắm bẩn",
+    "  luôn luôn   bị   mất mạng\tở  tầng\n7 ",
+    "",
+    "???",
+    "Ｐｈòｎｇ　２０５ (full-width) — vòi bị rỉ… “rò rỉ” nước",
+]
+
+
+def fuzz_corpus(n: int, seed: int = 0) -> list:
+    """Câu ngẫu nhiên ghép từ khoá thay thế / output / mảnh khoá / stopword / dấu câu."""
+    rng = random.Random(seed)
+    pieces = set(STOPWORDS) | {
+        " ", "  ", ",", ".", "-", "!", "\t", "x", "a", "1", "205", "điện", "nước", "B2-",
+        "_", "\u0301", "İ", "ß", "\u00a0", "\u2028", "²", "Ⅻ",    # ký tự unicode khó (\w / lower / khoảng trắng lạ)
+    }
+    for k, v in REPLACEMENTS:
+        for s in (k, v, k.upper(), k.title()):
+            pieces.update((s, s[: len(s) // 2], s[len(s) // 2:], s[:-1], s[1:]))
+    pieces = sorted(p for p in pieces if p)
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+
+def _mismatches(texts):
+    bad = []
+    for t, new in zip(texts, normalize_many(texts)):
+        ref = _normalize_text_reference(t)
+        if ref.encode("utf-8") != new.encode("utf-8") or normalize_text(t) != new:
+            bad.append((t, ref, new))
+    return bad
+
+
+# ==============================
+# Test
+# ==============================
+def test_samples_match_reference():
+    assert _mismatches(SAMPLES) == []
+
+
+def test_training_data_matches_reference():
+    texts = load_texts()
+    if not texts:
+        pytest.skip("không có Datakssv.csv")
+    assert _mismatches(texts)[:5] == []
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_fuzz_matches_reference(seed):
+    assert _mismatches(fuzz_corpus(25_000, seed))[:5] == []
+
+
+def test_non_string_is_empty():
+    assert normalize_text(None) == _normalize_text_reference(None) == ""
+    assert normalize_many(["Phòng 205", None]) == [normalize_text("Phòng 205"), ""]
@@ -0,0 +1,36 @@
+# backend/tests/test_predlog.py
+"""Log dự đoán dạng csv: mỗi tiến trình 1 file riêng (kèm pid), file mới luôn có header."""
+from __future__ import annotations
+
+import csv
+import os
+
+from ai import logging_utils
+
+
+def _rec(text: str) -> dict:
+    return {"ts": "2026-01-02T03:04:05.123", "text": text, "label": "điện", "label_confidence": 0.5,
+            "meta": {"phong": "203"}}
+
+
+def _rows(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_csv_sink_is_per_process_and_rotates_with_header(tmp_path, monkeypatch):
+    sink = logging_utils._CsvSink(str(tmp_path))
+    sink.write([_rec("a"), _rec("b")])
+    first = sink.path
+    sink.write([_rec("c")])
+
+    assert first.endswith(f"-{os.getpid()}.csv")
+    assert _rows(first)[0] == logging_utils.CSV_HEADER
+    assert [r[1] for r in _rows(first)[1:]] == ["a", "b", "c"]
+
+    monkeypatch.setattr(logging_utils, "MAX_BYTES", 1)
+    monkeypatch.setattr(logging_utils, "_new_path", lambda d, p, s: os.path.join(d, f"{p}next{s}"))
+    sink.write([_rec("d")])
+
+    assert sink.path != first
+    assert _rows(sink.path) == [logging_utils.CSV_HEADER, ["2026-01-02 03:04:05", "d", "điện", "0.5000", "203", "", ""]]
@@ -0,0 +1,72 @@
+# backend/tests/test_reports_pagination.py
+"""GET /reports: phân trang keyset theo (created_at, id) và bộ lọc ngày."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import text  # type: ignore
+
+from app import models
+
+from .conftest import auth_headers, make_user
+
+
+def _pages(client, headers, **params):
+    ids, cursor = [], None
+    for _ in range(20):   # cursor hỏng (trang sau = trang trước) không được treo test
+        q = dict(params, **({"cursor": cursor} if cursor else {}))
+        r = client.get("/reports", params=q, headers=headers)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        ids.append([x["id"] for x in body["items"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    return ids
+
+
+def test_pages_do_not_repeat_rows_created_in_same_second(client, db):
+    admin = make_user(db, "admin", role="admin")
+    # 1 commit => cùng CURRENT_TIMESTAMP (SQLite lưu 'YYYY-MM-DD HH:MM:SS', không có phần lẻ giây)
+    db.add_all([models.Report(title=f"r{i}", reporter_id=admin.id, status="open", priority="normal") for i in range(5)])
+    db.commit()
+
+    pages = _pages(client, auth_headers(admin), limit=2)
+
+    assert pages == [[5, 4], [3, 2], [1]]
+
+
+def test_pages_follow_created_at_then_id(client, db):
+    admin = make_user(db, "admin", role="admin")
+    days = [3, 1, 2, 2, 3, 1]
+    for i, d in enumerate(days):
+        db.add(models.Report(title=f"r{i}", reporter_id=admin.id, status="open", priority="normal",
+                             created_at=datetime(2026, 1, d, 8, 0, 0)))
+    db.commit()
+
+    flat = [rid for page in _pages(client, auth_headers(admin), limit=4) for rid in page]
+
+    # mới nhất trước; cùng created_at => id lớn trước
+    assert flat == [5, 1, 4, 3, 6, 2]
+
+
+def test_date_filter_includes_midnight_rows(client, db):
+    admin = make_user(db, "admin", role="admin")
+    db.add_all([models.Report(title=t, reporter_id=admin.id, status="open", priority="normal") for t in "abc"])
+    db.commit()
+    # định dạng CURRENT_TIMESTAMP của SQLite (server_default), không phải datetime SQLAlchemy bind
+    for rid, ts in ((1, "2026-01-01 23:59:59"), (2, "2026-01-02 00:00:00"), (3, "2026-01-03 00:00:00")):
+        db.execute(text("UPDATE reports SET created_at = :ts WHERE id = :id"), {"ts": ts, "id": rid})
+    db.commit()
+
+    r = client.get("/reports", params={"date_from": "2026-01-02", "date_to": "2026-01-02"}, headers=auth_headers(admin))
+
+    assert [x["title"] for x in r.json()["items"]] == ["b"]
+
+
+def test_invalid_cursor_is_400(client, db):
+    admin = make_user(db, "admin", role="admin")
+
+    r = client.get("/reports", params={"cursor": "zzz"}, headers=auth_headers(admin))
+
+    assert r.status_code == 400
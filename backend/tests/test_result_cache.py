@@ -0,0 +1,79 @@
+# backend/tests/test_result_cache.py
+"""Cache kết quả dự đoán: LRU + TTL, và bị xoá khi fingerprint thư mục model đổi (không cần model thật)."""
+from __future__ import annotations
+
+import pytest  # type: ignore
+
+from ai.result_cache import ResultCache, dir_fingerprint
+
+
+def test_lru_ttl_and_copies(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("ai.result_cache.time.monotonic", lambda: clock[0])
+    c = ResultCache(max_size=2, ttl_s=10)
+    c.put("a", {"v": [1]})
+    c.put("b", {"v": [2]})
+    c.get("a")                       # a vừa dùng => b bị đẩy ra trước
+    c.put("c", {"v": [3]})
+
+    assert c.get("b") is None and c.stats()["evictions"] == 1
+    got = c.get("a")
+    got["v"].append(99)              # sửa bản trả về không làm hỏng cache
+    assert c.get("a") == {"v": [1]}
+
+    clock[0] += 11
+    assert c.get("a") is None and c.stats()["expirations"] == 1
+
+
+def test_fingerprint_follows_model_files(tmp_path):
+    (tmp_path / "config.json").write_text("{}")
+    before = dir_fingerprint([str(tmp_path)], extra="torch")
+
+    (tmp_path / "model.safetensors").write_bytes(b"x")
+
+    assert dir_fingerprint([str(tmp_path)], extra="torch") != before
+    assert dir_fingerprint([str(tmp_path)], extra="onnx") != dir_fingerprint([str(tmp_path)], extra="torch")
+
+
+@pytest.fixture
+def predictor(monkeypatch):
+    """ai.predictor với model giả: đếm số câu phải suy luận, fingerprint do test điều khiển."""
+    from ai import predictor as p
+
+    fp = {"value": "v1"}
+    inferred = []
+
+    class _Gate:
+        def run(self, fn, pipe, texts, batch_size):
+            inferred.extend(texts)
+            return [[1.0]] * len(texts), [None] * len(texts)
+
+    monkeypatch.setattr(p, "dir_fingerprint", lambda dirs, extra="": fp["value"])
+    monkeypatch.setattr(p, "CACHE_CHECK_S", 0.0)
+    monkeypatch.setattr(p, "GATE", _Gate())
+    monkeypatch.setattr(p, "_ensure_models_loaded", lambda: {})
+    monkeypatch.setattr(p, "_build_result", lambda tn, lp, pp, pipe, meta=None: {"label": "điện", "text": tn})
+    monkeypatch.setattr(p, "_CACHE", ResultCache(max_size=16, ttl_s=3600))
+    monkeypatch.setattr(p, "_FINGERPRINT", {"value": None, "checked_at": 0.0})
+    return p, fp, inferred
+
+
+def test_same_normalized_text_is_served_from_cache(predictor):
+    p, _fp, inferred = predictor
+    p.classify_many_full(["Phòng 203 mất điện", "phòng 203   mất điện!"])
+    p.classify_many_full(["PHÒNG 203 mất điện"])
+
+    assert inferred == ["phong 203 mất điện"]
+    assert p.cache_stats()["hits"] == 1
+
+
+def test_model_change_clears_cache(predictor):
+    p, fp, inferred = predictor
+    p.classify_many_full(["phòng 203 mất điện"])
+    fp["value"] = "v2"   # train / export lại model
+
+    p.classify_many_full(["phòng 203 mất điện"])
+
+    assert inferred == ["phong 203 mất điện"] * 2
+    stats = p.cache_stats()
+    assert stats["invalidations"] == 1 and stats["model_version"] == "v2"
@@ -0,0 +1,69 @@
+# backend/tests/test_stats_cache.py
+"""GET /stats: cache ngắn hạn bị xoá mỗi khi report / check-in / user đổi qua crud."""
+from __future__ import annotations
+
+from app.crud import stats as crud_stats
+
+from .conftest import auth_headers, make_user
+
+
+def _stats(client, h) -> dict:
+    r = client.get("/stats", headers=h)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _count(rows, key) -> int:
+    return next((r["count"] for r in rows if r["key"] == key), 0)
+
+
+def test_report_writes_invalidate_stats(client, db):
+    h = auth_headers(make_user(db, "admin", role="admin"))
+    assert _stats(client, h)["reports"]["total"] == 0
+    assert _stats(client, h)["cached"] is True
+
+    rid = client.post("/reports", json={"title": "mất điện phòng 203"}, headers=h).json()["id"]
+    s = _stats(client, h)
+    assert (s["cached"], s["reports"]["total"]) == (False, 1)
+
+    client.patch(f"/reports/{rid}", json={"status": "resolved"}, headers=h)
+    s = _stats(client, h)
+    assert s["cached"] is False and _count(s["reports"]["by_status"], "resolved") == 1
+
+    client.delete(f"/reports/{rid}", headers=h)
+    s = _stats(client, h)
+    assert (s["cached"], s["reports"]["total"]) == (False, 0)
+
+
+def test_checkin_and_user_writes_invalidate_stats(client, db):
+    admin = make_user(db, "admin", role="admin")
+    student = make_user(db, "sv1")
+    h = auth_headers(admin)
+    _stats(client, h)
+
+    ck = client.post("/checkins", json={"type": "checkin", "date": "2026-01-01"}, headers=auth_headers(student)).json()
+    s = _stats(client, h)
+    assert (s["cached"], s["checkins"]["total"]) == (False, 1)
+
+    client.patch(f"/checkins/{ck['id']}", json={"status": "approved"}, headers=h)
+    s = _stats(client, h)
+    assert s["cached"] is False and _count(s["checkins"]["by_status"], "approved") == 1
+
+    client.delete(f"/users/{student.id}", headers=h)   # xoá cascade check-in của SV
+    s = _stats(client, h)
+    assert (s["cached"], s["checkins"]["total"]) == (False, 0)
+
+
+def test_result_computed_before_invalidation_is_not_cached(db, monkeypatch):
+    compute = crud_stats.compute_stats
+
+    def racing(*args, **kwargs):
+        data = compute(*args, **kwargs)
+        crud_stats.invalidate()    # 1 report được ghi trong lúc đang tính
+        return data
+
+    monkeypatch.setattr(crud_stats, "compute_stats", racing)
+    crud_stats.get_stats(db)
+    monkeypatch.setattr(crud_stats, "compute_stats", compute)
+
+    assert crud_stats.get_stats(db)["cached"] is False
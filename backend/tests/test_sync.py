@@ -0,0 +1,95 @@
+# backend/tests/test_sync.py
+"""GET /reports/changes, /reports/mine/changes: delta theo watermark (updated_at, id) + tombstone."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text  # type: ignore
+
+from app import models
+from app.crud import sync as crud_sync
+
+from .conftest import auth_headers, make_user
+
+
+def _reports(db, owner, n: int) -> list:
+    rows = [models.Report(title=f"r{i}", reporter_id=owner.id, status="open", priority="normal") for i in range(n)]
+    db.add_all(rows)
+    db.commit()
+    return [r.id for r in rows]
+
+
+def _age_all(db) -> None:
+    """Đẩy updated_at về 1 giờ trước (định dạng CURRENT_TIMESTAMP của SQLite) => ngoài khoảng chồng lấn."""
+    db.execute(text("UPDATE reports SET updated_at = datetime('now', '-1 hour')"))
+    db.commit()
+
+
+def _sync(client, headers, path="/reports/changes", **params) -> dict:
+    r = client.get(path, params=params, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_first_sync_resets_and_pages_without_repeats(client, db):
+    admin = make_user(db, "admin", role="admin")
+    ids = _reports(db, admin, 5)   # cùng 1 giây
+    h = auth_headers(admin)
+
+    seen, resets, since = [], [], None
+    for _ in range(10):   # watermark hỏng (trang sau = trang trước) không được treo test
+        body = _sync(client, h, limit=2, **({"since": since} if since else {}))
+        seen += [x["id"] for x in body["items"]]
+        resets.append(body["reset"])
+        since = body["next_since"]
+        if not body["has_more"]:
+            break
+
+    assert seen == ids
+    assert resets == [True, False, False]
+
+
+def test_delta_returns_only_changed_rows_and_deletions(client, db):
+    admin = make_user(db, "admin", role="admin")
+    r1, r2, r3 = _reports(db, admin, 3)
+    _age_all(db)
+    h = auth_headers(admin)
+    first = _sync(client, h)
+    assert first["reset"] is True and len(first["items"]) == 3
+
+    client.patch(f"/reports/{r2}", json={"status": "resolved"}, headers=h)
+    client.delete(f"/reports/{r3}", headers=h)
+    delta = _sync(client, h, since=first["next_since"])
+
+    assert delta["reset"] is False
+    assert [x["id"] for x in delta["items"]] == [r2]
+    assert delta["items"][0]["status"] == "resolved"
+    assert delta["deleted"] == [r3]
+
+
+def test_mine_changes_only_sees_own_rows_and_tombstones(client, db):
+    admin = make_user(db, "admin", role="admin")
+    a, b = make_user(db, "sv_a"), make_user(db, "sv_b")
+    (ra,), (rb,) = _reports(db, a, 1), _reports(db, b, 1)
+    _age_all(db)
+    ha = auth_headers(a)
+    first = _sync(client, ha, "/reports/mine/changes")
+    assert [x["id"] for x in first["items"]] == [ra]
+
+    for rid in (ra, rb):
+        client.delete(f"/reports/{rid}", headers=auth_headers(admin))
+    delta = _sync(client, ha, "/reports/mine/changes", since=first["next_since"])
+
+    assert delta["items"] == [] and delta["deleted"] == [ra]
+
+
+def test_stale_or_broken_since(client, db):
+    admin = make_user(db, "admin", role="admin")
+    _reports(db, admin, 2)
+    h = auth_headers(admin)
+    stale = crud_sync.encode_since(datetime.utcnow() - timedelta(days=365), 0)
+
+    body = _sync(client, h, since=stale)
+
+    assert body["reset"] is True and len(body["items"]) == 2
+    assert client.get("/reports/changes", params={"since": "@@"}, headers=h).status_code == 400
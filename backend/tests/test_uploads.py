@@ -0,0 +1,165 @@
+# backend/tests/test_uploads.py
+"""Kho ảnh theo nội dung: đếm tham chiếu, dọn blob không còn ai dùng, dọn ảnh mồ côi."""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+
+from app import models
+from app.crud import uploads as crud_uploads
+from app.upload_utils import UPLOAD_DIR
+
+from .conftest import auth_headers, make_user
+
+
+def _png() -> bytes:
+    return b"\x89PNG\r\n\x1a\n" + os.urandom(2048)
+
+
+def _upload(client, headers, data: bytes) -> dict:
+    r = client.post("/files/upload", files={"file": ("a.png", data, "image/png")}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _blob(db, sha: str):
+    db.expire_all()
+    return db.query(models.UploadBlob).filter_by(sha256=sha).first()
+
+
+def _file(url: str):
+    return UPLOAD_DIR / url[len("/uploads/"):]
+
+
+def test_refcount_follows_reports_and_last_delete_removes_file(client, db):
+    admin = make_user(db, "admin", role="admin")
+    h = auth_headers(admin)
+    up = _upload(client, h, _png())
+    r1 = client.post("/reports", json={"title": "a", "image_url": up["url"]}, headers=h).json()
+    r2 = client.post("/reports", json={"title": "b", "image_url": "http://127.0.0.1:8000" + up["url"]}, headers=h).json()
+
+    assert _blob(db, up["sha256"]).ref_count == 2
+
+    client.delete(f"/reports/{r1['id']}", headers=h)
+    assert _blob(db, up["sha256"]).ref_count == 1
+    assert _file(up["url"]).exists()
+
+    client.delete(f"/reports/{r2['id']}", headers=h)
+    assert _blob(db, up["sha256"]) is None
+    assert not _file(up["url"]).exists()
+
+
+def test_same_image_is_stored_once(client, db):
+    h = auth_headers(make_user(db, "sv1"))
+    data = _png()
+
+    first, second = _upload(client, h, data), _upload(client, h, data)
+
+    assert (first["deduped"], second["deduped"]) == (False, True)
+    assert first["url"] == second["url"]
+    assert db.query(models.UploadBlob).count() == 1
+
+
+def test_deleting_user_releases_images_of_cascaded_rows(client, db):
+    admin = make_user(db, "admin", role="admin")
+    student = make_user(db, "sv1")
+    h = auth_headers(student)
+    rep_img, ck_img = _upload(client, h, _png()), _upload(client, h, _png())
+    client.post("/reports", json={"title": "a", "image_url": rep_img["url"]}, headers=h)
+    client.post("/checkins", json={"type": "checkin", "date": "2026-01-01", "image_url": ck_img["url"]}, headers=h)
+    assert _blob(db, rep_img["sha256"]).ref_count == 1
+    assert _blob(db, ck_img["sha256"]).ref_count == 1
+
+    r = client.delete(f"/users/{student.id}", headers=auth_headers(admin))
+
+    assert r.status_code == 200, r.text
+    assert db.query(models.UploadRef).count() == 0
+    assert _blob(db, rep_img["sha256"]) is None and _blob(db, ck_img["sha256"]) is None
+    assert not _file(rep_img["url"]).exists() and not _file(ck_img["url"]).exists()
+
+
+def test_collect_orphans_only_removes_unattached_blobs_past_grace(client, db):
+    h = auth_headers(make_user(db, "sv1"))
+    orphan, fresh, used = _upload(client, h, _png()), _upload(client, h, _png()), _upload(client, h, _png())
+    client.post("/reports", json={"title": "a", "image_url": used["url"]}, headers=h)
+    old = datetime.now() - timedelta(days=2)
+    for up in (orphan, used):
+        b = _blob(db, up["sha256"])
+        b.created_at, b.last_uploaded_at = old, old
+        db.commit()
+
+    removed = crud_uploads.collect_orphans(db, timedelta(hours=24))
+
+    assert removed == 1
+    assert _blob(db, orphan["sha256"]) is None and not _file(orphan["url"]).exists()
+    assert _blob(db, fresh["sha256"]) is not None
+    assert _blob(db, used["sha256"]) is not None
+
+
+def test_reupload_of_old_orphan_restarts_grace(client, db):
+    h = auth_headers(make_user(db, "sv1"))
+    data = _png()
+    up = _upload(client, h, data)
+    b = _blob(db, up["sha256"])
+    b.created_at = b.last_uploaded_at = datetime.now() - timedelta(days=2)
+    db.commit()
+
+    again = _upload(client, h, data)   # FE upload lại đúng ảnh đó, report chưa kịp tạo
+    removed = crud_uploads.collect_orphans(db, timedelta(hours=24))
+
+    assert again["deduped"] is True
+    assert removed == 0
+    assert _file(up["url"]).exists()
+
+
+def test_variant_urls_come_from_recorded_variants(client, db):
+    import io
+
+    from PIL import Image  # type: ignore
+
+    from app import image_variants
+
+    admin = make_user(db, "admin", role="admin")
+    h = auth_headers(admin)
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 30, 30)).save(buf, format="PNG")
+    up = _upload(client, h, buf.getvalue())
+    rep = client.post("/reports", json={"title": "a", "image_url": up["url"]}, headers=h).json()
+    image_variants.stop(wait=True)            # chờ thread nền sinh xong rồi coi như chưa sinh
+    b = _blob(db, up["sha256"])
+    b.variants = b.variants_rev = None
+    db.commit()
+
+    assert client.get("/reports", headers=h).json()["items"][0]["image_thumb_url"] is None
+
+    image_variants._safe_generate(up["sha256"], ".png")
+    item = client.get("/reports", headers=h).json()["items"][0]
+
+    sha, vext = up["sha256"], image_variants.output_ext()
+    assert item["id"] == rep["id"]
+    assert item["image_thumb_url"] == f"/uploads/{sha[:2]}/{sha[2:4]}/{sha}.thumb{vext}"
+    assert item["image_medium_url"] == f"/uploads/{sha[:2]}/{sha[2:4]}/{sha}.medium{vext}"
+    assert _file(item["image_thumb_url"]).exists()
+
+
+def test_regenerated_variants_get_a_new_url(client, db):
+    import io
+
+    from PIL import Image  # type: ignore
+
+    from app import image_variants
+
+    h = auth_headers(make_user(db, "admin", role="admin"))
+    buf = io.BytesIO()
+    Image.new("RGB", (400, 300), (30, 30, 200)).save(buf, format="PNG")
+    up = _upload(client, h, buf.getvalue())
+    client.post("/reports", json={"title": "a", "image_url": up["url"]}, headers=h)
+    image_variants.stop(wait=True)
+    image_variants._safe_generate(up["sha256"], ".png")   # đã có file => không đổi URL
+    before = client.get("/reports", headers=h).json()["items"][0]["image_thumb_url"]
+
+    image_variants._safe_generate(up["sha256"], ".png", force=True)
+    after = client.get("/reports", headers=h).json()["items"][0]["image_thumb_url"]
+
+    assert before.endswith("?v=1") and after.endswith("?v=2")
+    assert client.get(after).headers["cache-control"].endswith("immutable")
@@ -0,0 +1,46 @@
+# backend/tests/test_user_import.py
+"""POST /users/import: giới hạn số dòng / request, username bị tạo chen vào trong lúc băm."""
+from __future__ import annotations
+
+from app import models, user_import
+from app.config import settings
+
+from .conftest import auth_headers, make_user
+
+
+def _csv(*usernames: str) -> bytes:
+    return ("username,password,full_name\n" + "".join(f"{u},matkhau1,SV {u}\n" for u in usernames)).encode()
+
+
+def test_import_over_row_limit_is_rejected_before_hashing(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "USERS_IMPORT_MAX_ROWS", 2)
+    h = auth_headers(make_user(db, "admin", role="admin"))
+
+    for dry in ("true", "false"):
+        r = client.post(f"/users/import?dry_run={dry}", files={"file": ("sv.csv", _csv("a", "b", "c"))}, headers=h)
+        assert r.status_code == 413, r.text
+
+    assert db.query(models.User).count() == 1
+
+
+def test_import_within_limit_creates_users(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "USERS_IMPORT_MAX_ROWS", 2)
+    h = auth_headers(make_user(db, "admin", role="admin"))
+
+    r = client.post("/users/import", files={"file": ("sv.csv", _csv("a", "b"))}, headers=h)
+
+    assert r.status_code == 200, r.text
+    assert r.json()["created"] == 2
+    assert {u.username for u in db.query(models.User)} == {"admin", "a", "b"}
+
+
+def test_username_created_during_hashing_becomes_row_error(db):
+    records = user_import.read_csv(_csv("a", "b", "c"))
+    result, valid = user_import.prepare_import(db, records)
+    make_user(db, "b")   # tạo chen vào giữa prepare_import và insert
+
+    res = user_import.insert_users(db, valid, ["x"] * len(valid), result)
+
+    assert res["created"] == 2
+    assert res["errors"] == [{"row": 3, "username": "b", "error": "username đã tồn tại"}]
+    assert db.query(models.StudentProfile).count() == 2
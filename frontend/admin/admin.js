@@ -4,12 +4,21 @@ const API = window.API_BASE || "http://localhost:8000";
 const token = localStorage.getItem("token");
 
 // ---- API wrappers ----
-async function apiAdminListUsers() {
-  const res = await fetch(`${API}/users`, {
-    headers: { Authorization: `Bearer ${token}` }
-  });
-  if (!res.ok) throw new Error("Load users failed");
-  return res.json(); // [{id, username, full_name, email, role, faculty, room, bed, address}]
+// GET /users trả từng trang {items, next_cursor, total} -> gom đủ các trang
+async function apiAdminListUsers(filters = {}) {
+  let rows = [], cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: 200, ...filters });
+    if (cursor != null) params.set("cursor", cursor);
+    const res = await fetch(`${API}/users?${params}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    if (!res.ok) throw new Error("Load users failed");
+    const page = await res.json();
+    rows = rows.concat(page.items); // [{id, username, full_name, email, role, faculty, room, bed, address}]
+    cursor = page.next_cursor;
+  } while (cursor != null);
+  return rows;
 }
 
 async function apiAdminUpdateUser(id, payload) {
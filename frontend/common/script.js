@@ -116,6 +116,7 @@ async function login(username, password) {
       body
     });
 
+    if (res.status === 503) throw new Error("Hệ thống đang bận, vui lòng thử lại sau vài giây.");
     if (!res.ok) throw new Error(`Sai tài khoản hoặc mật khẩu (${res.status})`);
 
     const { access_token } = await res.json();
@@ -224,7 +225,47 @@ async function apiCreateReport(payload) {
 }
 
 // Danh sách sự cố của riêng tôi (mặc định mới nhất trước)
+/* ĐỒNG BỘ DELTA – giữ cache theo id trong sessionStorage, mỗi lần chỉ hỏi `${path}/changes?since=...`
+   (bản ghi tạo/sửa + id đã xoá). Server cũ chưa có /changes => trả null để caller tải cả danh sách. */
+const kSync = (path) => `${NS}:sync:${getCurrentUsername() || "_"}:${path}`;
+
+async function apiSyncList(path) {
+  const SS = window.sessionStorage;
+  let cache;
+  try { cache = JSON.parse(SS.getItem(kSync(path)) || "null"); } catch { cache = null; }
+  const byId = new Map((cache?.items || []).map((it) => [it.id, it]));
+  let since = cache?.since || null;
+
+  for (;;) {
+    const qs = since ? `?since=${encodeURIComponent(since)}` : "";
+    const res = await apiFetch(`${path}/changes${qs}`);
+    if (res.status === 404 || res.status === 405) return null;
+    if (res.status === 400 && since) { since = null; byId.clear(); continue; } // watermark hỏng => tải lại
+    if (!res.ok) {
+      const t = await res.text().catch(()=> "");
+      throw new Error(`Không đồng bộ được dữ liệu: ${res.status} ${t}`);
+    }
+    const page = await res.json();
+    if (page.reset && since) byId.clear();
+    (page.deleted || []).forEach((id) => byId.delete(id));
+    (page.items || []).forEach((it) => byId.set(it.id, it));
+    since = page.next_since;
+    if (!page.has_more) break;
+  }
+
+  const items = [...byId.values()];
+  try { SS.setItem(kSync(path), JSON.stringify({ since, items })); } catch { /* hết quota: lần sau tải lại */ }
+  return items;
+}
+
+const byCreatedDesc = (a, b) => String(b.created_at).localeCompare(String(a.created_at)) || b.id - a.id;
+
 async function apiListReportsMine(order = "desc") {
+  const synced = await apiSyncList(`${REPORTS_PATH}/mine`);
+  if (synced) {
+    synced.sort(byCreatedDesc);
+    return order === "asc" ? synced.reverse() : synced;
+  }
   const res = await apiFetch(`${REPORTS_PATH}/mine?order=${encodeURIComponent(order)}`);
   if (!res.ok) {
     const t = await res.text().catch(()=> "");
@@ -233,9 +274,14 @@ async function apiListReportsMine(order = "desc") {
   return res.json();
 }
 
-// (Admin) – Danh sách tất cả
-async function apiListReportsAll(order = "desc") {
-  const res = await apiFetch(`${REPORTS_PATH}?order=${encodeURIComponent(order)}`);
+// (Admin) – 1 trang danh sách: params = { limit, cursor, status, priority, category, ai_label, building, room, date_from, date_to }
+// Trả về { items, next_cursor, limit } — next_cursor = null là hết dữ liệu
+async function apiListReportsPage(params = {}) {
+  const qs = new URLSearchParams();
+  Object.entries(params).forEach(([k, v]) => {
+    if (v !== undefined && v !== null && v !== "") qs.set(k, v);
+  });
+  const res = await apiFetch(`${REPORTS_PATH}${qs.toString() ? `?${qs}` : ""}`);
   if (!res.ok) {
     const t = await res.text().catch(()=> "");
     throw new Error(`Không tải được danh sách sự cố: ${res.status} ${t}`);
@@ -243,6 +289,18 @@ async function apiListReportsAll(order = "desc") {
   return res.json();
 }
 
+// (Admin) – Danh sách tất cả (đi hết các trang theo next_cursor, mới nhất trước)
+async function apiListReportsAll(params = {}) {
+  const all = [];
+  let cursor = null;
+  do {
+    const page = await apiListReportsPage({ limit: 200, ...params, cursor });
+    all.push(...(page.items || []));
+    cursor = page.next_cursor;
+  } while (cursor);
+  return all;
+}
+
 // (Chi tiết)
 async function apiGetReport(reportId) {
   const res = await apiFetch(`${REPORTS_PATH}/${reportId}`);
@@ -266,6 +324,21 @@ async function apiUpdateReport(reportId, patch) {
   return res.json();
 }
 
+/* API – STATS (Admin dashboard) */
+// params = { days } hoặc { date_from, date_to } (YYYY-MM-DD); bỏ trống = toàn bộ
+async function apiGetStats(params = {}) {
+  const qs = new URLSearchParams();
+  Object.entries(params).forEach(([k, v]) => {
+    if (v !== undefined && v !== null && v !== "") qs.set(k, v);
+  });
+  const res = await apiFetch(`/stats${qs.toString() ? `?${qs}` : ""}`);
+  if (!res.ok) {
+    const t = await res.text().catch(()=> "");
+    throw new Error(`Không tải được thống kê: ${res.status} ${t}`);
+  }
+  return res.json();
+}
+
 // alias thuận tiện: trên SV gọi apiListReports() sẽ chính là mine
 async function apiListReports() { return apiListReportsMine(); }
 
@@ -307,6 +380,8 @@ async function apiCreateCheckin(payload) {
 }
 
 async function apiMyCheckins() {
+  const synced = await apiSyncList(`${CHECKINS_PATH}/mine`);
+  if (synced) return synced.sort(byCreatedDesc);
   const res = await apiFetch(`${CHECKINS_PATH}/mine`);
   if (!res.ok) {
     const t = await res.text().catch(() => "");
@@ -316,6 +391,8 @@ async function apiMyCheckins() {
 }
 
 async function apiListCheckinsAll() {
+  const synced = await apiSyncList(CHECKINS_PATH);
+  if (synced) return synced.sort(byCreatedDesc);
   const res = await apiFetch(CHECKINS_PATH);
   if (!res.ok) {
     const t = await res.text().catch(() => "");
@@ -336,6 +413,64 @@ async function apiUpdateCheckin(id, patch) {
   return res.json();
 }
 
+/* SỰ KIỆN ĐẨY (SSE) – GET /events/stream thay cho poll định kỳ.
+   onChange(type, data) được gọi (gộp trong 500ms) khi có sự kiện khớp prefix ("report." / "checkin.")
+   hoặc "resync" (server không phát lại được) – trang tự tải lại dữ liệu.
+   EventSource không gửi được header => xin vé ngắn hạn POST /events/ticket (JWT không nằm trong URL / log).
+   Vé hết hạn / server đóng stream => xin vé mới rồi nối lại kèm last_event_id.
+   Server nhiều worker (503) => quay về tải lại mỗi EVENTS_FALLBACK_POLL_MS. */
+const EVENTS_FALLBACK_POLL_MS = 30000;
+
+function subscribeEvents(prefixes, onChange) {
+  if (!getToken() || !window.EventSource) return null;
+  let es = null, timer = null, last = null, lastId = "", poll = null, closed = false, retry = 0;
+  const fire = (type) => (ev) => {
+    if (ev.lastEventId) lastId = ev.lastEventId;
+    let data = null;
+    try { data = JSON.parse(ev.data || "null"); } catch {}
+    last = [type, data];
+    clearTimeout(timer);
+    timer = setTimeout(() => onChange(...last), 500);
+  };
+  const types = {
+    "report.": ["report.created", "report.updated", "report.deleted"],
+    "checkin.": ["checkin.created", "checkin.updated"],
+  };
+  const fallback = () => {
+    if (!poll) poll = setInterval(() => onChange("resync", null), EVENTS_FALLBACK_POLL_MS);
+  };
+  const reconnect = () => {
+    if (closed) return;
+    retry = Math.min(retry + 1, 6);
+    setTimeout(connect, 1000 * retry);
+  };
+  async function connect() {
+    if (closed || !getToken()) return;
+    let ticket;
+    try {
+      const res = await apiFetch("/events/ticket", { method: "POST" });   // 401 => apiFetch đăng xuất
+      if (res.status === 503) return fallback();
+      if (!res.ok) return reconnect();
+      ticket = (await res.json()).ticket;
+    } catch (e) {
+      if (e.message !== "Unauthorized") reconnect();
+      return;
+    }
+    const qs = new URLSearchParams({ ticket });
+    if (lastId) qs.set("last_event_id", lastId);
+    es = new EventSource(`${API_BASE}/events/stream?${qs}`);
+    es.onopen = () => { retry = 0; };
+    prefixes.flatMap((p) => types[p] || []).concat("resync")
+      .forEach((t) => es.addEventListener(t, fire(t)));
+    // lỗi mạng: EventSource tự nối lại (cùng vé); bị từ chối (vé hết hạn, 401/503) => CLOSED
+    es.onerror = () => { if (es.readyState === EventSource.CLOSED) reconnect(); };
+  }
+  connect();
+  const close = () => { closed = true; clearInterval(poll); if (es) es.close(); };
+  window.addEventListener("beforeunload", close);
+  return { close };
+}
+
 /* XUẤT RA GLOBAL */
 window.ktxAuth = {
   login,
@@ -354,6 +489,8 @@ window.ktxAuth = {
   apiCreateReport,
   apiListReportsMine,
   apiListReportsAll,
+  apiListReportsPage,
+  apiGetStats,
   apiGetReport,
   apiUpdateReport,
   apiListReports,
@@ -362,6 +499,8 @@ window.ktxAuth = {
   apiMyCheckins,
   apiListCheckinsAll,
   apiUpdateCheckin,
+  apiSyncList,                // 👈 delta .../changes + cache theo id
+  subscribeEvents,            // 👈 SSE /events/stream
 };
 
 // ✅ Đảm bảo mọi trang truy cập được API_BASE đúng